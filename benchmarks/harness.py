@@ -0,0 +1,281 @@
+# telegram_doudizhu_bot/benchmarks/harness.py
+"""
+Synthetic updates, a stub bot and a minimal in-memory game for driving the handler
+decorator stack (rate_limit_command -> group_member_command -> game_command) without
+Telegram. The stubs only implement the attributes the decorators and handlers touch.
+"""
+import random
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+from constants import (
+    PHASE_BIDDING, PHASE_PLAYING, PHASE_GAME_OVER, TYPE_INVALID, RANK_BLACK_JOKER, RANK_RED_JOKER,
+    CALLBACK_BID_PREFIX, CALLBACK_SELECT_CARD_PREFIX, CALLBACK_PLAY_SELECTED_CARDS, CALLBACK_PASS_TURN,
+)
+from game_logic.hand_rules import NUM_RANKS, REGULAR_RANKS, CountVector, HandInfo, classify_counts
+from game_logic.move_generator import can_beat
+from utils.decorators import rate_limit_command, group_member_command, game_command
+from utils.request_context import RequestContext
+
+try:
+    from config import RATE_LIMIT_CALLS, RATE_LIMIT_PERIOD
+except ImportError:
+    print("CRITICAL: config.py not found in benchmarks.harness.py. Using fallback defaults.")
+    RATE_LIMIT_CALLS = 5
+    RATE_LIMIT_PERIOD = 10
+
+BENCH_GROUP_ID = -1000000000001 # Fake REQUIRED_GROUP_ID so the membership check path runs
+HAND_SIZE = 17
+
+
+# --- Stub Telegram objects -------------------------------------------------------------
+
+class StubBot:
+    """Records outgoing calls instead of sending them; every user is a member of every group."""
+
+    def __init__(self):
+        self.calls: Dict[str, int] = {}
+        self.username = "bench_bot"
+
+    def _record(self, method: str) -> None:
+        self.calls[method] = self.calls.get(method, 0) + 1
+
+    async def send_message(self, chat_id: int, text: str, **kwargs):
+        self._record("send_message")
+        return SimpleNamespace(chat_id=chat_id, text=text)
+
+    async def get_chat_member(self, chat_id: int, user_id: int):
+        self._record("get_chat_member")
+        return SimpleNamespace(status="member")
+
+    async def get_chat(self, chat_id: int):
+        self._record("get_chat")
+        return SimpleNamespace(id=chat_id, title="Bench group", invite_link=None)
+
+
+class StubMessage:
+    def __init__(self, bot: StubBot, chat, user, text: str = ""):
+        self._bot = bot
+        self.chat = chat
+        self.chat_id = chat.id
+        self.from_user = user
+        self.text = text
+
+    async def reply_text(self, text: str, **kwargs):
+        self._bot._record("reply_text")
+        return StubMessage(self._bot, self.chat, None, text)
+
+    async def edit_text(self, text: str, **kwargs):
+        self._bot._record("edit_message_text")
+        self.text = text
+        return self
+
+
+class StubCallbackQuery:
+    def __init__(self, bot: StubBot, message: StubMessage, user, data: str):
+        self._bot = bot
+        self.message = message
+        self.from_user = user
+        self.data = data
+
+    async def answer(self, text: Optional[str] = None, show_alert: bool = False, **kwargs):
+        self._bot._record("answer_callback_query")
+
+    async def edit_message_text(self, text: str, **kwargs):
+        self._bot._record("edit_message_text")
+
+    async def edit_message_reply_markup(self, reply_markup=None, **kwargs):
+        self._bot._record("edit_message_reply_markup")
+
+
+def make_callback_update(bot: StubBot, update_id: int, chat_id: int, user_id: int, data: str):
+    """An Update-shaped object carrying a CallbackQuery from user_id in chat_id."""
+    chat = SimpleNamespace(id=chat_id, type="group")
+    user = SimpleNamespace(id=user_id, username=f"user{user_id}", first_name=f"User {user_id}", is_bot=False)
+    message = StubMessage(bot, chat, None, "game message")
+    return SimpleNamespace(update_id=update_id, effective_chat=chat, effective_user=user, message=None,
+                           callback_query=StubCallbackQuery(bot, message, user, data))
+
+
+def make_command_update(bot: StubBot, update_id: int, chat_id: int, user_id: int, text: str):
+    """An Update-shaped object carrying a text command from user_id in chat_id."""
+    chat = SimpleNamespace(id=chat_id, type="group")
+    user = SimpleNamespace(id=user_id, username=f"user{user_id}", first_name=f"User {user_id}", is_bot=False)
+    return SimpleNamespace(update_id=update_id, effective_chat=chat, effective_user=user,
+                           message=StubMessage(bot, chat, user, text), callback_query=None)
+
+
+def make_bot_data(game_manager: "BenchGameManager", rate_limit_calls: int = RATE_LIMIT_CALLS,
+                  rate_limit_period: int = RATE_LIMIT_PERIOD, required_group_id: int = BENCH_GROUP_ID) -> dict:
+    return {
+        "game_manager": game_manager,
+        "config": {"RATE_LIMIT_CALLS": rate_limit_calls, "RATE_LIMIT_PERIOD": rate_limit_period,
+                   "REQUIRED_GROUP_ID": required_group_id, "ADMIN_USER_IDS": [], "DEFAULT_LANG": "en"},
+        "users_lang": {},
+        "chats_lang": {},
+    }
+
+
+class StubContext:
+    """Per-update context like PTB's CallbackContext: shared bot_data, per-user and per-chat dicts."""
+
+    def __init__(self, bot: StubBot, bot_data: dict, user_data: dict, chat_data: dict):
+        self.bot = bot
+        self.bot_data = bot_data
+        self.user_data = user_data
+        self.chat_data = chat_data
+        self.args: List[str] = []
+
+
+# --- Minimal game ----------------------------------------------------------------------
+
+class BenchPlayer:
+    def __init__(self, user_id: int, hand: List[int]):
+        self.user_id = user_id
+        self.hand = hand # Rank counts
+        self.selected = [0] * NUM_RANKS
+
+
+class BenchGame:
+    """Just enough of GameState for the decorators and the benchmark handlers."""
+
+    def __init__(self, chat_id: int, user_ids: List[int], rng: random.Random):
+        deck = [r for r in REGULAR_RANKS for _ in range(4)] + [RANK_BLACK_JOKER, RANK_RED_JOKER]
+        rng.shuffle(deck)
+        self.chat_id = chat_id
+        self.players = []
+        for seat, user_id in enumerate(user_ids):
+            hand = [0] * NUM_RANKS
+            for rank in deck[seat * HAND_SIZE:(seat + 1) * HAND_SIZE]:
+                hand[rank] += 1
+            self.players.append(BenchPlayer(user_id, hand))
+        self.kitty = deck[3 * HAND_SIZE:]
+        self.phase = PHASE_BIDDING
+        self.turn = rng.randrange(3)
+        self.bids_made = 0
+        self.highest_bid = 0
+        self.landlord: Optional[int] = None
+        self.prev: Optional[HandInfo] = None
+        self.last_seat: Optional[int] = None
+        self.winner: Optional[int] = None
+
+    def get_player(self, user_id: int) -> Optional[BenchPlayer]:
+        for player in self.players:
+            if player.user_id == user_id:
+                return player
+        return None
+
+    def get_current_player(self) -> BenchPlayer:
+        return self.players[self.turn]
+
+    def get_current_bidder(self) -> BenchPlayer:
+        return self.players[self.turn]
+
+    def bid(self, value: int) -> None:
+        if value > self.highest_bid:
+            self.highest_bid = value
+            self.landlord = self.turn
+        self.bids_made += 1
+        if self.highest_bid == 3 or self.bids_made == 3:
+            if self.landlord is None: # Everyone passed: first bidder takes it at 1
+                self.landlord, self.highest_bid = (self.turn + 1) % 3, 1
+            for rank in self.kitty:
+                self.players[self.landlord].hand[rank] += 1
+            self.phase = PHASE_PLAYING
+            self.turn = self.landlord
+        else:
+            self.turn = (self.turn + 1) % 3
+
+    def leading(self) -> bool:
+        return self.prev is None or self.last_seat == self.turn
+
+    def play(self, counts: CountVector) -> Optional[HandInfo]:
+        """Plays `counts` for the current seat. Returns the hand info, or None if the play is not allowed."""
+        player = self.players[self.turn]
+        if any(c > h for c, h in zip(counts, player.hand)):
+            return None
+        info = classify_counts(counts)
+        if info.hand_type == TYPE_INVALID or not can_beat(info, None if self.leading() else self.prev):
+            return None
+        player.hand = [h - c for h, c in zip(player.hand, counts)]
+        self.prev, self.last_seat = info, self.turn
+        if not any(player.hand):
+            self.phase = PHASE_GAME_OVER
+            self.winner = self.turn
+        else:
+            self.turn = (self.turn + 1) % 3
+        return info
+
+    def pass_turn(self) -> bool:
+        if self.leading():
+            return False
+        self.turn = (self.turn + 1) % 3
+        return True
+
+
+class BenchGameManager:
+    def __init__(self):
+        self.games: Dict[int, BenchGame] = {}
+
+    def get_game(self, chat_id: int) -> Optional[BenchGame]:
+        return self.games.get(chat_id)
+
+
+# --- Handlers under the production decorator stack ----------------------------------------
+
+@rate_limit_command()
+@group_member_command
+@game_command(require_game_phase=[PHASE_BIDDING], require_player_turn=True)
+async def bench_bid_handler(update, context, game: BenchGame = None, player: BenchPlayer = None, request: RequestContext = None):
+    value = update.callback_query.data[len(CALLBACK_BID_PREFIX):]
+    game.bid(0 if value == "pass" else int(value))
+    await update.callback_query.answer()
+    await update.callback_query.edit_message_text(f"Bid: {game.highest_bid}")
+
+
+@rate_limit_command()
+@group_member_command
+@game_command(require_game_phase=[PHASE_PLAYING], require_player_turn=True)
+async def bench_select_handler(update, context, game: BenchGame = None, player: BenchPlayer = None, request: RequestContext = None):
+    rank = int(update.callback_query.data[len(CALLBACK_SELECT_CARD_PREFIX):])
+    if player.selected[rank] < player.hand[rank]:
+        player.selected[rank] += 1
+    await update.callback_query.answer()
+    await update.callback_query.edit_message_reply_markup(reply_markup=None)
+
+
+@rate_limit_command()
+@group_member_command
+@game_command(require_game_phase=[PHASE_PLAYING], require_player_turn=True)
+async def bench_play_handler(update, context, game: BenchGame = None, player: BenchPlayer = None, request: RequestContext = None):
+    selected, player.selected = tuple(player.selected), [0] * NUM_RANKS
+    info = game.play(selected)
+    if info is None:
+        await request.reject("Invalid play.")
+        return
+    await update.callback_query.answer()
+    await update.callback_query.edit_message_text(f"Played {info.hand_type}")
+
+
+@rate_limit_command()
+@group_member_command
+@game_command(require_game_phase=[PHASE_PLAYING], require_player_turn=True)
+async def bench_pass_handler(update, context, game: BenchGame = None, player: BenchPlayer = None, request: RequestContext = None):
+    if not game.pass_turn():
+        await request.reject("You must play when leading.")
+        return
+    await update.callback_query.answer()
+    await update.callback_query.edit_message_text("Pass")
+
+
+def route_callback(data: str):
+    """Callback data -> handler, like the bot's CallbackQueryHandler patterns."""
+    if data.startswith(CALLBACK_BID_PREFIX):
+        return bench_bid_handler
+    if data.startswith(CALLBACK_SELECT_CARD_PREFIX):
+        return bench_select_handler
+    if data == CALLBACK_PLAY_SELECTED_CARDS:
+        return bench_play_handler
+    if data == CALLBACK_PASS_TURN:
+        return bench_pass_handler
+    raise ValueError(f"Unroutable callback data: {data!r}")
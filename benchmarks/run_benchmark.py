@@ -0,0 +1,226 @@
+# telegram_doudizhu_bot/benchmarks/run_benchmark.py
+"""
+End-to-end handler latency benchmark.
+
+    python -m benchmarks.run_benchmark --games 200
+    python -m benchmarks.run_benchmark --games 200 --save-baseline benchmarks/baseline.json
+    python -m benchmarks.run_benchmark --games 200 --baseline benchmarks/baseline.json
+
+Simulates N concurrent games. Every bid, card toggle, play and pass is a synthetic
+callback update pushed through the production decorator stack into the benchmark
+handlers (see benchmarks/harness.py), and its latency is measured around the handler
+call. A share of updates come from players whose turn it is not, so the rejection paths
+are measured too. Baselines are machine specific: record one on the machine you compare on.
+
+Every invocation plays the games --repeat times and reports the median of each metric,
+so one noisy run (GC, a neighbour on a shared CPU) doesn't move the result. On a shared
+machine single runs vary by about 20% and medians of 5 by about 12% (p99 is the noisiest),
+so DEFAULT_TOLERANCE sits above that: an unchanged tree passes against its own baseline.
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sys
+import time
+from typing import Dict, List, Optional
+
+from constants import (
+    PHASE_BIDDING, PHASE_GAME_OVER,
+    CALLBACK_BID_PREFIX, CALLBACK_SELECT_CARD_PREFIX, CALLBACK_PLAY_SELECTED_CARDS, CALLBACK_PASS_TURN,
+)
+from game_logic.ai_search import greedy_move
+from game_logic.hand_rules import DEFAULT_RULES
+from benchmarks.harness import (
+    StubBot, StubContext, BenchGame, BenchGameManager, make_bot_data, make_callback_update, route_callback,
+)
+from utils.membership_cache import membership_cache
+from utils.rate_limiter import rate_limiter
+
+DEFAULT_TOLERANCE = 0.25 # Allowed relative slowdown of a median before it counts as a regression
+DEFAULT_REPEAT = 5
+BENCH_RATE_LIMIT_CALLS = 1_000_000 # High enough that synthetic players are never throttled
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list (q in [0, 100])."""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(q / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+class LatencyRecorder:
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+
+    def add(self, kind: str, seconds: float) -> None:
+        self.samples.setdefault(kind, []).append(seconds)
+
+    @staticmethod
+    def _summary(values: List[float]) -> Dict[str, float]:
+        values = sorted(values)
+        return {"count": len(values), "p50_ms": percentile(values, 50) * 1000,
+                "p99_ms": percentile(values, 99) * 1000, "max_ms": (values[-1] if values else 0.0) * 1000}
+
+    def report(self, elapsed: float) -> dict:
+        everything = [v for values in self.samples.values() for v in values]
+        report = self._summary(everything)
+        report["updates_per_second"] = len(everything) / elapsed if elapsed else 0.0
+        report["elapsed_seconds"] = elapsed
+        report["per_kind"] = {kind: self._summary(values) for kind, values in sorted(self.samples.items())}
+        return report
+
+
+class LoadGenerator:
+    """Plays `games` concurrent games to the end, one synthetic update at a time per game."""
+
+    def __init__(self, games: int, wrong_turn_ratio: float, seed: Optional[int] = None,
+                 rate_limit_calls: int = BENCH_RATE_LIMIT_CALLS):
+        self.games = games
+        self.wrong_turn_ratio = wrong_turn_ratio
+        self.rng = random.Random(seed)
+        self.bot = StubBot()
+        self.game_manager = BenchGameManager()
+        self.bot_data = make_bot_data(self.game_manager, rate_limit_calls=rate_limit_calls)
+        self.user_data: Dict[int, dict] = {}
+        self.chat_data: Dict[int, dict] = {}
+        self.recorder = LatencyRecorder()
+        self._update_id = 0
+
+    async def _send(self, kind: str, chat_id: int, user_id: int, data: str) -> None:
+        self._update_id += 1
+        update = make_callback_update(self.bot, self._update_id, chat_id, user_id, data)
+        context = StubContext(self.bot, self.bot_data, self.user_data.setdefault(user_id, {}),
+                              self.chat_data.setdefault(chat_id, {}))
+        handler = route_callback(data)
+        start = time.perf_counter()
+        await handler(update, context)
+        self.recorder.add(kind, time.perf_counter() - start)
+        await asyncio.sleep(0) # Interleave games like concurrent chats would
+
+    async def _play_game(self, index: int) -> None:
+        chat_id = -2_000_000_000 - index
+        user_ids = [1_000_000 + 3 * index + seat for seat in range(3)]
+        game = self.game_manager.games[chat_id] = BenchGame(chat_id, user_ids, self.rng)
+
+        while game.phase != PHASE_GAME_OVER:
+            current = game.get_current_player()
+            if self.rng.random() < self.wrong_turn_ratio:
+                other = user_ids[(game.turn + self.rng.randrange(1, 3)) % 3]
+                await self._send("wrong_turn", chat_id, other, CALLBACK_PASS_TURN)
+
+            if game.phase == PHASE_BIDDING:
+                value = self.rng.choice(("pass", "pass", "1", "2", "3"))
+                await self._send("bid", chat_id, current.user_id, CALLBACK_BID_PREFIX + value)
+                continue
+
+            leading = game.leading()
+            move = greedy_move(tuple(current.hand), None if leading else game.prev, False, DEFAULT_RULES)
+            if move is None:
+                await self._send("pass", chat_id, current.user_id, CALLBACK_PASS_TURN)
+                continue
+            for rank, count in enumerate(move.counts):
+                for _ in range(count):
+                    await self._send("select", chat_id, current.user_id, f"{CALLBACK_SELECT_CARD_PREFIX}{rank}")
+            await self._send("play", chat_id, current.user_id, CALLBACK_PLAY_SELECTED_CARDS)
+
+        del self.game_manager.games[chat_id]
+
+    async def run(self) -> dict:
+        start = time.perf_counter()
+        await asyncio.gather(*(self._play_game(i) for i in range(self.games)))
+        report = self.recorder.report(time.perf_counter() - start)
+        report["params"] = {"games": self.games, "wrong_turn_ratio": self.wrong_turn_ratio}
+        report["bot_calls"] = dict(self.bot.calls)
+        return report
+
+
+def median_report(reports: List[dict]) -> dict:
+    """Per-metric median of several runs' reports (the same games, so the counts agree)."""
+    def median_of(stats: List[dict]) -> dict:
+        return {key: statistics.median([s[key] for s in stats]) if isinstance(stats[0][key], (int, float)) else stats[0][key]
+                for key in stats[0]}
+
+    report = median_of([{k: v for k, v in r.items() if k != "per_kind"} for r in reports])
+    report["per_kind"] = {kind: median_of([r["per_kind"][kind] for r in reports]) for kind in reports[0]["per_kind"]}
+    report["params"] = dict(reports[0]["params"], repeat=len(reports))
+    return report
+
+
+def compare_to_baseline(report: dict, baseline: dict, tolerance: float = DEFAULT_TOLERANCE) -> List[str]:
+    """Returns one message per metric that regressed by more than `tolerance` (empty if none)."""
+    regressions = []
+    for metric in ("p50_ms", "p99_ms"):
+        if baseline.get(metric) and report[metric] > baseline[metric] * (1 + tolerance):
+            regressions.append(f"{metric}: {report[metric]:.3f} vs baseline {baseline[metric]:.3f}")
+    if baseline.get("updates_per_second") and \
+            report["updates_per_second"] < baseline["updates_per_second"] * (1 - tolerance):
+        regressions.append(f"updates_per_second: {report['updates_per_second']:.0f} "
+                           f"vs baseline {baseline['updates_per_second']:.0f}")
+    return regressions
+
+
+def format_report(report: dict, baseline: Optional[dict] = None) -> str:
+    def row(name: str, stats: dict, base: Optional[dict]) -> str:
+        line = f"{name:<12}{stats['count']:>9}{stats['p50_ms']:>10.3f}{stats['p99_ms']:>10.3f}{stats['max_ms']:>10.3f}"
+        if base:
+            line += f"   (baseline p50 {base['p50_ms']:.3f}, p99 {base['p99_ms']:.3f})"
+        return line
+
+    lines = [f"{'kind':<12}{'count':>9}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}"]
+    for kind, stats in report["per_kind"].items():
+        lines.append(row(kind, stats, (baseline or {}).get("per_kind", {}).get(kind)))
+    lines.append(row("all", report, baseline))
+    lines.append(f"{report['updates_per_second']:.0f} updates/s over {report['elapsed_seconds']:.2f}s")
+    return "\n".join(lines)
+
+
+async def run_benchmark(games: int, wrong_turn_ratio: float, seed: Optional[int], warmup_games: int,
+                        repeat: int = DEFAULT_REPEAT) -> dict:
+    if warmup_games:
+        await LoadGenerator(warmup_games, wrong_turn_ratio, seed).run() # Fill lookup tables and render caches
+    reports = []
+    for _ in range(max(1, repeat)):
+        rate_limiter.reset()
+        await membership_cache.invalidate()
+        reports.append(await LoadGenerator(games, wrong_turn_ratio, seed).run())
+    return median_report(reports)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Per-update latency of the handler decorator stack.")
+    parser.add_argument("--games", type=int, default=200, help="concurrent games to simulate")
+    parser.add_argument("--wrong-turn-ratio", type=float, default=0.1, help="share of out-of-turn clicks")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--warmup-games", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="runs to take the median of")
+    parser.add_argument("--baseline", help="baseline JSON to compare against")
+    parser.add_argument("--save-baseline", help="write this run's report as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run_benchmark(args.games, args.wrong_turn_ratio, args.seed, args.warmup_games,
+                                       args.repeat))
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print(format_report(report, baseline))
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"Baseline written to {args.save_baseline}")
+
+    if baseline is not None:
+        regressions = compare_to_baseline(report, baseline, args.tolerance)
+        for message in regressions:
+            print(f"REGRESSION {message}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,20 +4,46 @@ ADMIN_USER_IDS = [123456789]
 REQUIRED_GROUP_ID = 0 # Set to your target group ID, or 0 if no specific group required
 DATABASE_NAME = "doudizhu_bot.db"
 DEFAULT_LANG = "zh_CN"
+TRANSLATION_RELOAD_SECONDS = 60.0
+DB_FLUSH_INTERVAL_SECONDS = 0.2
+DB_MAX_BATCH_SIZE = 500
+DB_READER_POOL_SIZE = 4
 
 BID_TIMEOUT_SECONDS = 60
 PLAY_TIMEOUT_SECONDS = 75
 JOIN_GAME_TIMEOUT_SECONDS = 300
+MATCHMAKING_WAIT_SECONDS = 20
+MATCHMAKING_BUCKET_WIDTH = 0
 
 RATE_LIMIT_CALLS = 5
 RATE_LIMIT_PERIOD = 10
+MEMBERSHIP_CACHE_POSITIVE_TTL = 300
+MEMBERSHIP_CACHE_NEGATIVE_TTL = 30
 
 DEFAULT_ALLOW_THREE_ONE_PLANE = True
 DEFAULT_ALLOW_FOUR_TWO_SINGLE = True
 DEFAULT_ALLOW_FOUR_TWO_PAIR = True
+PATTERN_TABLE_DIR = "pattern_tables"
 
 LOG_LEVEL = "INFO"
 LOG_FILE = "bot.log"
+METRICS_PORT = 0
+METRICS_SAMPLE_RATE = 0.1
+
+SHARD_COUNT = 0
+SHARED_STORE_PATH = "doudizhu_shared.db"
+SHARED_STORE_CACHE_TTL = 5
+
+EVENT_LOG_DIR = "event_log"
+EVENT_LOG_SEGMENT_BYTES = 64 * 1024 * 1024
 
 AI_PLAYER_COUNT_TO_START_GAME = 1
+AI_SEARCH_TIME_BUDGET_SECONDS = 3.0
+AI_SEARCH_WORKERS = 2
+AI_ENDGAME_MAX_CARDS = 12
 LEADERBOARD_TOP_N = 10
+LEADERBOARD_RANK_BY = "score"
+
+RATING_INITIAL = 1500.0
+RATING_K_FACTOR = 24.0
+RATING_PERIOD_SECONDS = 3600
@@ -4,28 +4,69 @@ ADMIN_USER_IDS = [123456789, 987654321]  # Your Telegram User IDs
 REQUIRED_GROUP_ID = 0      # Example: -1001234567890 (Must be integer, 0 or None means no requirement)
 DATABASE_NAME = "doudizhu_bot.db"
 DEFAULT_LANG = "zh_CN" # Default language: "en" or "zh_CN"
+TRANSLATION_RELOAD_SECONDS = 60.0 # How often changed .mo files are checked for and reloaded (0 disables)
+
+# Database write-behind (writes are queued and committed in batches by one writer thread)
+DB_FLUSH_INTERVAL_SECONDS = 0.2 # Max time a queued write waits before its batch commits
+DB_MAX_BATCH_SIZE = 500
+DB_READER_POOL_SIZE = 4
 
 # Timeout settings (seconds)
 BID_TIMEOUT_SECONDS = 60
 PLAY_TIMEOUT_SECONDS = 75
 JOIN_GAME_TIMEOUT_SECONDS = 300 # Game creation waiting for players
+MATCHMAKING_WAIT_SECONDS = 20 # Cross-chat queue: wait this long for human opponents before AI fills the table
+MATCHMAKING_BUCKET_WIDTH = 0 # Rating points per matchmaking bucket; 0 = match regardless of rating
 
 # Rate limiting settings
 RATE_LIMIT_CALLS = 5
 RATE_LIMIT_PERIOD = 10 # seconds
 
+# Group membership cache (seconds). Negative results expire sooner so joining takes effect quickly.
+MEMBERSHIP_CACHE_POSITIVE_TTL = 300
+MEMBERSHIP_CACHE_NEGATIVE_TTL = 30
+
 # Custom room settings defaults (can be overridden per game if implemented)
 DEFAULT_ALLOW_THREE_ONE_PLANE = True
 DEFAULT_ALLOW_FOUR_TWO_SINGLE = True
 DEFAULT_ALLOW_FOUR_TWO_PAIR = True
 
+# Prebuilt move-index files, memory-mapped by every process (build: python -m game_logic.pattern_file).
+# A relative path is resolved against the bot's directory. Missing or stale files are built in memory at
+# first use instead; None disables the files entirely.
+PATTERN_TABLE_DIR = "pattern_tables"
+
 # Logging
 LOG_LEVEL = "INFO" # DEBUG, INFO, WARNING, ERROR
 LOG_FILE = "bot.log" # Optional: set to None to log only to console
 
+# Metrics (Prometheus text format on http://127.0.0.1:<port>/metrics); 0 = disabled
+METRICS_PORT = 0
+METRICS_SAMPLE_RATE = 0.1 # Share of handler/API calls whose latency is recorded (counters are always exact)
+
+# Sharded deployment (python -m utils.sharding <module:app_factory>); 0 = single process
+SHARD_COUNT = 0
+SHARED_STORE_PATH = "doudizhu_shared.db" # Cross-shard state: languages, rate limits, membership cache
+SHARED_STORE_CACHE_TTL = 5 # Seconds between a shard's syncs of its shared language replicas (another shard's change shows up after this)
+
+# Game event log (utils/event_log.py): append-only record of every game for offline stats and replays
+EVENT_LOG_DIR = "event_log" # Shards write to their own shard-NNN subdirectory of it
+EVENT_LOG_SEGMENT_BYTES = 64 * 1024 * 1024 # A segment is closed (and exportable) at this size
+
 # AI Player settings
 AI_PLAYER_COUNT_TO_START_GAME = 1 # Min human players to start a game and fill with AI (if < 3)
 # Max AI players: 3 - AI_PLAYER_COUNT_TO_START_GAME
 
+# AI move search (runs in a worker process pool, keep well under PLAY_TIMEOUT_SECONDS)
+AI_SEARCH_TIME_BUDGET_SECONDS = 3.0
+AI_SEARCH_WORKERS = 2 # Worker processes for AI search; 0 = one per CPU core
+AI_ENDGAME_MAX_CARDS = 12 # Cards left on the table at which the exact endgame solver takes over
+
 # Number of top players in leaderboard
 LEADERBOARD_TOP_N = 10
+LEADERBOARD_RANK_BY = "score" # "score" (cumulative totals) or "rating" (utils/ratings.py)
+
+# Player ratings (Elo-style, landlord vs. the farmers' average); recompute: python -m utils.ratings
+RATING_INITIAL = 1500.0
+RATING_K_FACTOR = 24.0 # Scaled up for games with a higher score multiplier
+RATING_PERIOD_SECONDS = 3600 # Batch recompute rates each period's games against the ratings at its start
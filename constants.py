@@ -71,6 +71,7 @@ MIN_TRIPLE_STRAIGHT_LEN = 2 # e.g., 333444 (2 trios)
 JOB_TYPE_BID = "job_bid_timeout"
 JOB_TYPE_PLAY = "job_play_timeout"
 JOB_TYPE_JOIN = "job_join_timeout"
+JOB_TYPE_MATCH = "job_match_deadline" # Matchmaking wait deadline (utils/matchmaking.py)
 
 # Points/Score multipliers
 SCORE_BASE = 1 # Base score for a win/loss
@@ -0,0 +1,239 @@
+# telegram_doudizhu_bot/game_logic/ai_search.py
+"""
+Anytime move search for AI seats.
+
+The hidden hands of the other two seats are sampled from the unseen cards
+(determinization). Each sample scores every candidate move, either with a greedy
+rollout or, once few enough cards remain, with an exact endgame solver backed by a
+transposition table. Sampling continues until the deadline and the candidate with the
+best win rate for the AI's team is returned.
+
+Everything here is pure Python over rank-count vectors so it can run in a worker
+process (see utils/ai_pool.py).
+"""
+import random
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from constants import (
+    TYPE_BOMB, TYPE_ROCKET, TYPE_SINGLE, TYPE_PAIR, TYPE_TRIO, TYPE_TRIO_PLUS_ONE,
+    TYPE_TRIO_PLUS_PAIR, TYPE_STRAIGHT, TYPE_DOUBLE_STRAIGHT, TYPE_TRIPLE_STRAIGHT,
+)
+from game_logic.hand_rules import NUM_RANKS, CountVector, HandInfo, RoomRules, DEFAULT_RULES
+from game_logic.move_generator import Move, get_move_index, legal_moves, _fitting, level_mask
+
+# Hand types the rollout policy considers when leading (full lead enumeration is too slow for rollouts)
+_ROLLOUT_LEAD_TYPES = (
+    TYPE_STRAIGHT, TYPE_DOUBLE_STRAIGHT, TYPE_TRIPLE_STRAIGHT,
+    TYPE_TRIO_PLUS_ONE, TYPE_TRIO_PLUS_PAIR, TYPE_TRIO, TYPE_PAIR, TYPE_SINGLE,
+)
+_DEADLINE_CHECK_INTERVAL = 256 # Solver nodes between deadline checks
+
+Hands = Tuple[CountVector, CountVector, CountVector]
+
+
+class SearchRequest(NamedTuple):
+    """Everything the search needs about the table, as seen from the AI's seat."""
+    seat: int
+    landlord: int
+    hand: CountVector # The AI's own cards
+    unseen: CountVector # Cards neither in the AI's hand nor already played
+    hand_sizes: Tuple[int, int, int] # Cards left per seat
+    prev: Optional[HandInfo] # Play to beat, None when leading
+    last_seat: int # Seat that made `prev`
+    budget_seconds: float
+    rules: RoomRules = DEFAULT_RULES
+    endgame_max_cards: int = 12
+    seed: Optional[int] = None
+    deadline: Optional[float] = None # Absolute time.time() set at submit; queueing time counts against the budget
+
+
+class _SearchTimeout(Exception):
+    pass
+
+
+def _remove(hand: CountVector, counts: CountVector) -> CountVector:
+    return tuple(h - c for h, c in zip(hand, counts))
+
+
+def _with_hand(hands: Hands, seat: int, hand: CountVector) -> Hands:
+    return tuple(hand if i == seat else h for i, h in enumerate(hands))
+
+
+def sample_hidden_hands(request: SearchRequest, rng: random.Random) -> Hands:
+    """Deals the unseen cards to the two other seats according to their hand sizes."""
+    pool = [rank for rank, count in enumerate(request.unseen) for _ in range(count)]
+    rng.shuffle(pool)
+    hands: List[CountVector] = []
+    offset = 0
+    for seat in range(3):
+        if seat == request.seat:
+            hands.append(request.hand)
+            continue
+        counts = [0] * NUM_RANKS
+        for rank in pool[offset:offset + request.hand_sizes[seat]]:
+            counts[rank] += 1
+        offset += request.hand_sizes[seat]
+        hands.append(tuple(counts))
+    return tuple(hands)
+
+
+def greedy_move(hand: CountVector, prev: Optional[HandInfo], hold_back: bool, rules: RoomRules) -> Optional[Move]:
+    """
+    Cheap baseline policy used by rollouts and as the fallback answer.
+    Leads the lowest-ranked group (preferring longer plays at equal rank), follows with the
+    lowest non-bomb answer, bombs only when nothing else beats `prev`, and never beats a teammate.
+    """
+    if prev is None:
+        index = get_move_index(rules)
+        hand_mask = level_mask(hand)
+        hand_size = sum(hand)
+        best: Optional[Move] = None
+        best_key = None
+        for (hand_type, _length), bucket in index.buckets.items():
+            if hand_type not in _ROLLOUT_LEAD_TYPES or bucket.cards > hand_size:
+                continue
+            for move in _fitting(bucket, hand_mask, -1):
+                key = (min(r for r, c in enumerate(move.counts) if c), -bucket.cards)
+                if best_key is None or key < best_key:
+                    best, best_key = move, key
+                break # Buckets are sorted by rank; the first fit is the lowest one
+        if best is not None:
+            return best
+        moves = legal_moves(hand, None, rules)
+        return moves[0] if moves else None
+
+    if hold_back:
+        return None
+    moves = legal_moves(hand, prev, rules)
+    if not moves:
+        return None
+    normal = [m for m in moves if m.info.hand_type not in (TYPE_BOMB, TYPE_ROCKET)]
+    return min(normal or moves, key=lambda m: m.info.rank)
+
+
+def _rollout(hands: Hands, turn: int, prev: Optional[HandInfo], last_seat: int,
+             landlord: int, rules: RoomRules) -> bool:
+    """Plays the position out with greedy_move for every seat. Returns True if the landlord wins."""
+    hands = list(hands)
+    while True:
+        leading = prev is None or last_seat == turn
+        hold_back = not leading and turn != landlord and last_seat != landlord
+        move = greedy_move(hands[turn], None if leading else prev, hold_back, rules)
+        if move is not None:
+            hands[turn] = _remove(hands[turn], move.counts)
+            if not any(hands[turn]):
+                return turn == landlord
+            prev, last_seat = move.info, turn
+        turn = (turn + 1) % 3
+
+
+class EndgameSolver:
+    """
+    Exact perfect-information solver for small positions.
+    Results are memoised in a transposition table keyed by (hands, turn, play to beat, its seat),
+    which is shared across samples of the same search since identical positions recur.
+    """
+
+    def __init__(self, landlord: int, rules: RoomRules, deadline: float):
+        self.landlord = landlord
+        self.rules = rules
+        self.deadline = deadline
+        self.table: Dict[tuple, bool] = {}
+        self.nodes = 0
+
+    def landlord_wins(self, hands: Hands, turn: int, prev: Optional[HandInfo], last_seat: int) -> bool:
+        leading = prev is None or last_seat == turn
+        if leading:
+            prev, last_seat = None, -1
+        key = (hands, turn, prev, last_seat)
+        cached = self.table.get(key)
+        if cached is not None:
+            return cached
+
+        self.nodes += 1
+        if self.nodes % _DEADLINE_CHECK_INTERVAL == 0 and time.monotonic() > self.deadline:
+            raise _SearchTimeout()
+
+        is_landlord = turn == self.landlord
+        next_turn = (turn + 1) % 3
+        moves = sorted(legal_moves(hands[turn], prev, self.rules), key=lambda m: -sum(m.counts))
+        result = not is_landlord # Value if no move achieves this seat's goal
+        for move in moves:
+            hand = _remove(hands[turn], move.counts)
+            if not any(hand):
+                outcome = is_landlord
+            else:
+                outcome = self.landlord_wins(_with_hand(hands, turn, hand), next_turn, move.info, turn)
+            if outcome == is_landlord:
+                result = is_landlord
+                break
+        else:
+            if not leading:
+                outcome = self.landlord_wins(hands, next_turn, prev, last_seat)
+                if outcome == is_landlord:
+                    result = is_landlord
+
+        self.table[key] = result
+        return result
+
+
+def search_move(request: SearchRequest) -> Optional[Move]:
+    """
+    Returns the move the AI should make (None means pass).
+    Always returns within roughly `request.budget_seconds` (or by `request.deadline`);
+    with no completed samples it falls back to the greedy policy. A request whose
+    deadline passed while it waited in the pool gets the greedy move without any search.
+    """
+    budget = request.budget_seconds
+    if request.deadline is not None:
+        budget = min(budget, request.deadline - time.time())
+    deadline = time.monotonic() + budget
+    rng = random.Random(request.seed)
+    seat, landlord, rules = request.seat, request.landlord, request.rules
+    prev = None if request.prev is None or request.last_seat == seat else request.prev
+    hold_back = prev is not None and seat != landlord and request.last_seat != landlord
+    fallback = greedy_move(request.hand, prev, hold_back, rules)
+    if budget <= 0: # Expired in the queue: the caller has already given up on this request
+        return fallback
+
+    candidates: List[Optional[Move]] = list(legal_moves(request.hand, prev, rules))
+    if prev is not None:
+        candidates.append(None)
+    if len(candidates) <= 1:
+        return candidates[0] if candidates else None
+    for move in candidates:
+        if move is not None and move.counts == request.hand:
+            return move # Playing out the whole hand wins immediately
+
+    wins = [0] * len(candidates)
+    samples = 0
+    my_team_is_landlord = seat == landlord
+    exact = sum(request.hand_sizes) <= request.endgame_max_cards
+    solver = EndgameSolver(landlord, rules, deadline) if exact else None
+    next_turn = (seat + 1) % 3
+
+    try:
+        while time.monotonic() < deadline:
+            hands = sample_hidden_hands(request, rng)
+            sample_wins = []
+            for move in candidates:
+                if move is None:
+                    after, play, play_seat = hands, prev, request.last_seat
+                else:
+                    after = _with_hand(hands, seat, _remove(request.hand, move.counts))
+                    play, play_seat = move.info, seat
+                if solver is not None:
+                    landlord_won = solver.landlord_wins(after, next_turn, play, play_seat)
+                else:
+                    landlord_won = _rollout(after, next_turn, play, play_seat, landlord, rules)
+                sample_wins.append(landlord_won == my_team_is_landlord)
+            wins = [w + won for w, won in zip(wins, sample_wins)]
+            samples += 1
+    except _SearchTimeout:
+        pass
+
+    if not samples:
+        return fallback
+    best = max(range(len(candidates)), key=lambda i: (wins[i], candidates[i] == fallback))
+    return candidates[best]
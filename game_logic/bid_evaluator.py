@@ -0,0 +1,204 @@
+# telegram_doudizhu_bot/game_logic/bid_evaluator.py
+"""
+Lookup-table bid evaluation for AI seats and for players whose bid times out.
+
+A 17-card hand is reduced to five small features of its rank-count vector: rocket,
+bombs, other control cards (2s and a lone joker), cards covered by straights and loose
+low singles. Together they index a 720-cell table holding the landlord win rate of hands
+with those features, so evaluating a hand is a few integer operations and one list
+lookup, and whole (n, 15) batches are evaluated with array operations for the simulator.
+
+The table is calibrated from self-play (game_logic/simulator.py): every seat bids 3, so
+the first bidder becomes landlord with whatever it was dealt, and the outcome is
+recorded against the features of that dealt hand. Build it once with
+    python -m game_logic.bid_evaluator [games]
+which writes PATTERN_TABLE_DIR/bid_table_v1.npy. Without the file a logistic prior over
+the same features is used.
+"""
+import os
+import sys
+import time
+from typing import Optional, Sequence
+
+from constants import RANK_3, RANK_K, RANK_A, RANK_2, RANK_BLACK_JOKER, RANK_RED_JOKER
+from game_logic.pattern_file import PATTERN_TABLE_DIR # Config value resolved against the package directory
+
+TABLE_VERSION = 1
+# Feature sizes: rocket, bombs (0..2+), other controls (0..5+), straight coverage / 3 (0..4+), loose singles / 2 (0..3+)
+FEATURE_SIZES = (2, 3, 6, 5, 4)
+TABLE_SIZE = 2 * 3 * 6 * 5 * 4
+MIN_STRAIGHT = 5
+# Win rate as landlord needed to bid 1, 2, 3 (a bid of 3 doubles down on a clearly strong hand)
+BID_WIN_RATE_THRESHOLDS = (0.52, 0.6, 0.68)
+PRIOR_WEIGHT = 50.0 # Pseudo-games of the prior blended into each calibrated cell
+
+_SEQUENCE_RANKS = range(RANK_3, RANK_A + 1)
+
+
+def hand_features(counts: Sequence[int]) -> int:
+    """Table index of one 15-slot rank-count vector (a tuple, list or numpy row of any integer dtype)."""
+    counts = [int(count) for count in counts] # numpy int8 rows would overflow in the index arithmetic
+    rocket = counts[RANK_BLACK_JOKER] & counts[RANK_RED_JOKER]
+    bombs = 0
+    for rank in range(RANK_2 + 1):
+        if counts[rank] == 4:
+            bombs += 1
+    controls = counts[RANK_2] + (0 if rocket else counts[RANK_BLACK_JOKER] + counts[RANK_RED_JOKER])
+
+    covered = [False] * len(_SEQUENCE_RANKS)
+    run = 0
+    for rank in _SEQUENCE_RANKS:
+        if counts[rank]:
+            run += 1
+            if run >= MIN_STRAIGHT:
+                for r in range(rank - run + 1, rank + 1):
+                    covered[r] = True
+        else:
+            run = 0
+    coverage = 0
+    singles = 0
+    for rank in _SEQUENCE_RANKS:
+        if covered[rank]:
+            coverage += 1
+        elif counts[rank] == 1 and rank <= RANK_K:
+            singles += 1
+
+    return ((((rocket * 3 + min(bombs, 2)) * 6 + min(controls, 5)) * 5 + min(coverage // 3, 4)) * 4
+            + min(singles // 2, 3))
+
+
+def batch_features(counts):
+    """Table indexes of an (n, 15) count array."""
+    import numpy as np # Local import
+    counts = np.asarray(counts)
+    rocket = (counts[:, RANK_BLACK_JOKER] & counts[:, RANK_RED_JOKER]).astype(np.int64)
+    bombs = (counts[:, :RANK_2 + 1] == 4).sum(axis=1)
+    jokers = counts[:, RANK_BLACK_JOKER].astype(np.int64) + counts[:, RANK_RED_JOKER]
+    controls = counts[:, RANK_2] + np.where(rocket == 1, 0, jokers)
+
+    present = counts[:, RANK_3:RANK_A + 1] > 0
+    windows = np.lib.stride_tricks.sliding_window_view(present, MIN_STRAIGHT, axis=1).all(axis=2)
+    covered = np.zeros_like(present)
+    for offset in range(MIN_STRAIGHT): # A rank is covered if any 5-long run containing it is complete
+        covered[:, offset:offset + windows.shape[1]] |= windows
+    coverage = covered.sum(axis=1)
+    singles = ((counts[:, RANK_3:RANK_K + 1] == 1) & ~covered[:, :RANK_K - RANK_3 + 1]).sum(axis=1)
+
+    return ((((rocket * 3 + np.minimum(bombs, 2)) * 6 + np.minimum(controls, 5)) * 5
+             + np.minimum(coverage // 3, 4)) * 4 + np.minimum(singles // 2, 3))
+
+
+def prior_table():
+    """Logistic prior over the features, used before calibration and to smooth sparse cells."""
+    import numpy as np # Local import
+    rocket, bombs, controls, coverage, singles = np.indices(FEATURE_SIZES).reshape(len(FEATURE_SIZES), -1)
+    score = 1.5 * rocket + 0.6 * bombs + 0.5 * controls + 0.05 * coverage + 0.02 * singles - 0.5
+    return 1.0 / (1.0 + np.exp(-score))
+
+
+def calibrate(games: int = 400000, seed: Optional[int] = 0, batch_size: int = 20000):
+    """Landlord win rate per table cell from `games` simulated games, blended with the prior."""
+    import numpy as np # Local import
+    from game_logic.simulator import simulate # Local import
+
+    def everyone_bids_three(counts):
+        return np.full(len(counts), 3, dtype=np.int8)
+
+    wins = np.zeros(TABLE_SIZE)
+    seen = np.zeros(TABLE_SIZE)
+    for result in simulate(games, batch_size, seed, bid_strategy=everyone_bids_three):
+        cells = batch_features(result.dealt[np.arange(result.landlord.size), result.landlord])
+        wins += np.bincount(cells, weights=result.landlord_won, minlength=TABLE_SIZE)
+        seen += np.bincount(cells, minlength=TABLE_SIZE)
+    return (wins + PRIOR_WEIGHT * prior_table()) / (seen + PRIOR_WEIGHT)
+
+
+def bid_table_path(directory: Optional[str] = PATTERN_TABLE_DIR) -> Optional[str]:
+    if not directory:
+        return None
+    return os.path.join(directory, f"bid_table_v{TABLE_VERSION}.npy")
+
+
+class BidEvaluator:
+    """Win-rate lookup and bid choice. Use the module-level get_bid_evaluator()."""
+
+    def __init__(self, table, thresholds: Sequence[float] = BID_WIN_RATE_THRESHOLDS):
+        self.table = table # numpy array for batches
+        self._cells = table.tolist() # Plain floats: faster than numpy scalars for single hands
+        self.thresholds = tuple(thresholds)
+
+    def win_rate(self, counts: Sequence[int]) -> float:
+        """Estimated landlord win rate of a hand (15-slot rank counts, e.g. card_codec.rank_counts(mask))."""
+        return self._cells[hand_features(counts)]
+
+    def desired_bid(self, counts: Sequence[int]) -> int:
+        """0 (pass) to 3."""
+        rate = self._cells[hand_features(counts)]
+        bid = 0
+        for threshold in self.thresholds:
+            if rate >= threshold:
+                bid += 1
+        return bid
+
+    def choose_bid(self, counts: Sequence[int], highest_bid: int = 0) -> int:
+        """
+        The bid to make when `highest_bid` is the current high bid: the desired bid if it
+        raises, else 0 (pass). Used by AI seats and as the auto-bid of a timed-out player.
+        """
+        bid = self.desired_bid(counts)
+        return bid if bid > highest_bid else 0
+
+    def batch_win_rates(self, counts):
+        return self.table[batch_features(counts)]
+
+    def batch_bids(self, counts):
+        """(n, 15) rank counts -> (n,) bids; a simulator BidStrategy."""
+        import numpy as np # Local import
+        return np.digitize(self.batch_win_rates(counts), self.thresholds).astype(np.int8)
+
+
+_evaluator: Optional[BidEvaluator] = None
+
+
+def get_bid_evaluator() -> BidEvaluator:
+    """Shared evaluator: the calibrated table from PATTERN_TABLE_DIR if built, else the prior."""
+    global _evaluator
+    if _evaluator is None:
+        import numpy as np # Local import
+        table = None
+        path = bid_table_path()
+        if path and os.path.exists(path):
+            try:
+                table = np.load(path)
+                if table.shape != (TABLE_SIZE,):
+                    print(f"Ignoring {path}: unexpected shape {table.shape}")
+                    table = None
+            except (OSError, ValueError) as e:
+                print(f"Could not load the bid table {path}: {e}")
+        _evaluator = BidEvaluator(table if table is not None else prior_table())
+    return _evaluator
+
+
+def auto_bid(hand_mask: int, highest_bid: int = 0) -> int:
+    """Bid for an AI seat or a player whose bid timed out, from their card_codec hand mask (0 = pass)."""
+    from game_logic.card_codec import rank_counts # Local import
+    return get_bid_evaluator().choose_bid(rank_counts(hand_mask), highest_bid)
+
+
+def table_bids(counts):
+    """Simulator BidStrategy backed by the shared evaluator: simulate(..., bid_strategy=table_bids)."""
+    return get_bid_evaluator().batch_bids(counts)
+
+
+if __name__ == "__main__":
+    import numpy as np # Local import
+    path = bid_table_path(sys.argv[2] if len(sys.argv) > 2 else PATTERN_TABLE_DIR)
+    if not path:
+        raise SystemExit("PATTERN_TABLE_DIR is not configured")
+    started = time.perf_counter()
+    table = calibrate(int(sys.argv[1]) if len(sys.argv) > 1 else 400000)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp.npy"
+    np.save(tmp_path, table)
+    os.replace(tmp_path, path)
+    print(f"Wrote {path} in {time.perf_counter() - started:.1f}s")
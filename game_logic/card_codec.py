@@ -0,0 +1,159 @@
+# telegram_doudizhu_bot/game_logic/card_codec.py
+"""
+Compact card encoding.
+
+Each of the 54 cards gets a bit: regular cards are rank * 4 + suit (RANK_3..RANK_2 x
+SUIT_SPADES..SUIT_DIAMONDS), the black and red jokers are bits 52 and 53. A hand is
+then a single int, which is cheap to store, hash and compare, and serves as the cache
+key for rendered hand strings and card-selection keyboards.
+"""
+from functools import lru_cache
+from typing import Iterable, Optional, Tuple
+
+from constants import (
+    RANK_2, RANK_BLACK_JOKER, RANK_RED_JOKER, SUIT_JOKER,
+    RANK_ORDER_MAP_INTERNAL_TO_DISPLAY, RANK_DISPLAY_TO_INTERNAL_MAP,
+    SUIT_DISPLAY_MAP, SUIT_CHAR_TO_INTERNAL_MAP,
+    CALLBACK_SELECT_CARD_PREFIX, CALLBACK_PLAY_SELECTED_CARDS, CALLBACK_PASS_TURN, CALLBACK_RESET_SELECTION,
+)
+from i18n.translator import register_reload_hook
+
+NUM_CARDS = 54
+BLACK_JOKER_BIT = 52
+RED_JOKER_BIT = 53
+FULL_DECK_MASK = (1 << NUM_CARDS) - 1
+KEYBOARD_ROW_WIDTH = 6
+RENDER_CACHE_SIZE = 16384
+
+SUIT_INTERNAL_TO_CHAR_MAP = {v: k for k, v in SUIT_CHAR_TO_INTERNAL_MAP.items()}
+_POPCOUNT_4 = tuple(bin(i).count("1") for i in range(16))
+
+
+def card_index(rank: int, suit: int) -> int:
+    """Bit position of a card (jokers ignore the suit)."""
+    if rank == RANK_BLACK_JOKER:
+        return BLACK_JOKER_BIT
+    if rank == RANK_RED_JOKER:
+        return RED_JOKER_BIT
+    return rank * 4 + suit
+
+
+def card_from_index(index: int) -> Tuple[int, int]:
+    """(rank, suit) of a bit position."""
+    if index == BLACK_JOKER_BIT:
+        return RANK_BLACK_JOKER, SUIT_JOKER
+    if index == RED_JOKER_BIT:
+        return RANK_RED_JOKER, SUIT_JOKER
+    return index // 4, index % 4
+
+
+def mask_from_cards(cards: Iterable) -> int:
+    """Encodes Card objects (anything with .rank and .suit) as a 54-bit mask."""
+    mask = 0
+    for card in cards:
+        mask |= 1 << card_index(card.rank, card.suit)
+    return mask
+
+
+def iter_indices(mask: int):
+    """Set bit positions in ascending order, i.e. cards sorted by rank then suit."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+@lru_cache(maxsize=RENDER_CACHE_SIZE)
+def rank_counts(mask: int) -> Tuple[int, ...]:
+    """15-slot rank-count vector (the hand_rules / move_generator input) for a card mask."""
+    counts = [_POPCOUNT_4[(mask >> (rank * 4)) & 0xF] for rank in range(RANK_2 + 1)]
+    counts.append((mask >> BLACK_JOKER_BIT) & 1)
+    counts.append((mask >> RED_JOKER_BIT) & 1)
+    return tuple(counts)
+
+
+def card_label(index: int) -> str:
+    rank, suit = card_from_index(index)
+    return f"{SUIT_DISPLAY_MAP[suit]}{RANK_ORDER_MAP_INTERNAL_TO_DISPLAY[rank]}"
+
+
+_CARD_LABELS = tuple(card_label(i) for i in range(NUM_CARDS))
+
+
+def card_callback_data(index: int) -> str:
+    """callback_data of a card button, e.g. selcard_H_3 or selcard_RJ."""
+    rank, suit = card_from_index(index)
+    rank_str = RANK_ORDER_MAP_INTERNAL_TO_DISPLAY[rank]
+    if suit == SUIT_JOKER:
+        return f"{CALLBACK_SELECT_CARD_PREFIX}{rank_str}"
+    return f"{CALLBACK_SELECT_CARD_PREFIX}{SUIT_INTERNAL_TO_CHAR_MAP[suit]}_{rank_str}"
+
+
+_CARD_CALLBACKS = tuple(card_callback_data(i) for i in range(NUM_CARDS))
+
+
+def parse_card_callback(data: str) -> Optional[int]:
+    """Inverse of card_callback_data. Returns None for malformed data."""
+    if not data.startswith(CALLBACK_SELECT_CARD_PREFIX):
+        return None
+    body = data[len(CALLBACK_SELECT_CARD_PREFIX):]
+    suit_char, _sep, rank_str = body.rpartition("_")
+    rank = RANK_DISPLAY_TO_INTERNAL_MAP.get(rank_str)
+    if rank is None:
+        return None
+    if rank in (RANK_BLACK_JOKER, RANK_RED_JOKER):
+        return card_index(rank, SUIT_JOKER)
+    suit = SUIT_CHAR_TO_INTERNAL_MAP.get(suit_char)
+    return None if suit is None else card_index(rank, suit)
+
+
+@lru_cache(maxsize=RENDER_CACHE_SIZE)
+def format_hand(mask: int, separator: str = ", ") -> str:
+    """Display string for a hand, sorted by rank; cached per (mask, separator)."""
+    return separator.join(_CARD_LABELS[i] for i in iter_indices(mask))
+
+
+@lru_cache(maxsize=RENDER_CACHE_SIZE)
+def selection_keyboard_layout(hand_mask: int, selected_mask: int,
+                              row_width: int = KEYBOARD_ROW_WIDTH) -> Tuple[Tuple[Tuple[str, str], ...], ...]:
+    """
+    Card-button rows as ((text, callback_data), ...) tuples; selected cards are ticked.
+    Telegram-independent so it can be cached and reused across chats and languages.
+    """
+    buttons = [
+        (("✅" if selected_mask >> i & 1 else "") + _CARD_LABELS[i], _CARD_CALLBACKS[i])
+        for i in iter_indices(hand_mask)
+    ]
+    return tuple(tuple(buttons[i:i + row_width]) for i in range(0, len(buttons), row_width))
+
+
+@lru_cache(maxsize=RENDER_CACHE_SIZE)
+def build_selection_keyboard(hand_mask: int, selected_mask: int, lang: str):
+    """
+    InlineKeyboardMarkup for card selection (card rows + play/pass/reset row), cached per
+    (hand, selection, language). A toggle only changes selected_mask, so repeated states
+    are served straight from the cache. Telegram objects are immutable, so sharing is safe.
+    """
+    from telegram import InlineKeyboardButton, InlineKeyboardMarkup # Local import
+    from i18n.translator import _ # Local import
+
+    rows = [
+        [InlineKeyboardButton(text, callback_data=data) for text, data in row]
+        for row in selection_keyboard_layout(hand_mask, selected_mask)
+    ]
+    rows.append([
+        InlineKeyboardButton(_("Play", lang), callback_data=CALLBACK_PLAY_SELECTED_CARDS),
+        InlineKeyboardButton(_("Pass", lang), callback_data=CALLBACK_PASS_TURN),
+        InlineKeyboardButton(_("Reset", lang), callback_data=CALLBACK_RESET_SELECTION),
+    ])
+    return InlineKeyboardMarkup(rows)
+
+
+def clear_render_caches() -> None:
+    """Drops cached strings/keyboards (e.g. after a translation reload)."""
+    format_hand.cache_clear()
+    selection_keyboard_layout.cache_clear()
+    build_selection_keyboard.cache_clear()
+
+
+register_reload_hook(clear_render_caches)
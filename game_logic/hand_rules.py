@@ -0,0 +1,177 @@
+# telegram_doudizhu_bot/game_logic/hand_rules.py
+"""
+Hand classification for Dou Dizhu plays.
+
+A play is described by its 15-slot rank-count vector (index RANK_3..RANK_RED_JOKER,
+value = how many cards of that rank are in the play). Instead of sorting cards and
+pattern-matching on every /play, every legal pattern is enumerated once per set of
+room rules and stored in a dict keyed by the count vector, so classifying a play is
+a single hash lookup.
+"""
+from functools import lru_cache
+from itertools import combinations, combinations_with_replacement
+from typing import Dict, Iterable, Iterator, Mapping, NamedTuple, Sequence, Tuple
+
+from constants import (
+    RANK_3, RANK_A, RANK_2, RANK_BLACK_JOKER, RANK_RED_JOKER,
+    TYPE_INVALID, TYPE_SINGLE, TYPE_PAIR, TYPE_TRIO, TYPE_TRIO_PLUS_ONE, TYPE_TRIO_PLUS_PAIR,
+    TYPE_STRAIGHT, TYPE_DOUBLE_STRAIGHT, TYPE_TRIPLE_STRAIGHT,
+    TYPE_TRIPLE_STRAIGHT_PLUS_SINGLES, TYPE_TRIPLE_STRAIGHT_PLUS_PAIRS,
+    TYPE_QUAD_PLUS_TWO_SINGLES, TYPE_QUAD_PLUS_TWO_PAIRS, TYPE_BOMB, TYPE_ROCKET,
+    MIN_STRAIGHT_LEN, MIN_DOUBLE_STRAIGHT_LEN, MIN_TRIPLE_STRAIGHT_LEN,
+)
+
+try:
+    from config import DEFAULT_ALLOW_THREE_ONE_PLANE, DEFAULT_ALLOW_FOUR_TWO_SINGLE, DEFAULT_ALLOW_FOUR_TWO_PAIR
+except ImportError:
+    print("CRITICAL: config.py not found in game_logic.hand_rules. Using fallback defaults.")
+    DEFAULT_ALLOW_THREE_ONE_PLANE = True
+    DEFAULT_ALLOW_FOUR_TWO_SINGLE = True
+    DEFAULT_ALLOW_FOUR_TWO_PAIR = True
+
+NUM_RANKS = 15
+MAX_HAND_SIZE = 20 # Landlord hand after taking the kitty
+SEQUENCE_RANKS = range(RANK_3, RANK_A + 1) # 2s and jokers never appear in sequences
+REGULAR_RANKS = range(RANK_3, RANK_2 + 1) # Ranks with four suits
+
+CountVector = Tuple[int, ...]
+
+
+class HandInfo(NamedTuple):
+    """Classification result: hand type, primary (comparison) rank and sequence length."""
+    hand_type: str
+    rank: int
+    length: int
+
+
+class RoomRules(NamedTuple):
+    """Optional hand types that can be toggled per room."""
+    allow_three_one_plane: bool = DEFAULT_ALLOW_THREE_ONE_PLANE
+    allow_four_two_single: bool = DEFAULT_ALLOW_FOUR_TWO_SINGLE
+    allow_four_two_pair: bool = DEFAULT_ALLOW_FOUR_TWO_PAIR
+
+
+INVALID_HAND = HandInfo(TYPE_INVALID, -1, 0)
+DEFAULT_RULES = RoomRules()
+
+
+def counts_from_ranks(ranks: Iterable[int]) -> CountVector:
+    """Builds a rank-count vector from an iterable of internal rank values."""
+    counts = [0] * NUM_RANKS
+    for rank in ranks:
+        counts[rank] += 1
+    return tuple(counts)
+
+
+def _vector(parts: Iterable[Tuple[int, int]]) -> CountVector:
+    counts = [0] * NUM_RANKS
+    for rank, count in parts:
+        counts[rank] += count
+    return tuple(counts)
+
+
+def _single_kickers(excluded: Sequence[int], size: int) -> Iterator[Tuple[int, ...]]:
+    """Multisets of `size` kicker ranks outside `excluded` (rocket can't be split into kickers)."""
+    candidates = [r for r in range(NUM_RANKS) if r not in excluded]
+    for kickers in combinations_with_replacement(candidates, size):
+        if RANK_BLACK_JOKER in kickers and RANK_RED_JOKER in kickers:
+            continue
+        if any(kickers.count(r) > (1 if r >= RANK_BLACK_JOKER else 4) for r in set(kickers)):
+            continue
+        yield kickers
+
+
+def _pair_kickers(excluded: Sequence[int], size: int) -> Iterator[Tuple[int, ...]]:
+    """Sets of `size` distinct pair ranks outside `excluded` (jokers can't form pairs)."""
+    candidates = [r for r in REGULAR_RANKS if r not in excluded]
+    return combinations(candidates, size)
+
+
+def iter_hand_patterns(rules: RoomRules = DEFAULT_RULES) -> Iterator[Tuple[CountVector, HandInfo]]:
+    """
+    Yields every legal (count vector, HandInfo) pair under the given room rules.
+    Patterns are yielded in priority order: when a vector could be read as several
+    types (e.g. 333444555666 as a 4-long airplane or a 3-long airplane with 666 wings),
+    the first interpretation yielded is the one used by the classifier.
+    """
+    yield _vector([(RANK_BLACK_JOKER, 1), (RANK_RED_JOKER, 1)]), HandInfo(TYPE_ROCKET, RANK_RED_JOKER, 1)
+    for r in REGULAR_RANKS:
+        yield _vector([(r, 4)]), HandInfo(TYPE_BOMB, r, 1)
+    for r in range(NUM_RANKS):
+        yield _vector([(r, 1)]), HandInfo(TYPE_SINGLE, r, 1)
+    for r in REGULAR_RANKS:
+        yield _vector([(r, 2)]), HandInfo(TYPE_PAIR, r, 1)
+    for r in REGULAR_RANKS:
+        yield _vector([(r, 3)]), HandInfo(TYPE_TRIO, r, 1)
+    for r in REGULAR_RANKS:
+        for k in range(NUM_RANKS):
+            if k != r:
+                yield _vector([(r, 3), (k, 1)]), HandInfo(TYPE_TRIO_PLUS_ONE, r, 1)
+    for r in REGULAR_RANKS:
+        for k in REGULAR_RANKS:
+            if k != r:
+                yield _vector([(r, 3), (k, 2)]), HandInfo(TYPE_TRIO_PLUS_PAIR, r, 1)
+
+    # Sequences: (hand type, cards per rank, minimum length)
+    for seq_type, width, min_len in (
+        (TYPE_STRAIGHT, 1, MIN_STRAIGHT_LEN),
+        (TYPE_DOUBLE_STRAIGHT, 2, MIN_DOUBLE_STRAIGHT_LEN),
+        (TYPE_TRIPLE_STRAIGHT, 3, MIN_TRIPLE_STRAIGHT_LEN),
+    ):
+        for length in range(min_len, len(SEQUENCE_RANKS) + 1):
+            if length * width > MAX_HAND_SIZE:
+                break
+            for start in range(RANK_3, RANK_A - length + 2):
+                body = [(r, width) for r in range(start, start + length)]
+                yield _vector(body), HandInfo(seq_type, start + length - 1, length)
+
+    if rules.allow_four_two_single:
+        for r in REGULAR_RANKS:
+            for kickers in _single_kickers([r], 2):
+                yield _vector([(r, 4)] + [(k, 1) for k in kickers]), HandInfo(TYPE_QUAD_PLUS_TWO_SINGLES, r, 1)
+    if rules.allow_four_two_pair:
+        for r in REGULAR_RANKS:
+            for kickers in _pair_kickers([r], 2):
+                yield _vector([(r, 4)] + [(k, 2) for k in kickers]), HandInfo(TYPE_QUAD_PLUS_TWO_PAIRS, r, 1)
+
+    # Airplanes with wings: one kicker (single or pair) per trio in the body
+    for wing_type, wing_width, kicker_iter, allowed in (
+        (TYPE_TRIPLE_STRAIGHT_PLUS_SINGLES, 1, _single_kickers, rules.allow_three_one_plane),
+        (TYPE_TRIPLE_STRAIGHT_PLUS_PAIRS, 2, _pair_kickers, True),
+    ):
+        if not allowed:
+            continue
+        for length in range(MIN_TRIPLE_STRAIGHT_LEN, len(SEQUENCE_RANKS) + 1):
+            if length * (3 + wing_width) > MAX_HAND_SIZE:
+                break
+            for start in range(RANK_3, RANK_A - length + 2):
+                body_ranks = list(range(start, start + length))
+                body = [(r, 3) for r in body_ranks]
+                info = HandInfo(wing_type, start + length - 1, length)
+                for kickers in kicker_iter(body_ranks, length):
+                    yield _vector(body + [(k, wing_width) for k in kickers]), info
+
+
+@lru_cache(maxsize=None)
+def get_classification_table(rules: RoomRules = DEFAULT_RULES) -> Mapping[CountVector, HandInfo]:
+    """
+    The count vector -> HandInfo lookup table, built in memory once per rule set (a plain
+    dict even when the move index is mapped from a pattern file: it's the fastest lookup).
+    """
+    table: Dict[CountVector, HandInfo] = {}
+    for counts, info in iter_hand_patterns(rules):
+        table.setdefault(counts, info)
+    return table
+
+
+def classify_counts(counts: Sequence[int], rules: RoomRules = DEFAULT_RULES) -> HandInfo:
+    """
+    Classifies a play given its rank-count vector.
+    Returns INVALID_HAND if the cards don't form a legal hand under `rules`.
+    """
+    return get_classification_table(rules).get(tuple(counts), INVALID_HAND)
+
+
+def classify_ranks(ranks: Iterable[int], rules: RoomRules = DEFAULT_RULES) -> HandInfo:
+    """Convenience wrapper around classify_counts for a list of card ranks."""
+    return classify_counts(counts_from_ranks(ranks), rules)
@@ -0,0 +1,184 @@
+# telegram_doudizhu_bot/game_logic/move_generator.py
+"""
+Legal-move generation ("what can beat this hand").
+
+All legal patterns from hand_rules are indexed by (hand type, sequence length) and
+sorted by rank. Each pattern also carries a packed "level mask": bit r of level k is
+set when the pattern needs at least k cards of rank r. A pattern fits in a hand iff
+`pattern_mask & ~hand_mask == 0`, so checking a candidate is one integer operation
+and no subsets of the hand are ever enumerated. Patterns of the same rank share a body
+(the trio run of an airplane, the quad of a four-with-two), so each bucket also keeps,
+per rank, the bits every pattern of that rank needs: a hand lacking them skips the whole
+run, which is most of the ~28k patterns when leading.
+"""
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from constants import TYPE_INVALID, TYPE_BOMB, TYPE_ROCKET
+from game_logic.hand_rules import (
+    NUM_RANKS, CountVector, HandInfo, RoomRules, DEFAULT_RULES, get_classification_table,
+)
+
+LEVEL_BITS = NUM_RANKS # One bit per rank for each "at least k cards" level
+
+
+class Move(NamedTuple):
+    """A concrete play: the cards to remove (as a count vector) and its classification."""
+    counts: CountVector
+    info: HandInfo
+
+
+class _Bucket(NamedTuple):
+    cards: int # Cards in every pattern of the bucket (type and length fix the size)
+    ranks: List[int] # Sorted primary ranks, parallel to masks/moves
+    masks: List[int]
+    moves: Sequence[Move] # A list, or pattern_file.MappedMoves when mapped from a pattern file
+    groups: List[Tuple[int, int, int, int]] # (rank, start, end, bits shared by masks[start:end]) per rank
+
+
+class MoveIndex(NamedTuple):
+    buckets: Dict[Tuple[str, int], _Bucket]
+    bombs: _Bucket
+    rocket: Move
+    rocket_mask: int
+
+
+def level_mask(counts: Sequence[int]) -> int:
+    """Packs a count vector into 4 stacked 15-bit masks (count >= 1, >= 2, >= 3, >= 4)."""
+    mask = 0
+    for rank, count in enumerate(counts):
+        for level in range(min(count, 4)):
+            mask |= 1 << (level * LEVEL_BITS + rank)
+    return mask
+
+
+def make_bucket(cards: int, ranks: List[int], masks: List[int], moves: Sequence[Move]) -> _Bucket:
+    """A _Bucket over rank-sorted parallel lists, with its per-rank groups."""
+    groups = []
+    start = 0
+    while start < len(ranks):
+        end, common = start + 1, masks[start]
+        while end < len(ranks) and ranks[end] == ranks[start]:
+            common &= masks[end]
+            end += 1
+        groups.append((ranks[start], start, end, common))
+        start = end
+    return _Bucket(cards, ranks, masks, moves, groups)
+
+
+@lru_cache(maxsize=None)
+def get_move_index(rules: RoomRules = DEFAULT_RULES) -> MoveIndex:
+    """Builds (once per rule set) the (type, length) -> patterns index, or maps it from the prebuilt file."""
+    from game_logic.pattern_file import open_pattern_file # Local import
+    patterns = open_pattern_file(rules)
+    if patterns is not None:
+        return patterns.move_index()
+
+    grouped: Dict[Tuple[str, int], List[Tuple[int, int, Move]]] = {}
+    for counts, info in get_classification_table(rules).items():
+        grouped.setdefault((info.hand_type, info.length), []).append((info.rank, level_mask(counts), Move(counts, info)))
+
+    buckets: Dict[Tuple[str, int], _Bucket] = {}
+    for key, entries in grouped.items():
+        entries.sort(key=lambda e: e[0])
+        cards = sum(entries[0][2].counts)
+        buckets[key] = make_bucket(cards, [e[0] for e in entries], [e[1] for e in entries], [e[2] for e in entries])
+
+    rocket = buckets.pop((TYPE_ROCKET, 1))
+    bombs = buckets.pop((TYPE_BOMB, 1))
+    return MoveIndex(buckets, bombs, rocket.moves[0], rocket.masks[0])
+
+
+def can_beat(play: HandInfo, prev: Optional[HandInfo]) -> bool:
+    """Returns True if `play` is a legal response to `prev` (None/invalid prev means leading)."""
+    if play.hand_type == TYPE_INVALID:
+        return False
+    if prev is None or prev.hand_type == TYPE_INVALID:
+        return True
+    if prev.hand_type == TYPE_ROCKET:
+        return False
+    if play.hand_type == TYPE_ROCKET:
+        return True
+    if play.hand_type == TYPE_BOMB:
+        return prev.hand_type != TYPE_BOMB or play.rank > prev.rank
+    return play.hand_type == prev.hand_type and play.length == prev.length and play.rank > prev.rank
+
+
+def _fitting(bucket: _Bucket, hand_mask: int, above_rank: int) -> List[Move]:
+    masks, moves = bucket.masks, bucket.moves
+    missing = ~hand_mask
+    fitting: List[Move] = []
+    for rank, start, end, common in bucket.groups:
+        if rank <= above_rank or common & missing: # Every pattern of this rank needs bits the hand lacks
+            continue
+        if end - start == 1:
+            fitting.append(moves[start])
+        else:
+            fitting.extend([moves[i] for i in range(start, end) if not masks[i] & missing])
+    return fitting
+
+
+def _any_fitting(bucket: _Bucket, hand_mask: int, above_rank: int) -> bool:
+    masks = bucket.masks
+    missing = ~hand_mask
+    return any(rank > above_rank and not common & missing and any(not masks[i] & missing for i in range(start, end))
+               for rank, start, end, common in bucket.groups)
+
+
+def legal_moves(
+    hand_counts: Sequence[int],
+    prev: Optional[HandInfo] = None,
+    rules: RoomRules = DEFAULT_RULES
+) -> List[Move]:
+    """
+    Returns every play from `hand_counts` that is legal after `prev`.
+    With no previous play (or an invalid one) the player is leading and any pattern they hold is returned.
+    Bombs and the rocket are included as overrides. Passing is not included.
+    """
+    index = get_move_index(rules)
+    hand_mask = level_mask(hand_counts)
+    leading = prev is None or prev.hand_type == TYPE_INVALID
+
+    moves: List[Move] = []
+    if leading:
+        hand_size = sum(hand_counts)
+        for bucket in index.buckets.values():
+            if bucket.cards <= hand_size:
+                moves.extend(_fitting(bucket, hand_mask, -1))
+    elif prev.hand_type == TYPE_ROCKET:
+        return moves
+    elif prev.hand_type != TYPE_BOMB:
+        bucket = index.buckets.get((prev.hand_type, prev.length))
+        if bucket:
+            moves.extend(_fitting(bucket, hand_mask, prev.rank))
+
+    bomb_floor = prev.rank if not leading and prev.hand_type == TYPE_BOMB else -1
+    moves.extend(_fitting(index.bombs, hand_mask, bomb_floor))
+    if not index.rocket_mask & ~hand_mask:
+        moves.append(index.rocket)
+    return moves
+
+
+def has_legal_move(
+    hand_counts: Sequence[int],
+    prev: Optional[HandInfo] = None,
+    rules: RoomRules = DEFAULT_RULES
+) -> bool:
+    """
+    Fast path for auto-pass: True if the hand holds at least one play that beats `prev`.
+    Stops at the first fitting pattern instead of building the full move list.
+    """
+    if prev is None or prev.hand_type == TYPE_INVALID:
+        return any(hand_counts)
+    if prev.hand_type == TYPE_ROCKET:
+        return False
+
+    index = get_move_index(rules)
+    hand_mask = level_mask(hand_counts)
+    if not index.rocket_mask & ~hand_mask:
+        return True
+    bomb_floor = prev.rank if prev.hand_type == TYPE_BOMB else -1
+    if _any_fitting(index.bombs, hand_mask, bomb_floor):
+        return True
+    bucket = index.buckets.get((prev.hand_type, prev.length))
+    return bool(bucket) and prev.hand_type != TYPE_BOMB and _any_fitting(bucket, hand_mask, prev.rank)
@@ -0,0 +1,238 @@
+# telegram_doudizhu_bot/game_logic/pattern_file.py
+"""
+Precomputed move index in a versioned binary file, opened with mmap.
+
+    python -m game_logic.pattern_file            # builds one file per rule set into PATTERN_TABLE_DIR
+
+Building the move index takes most of the table startup time and memory per process. With
+the files in place, get_move_index() maps it read-only instead, so every worker (bot
+shards, AI pool processes) shares the same physical pages through the OS page cache. The
+classification table stays an in-memory dict: classify_counts runs on every play, and a
+dict lookup is several times faster than probing a hash table in the mapped file.
+
+A relative PATTERN_TABLE_DIR is resolved against the package directory, not the cwd. The
+header carries a digest of the generator inputs (sequence minimums, hand size, type codes
+and the rule set's full pattern list); a file built from other inputs, e.g. before a rules
+change, is ignored and the index is built in memory.
+
+Layout (little endian):
+    header      MAGIC, FORMAT_VERSION, rules flags, inputs digest, bucket/move counts, section offsets
+    buckets     per (type, length): type code, length, cards, first move, move count
+    moves       level masks (uint64), ranks (int8) and count bytes (15 each), bucket by bucket,
+                every bucket sorted by rank like move_generator's in-memory index
+"""
+import hashlib
+import mmap
+import os
+import struct
+import sys
+from itertools import product
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+from constants import (
+    TYPE_SINGLE, TYPE_PAIR, TYPE_TRIO, TYPE_TRIO_PLUS_ONE, TYPE_TRIO_PLUS_PAIR, TYPE_STRAIGHT,
+    TYPE_DOUBLE_STRAIGHT, TYPE_TRIPLE_STRAIGHT, TYPE_TRIPLE_STRAIGHT_PLUS_SINGLES, TYPE_TRIPLE_STRAIGHT_PLUS_PAIRS,
+    TYPE_QUAD_PLUS_TWO_SINGLES, TYPE_QUAD_PLUS_TWO_PAIRS, TYPE_BOMB, TYPE_ROCKET,
+    MIN_STRAIGHT_LEN, MIN_DOUBLE_STRAIGHT_LEN, MIN_TRIPLE_STRAIGHT_LEN,
+)
+from game_logic.hand_rules import MAX_HAND_SIZE, NUM_RANKS, CountVector, HandInfo, RoomRules, get_classification_table
+
+try:
+    from config import PATTERN_TABLE_DIR
+except ImportError:
+    print("CRITICAL: config.py not found in game_logic.pattern_file. Using fallback defaults.")
+    PATTERN_TABLE_DIR = None
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PATTERN_TABLE_DIR and not os.path.isabs(PATTERN_TABLE_DIR):
+    PATTERN_TABLE_DIR = os.path.join(PACKAGE_DIR, PATTERN_TABLE_DIR)
+
+MAGIC = b"DDZPTBL\0"
+FORMAT_VERSION = 2
+# Index = type code stored in the file (0 is unused). Append only: reordering needs a version bump.
+TYPE_CODES = (
+    None, TYPE_SINGLE, TYPE_PAIR, TYPE_TRIO, TYPE_TRIO_PLUS_ONE, TYPE_TRIO_PLUS_PAIR, TYPE_STRAIGHT,
+    TYPE_DOUBLE_STRAIGHT, TYPE_TRIPLE_STRAIGHT, TYPE_TRIPLE_STRAIGHT_PLUS_SINGLES, TYPE_TRIPLE_STRAIGHT_PLUS_PAIRS,
+    TYPE_QUAD_PLUS_TWO_SINGLES, TYPE_QUAD_PLUS_TWO_PAIRS, TYPE_BOMB, TYPE_ROCKET,
+)
+_TYPE_TO_CODE = {t: code for code, t in enumerate(TYPE_CODES) if t}
+
+_HEADER = struct.Struct("<8sHBx32sIIIII") # magic, version, rules, inputs digest, buckets, moves, 3 offsets
+_PATTERN = struct.Struct(f"<{NUM_RANKS}sBbB") # One pattern as fed to the inputs digest
+_BUCKET = struct.Struct("<BBBxII")
+
+
+def rules_flags(rules: RoomRules) -> int:
+    return sum(1 << i for i, enabled in enumerate(rules) if enabled)
+
+
+def pattern_file_path(rules: RoomRules, directory: Optional[str] = PATTERN_TABLE_DIR) -> Optional[str]:
+    """Where the table file for `rules` lives (None if PATTERN_TABLE_DIR is not configured)."""
+    if not directory:
+        return None
+    return os.path.join(directory, f"patterns_v{FORMAT_VERSION}_r{rules_flags(rules)}.bin")
+
+
+def inputs_digest(table: Mapping[CountVector, HandInfo]) -> bytes:
+    """SHA-256 of everything the file is generated from: the constants and the rule set's pattern list."""
+    digest = hashlib.sha256(repr((FORMAT_VERSION, NUM_RANKS, MAX_HAND_SIZE, MIN_STRAIGHT_LEN, MIN_DOUBLE_STRAIGHT_LEN,
+                                  MIN_TRIPLE_STRAIGHT_LEN, TYPE_CODES)).encode())
+    for key in sorted(table):
+        info = table[key]
+        digest.update(_PATTERN.pack(bytes(key), _TYPE_TO_CODE[info.hand_type], info.rank, info.length))
+    return digest.digest()
+
+
+def _align8(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+def build_pattern_file(rules: RoomRules, path: str) -> str:
+    """Writes the move index for `rules` to `path` (atomically, via a temporary file). Returns the path."""
+    from game_logic.move_generator import level_mask # Local import
+
+    table = get_classification_table(rules)
+    grouped: Dict[Tuple[str, int], List[Tuple[int, CountVector]]] = {}
+    for key, info in table.items():
+        grouped.setdefault((info.hand_type, info.length), []).append((info.rank, key))
+    buckets = bytearray()
+    ranks, masks, keys = bytearray(), bytearray(), bytearray()
+    moves = 0
+    for (hand_type, length), entries in grouped.items():
+        entries.sort(key=lambda e: e[0]) # Stable: same order as move_generator's in-memory index
+        buckets += _BUCKET.pack(_TYPE_TO_CODE[hand_type], length, sum(entries[0][1]), moves, len(entries))
+        for rank, key in entries:
+            ranks += struct.pack("<b", rank)
+            masks += struct.pack("<Q", level_mask(key))
+            keys += bytes(key)
+        moves += len(entries)
+
+    buckets_offset = _align8(_HEADER.size)
+    masks_offset = _align8(buckets_offset + len(buckets))
+    ranks_offset = masks_offset + len(masks)
+    keys_offset = ranks_offset + len(ranks)
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, rules_flags(rules), inputs_digest(table), len(grouped), moves,
+                          buckets_offset, masks_offset, ranks_offset)
+
+    data = bytearray(keys_offset + len(keys))
+    data[:len(header)] = header
+    data[buckets_offset:buckets_offset + len(buckets)] = buckets
+    data[masks_offset:ranks_offset] = masks
+    data[ranks_offset:keys_offset] = ranks
+    data[keys_offset:] = keys
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path) # Readers never see a half-written file
+    return path
+
+
+class MappedMoves(Sequence):
+    """A bucket's moves decoded from the file on first access (and then kept)."""
+
+    def __init__(self, keys: memoryview, ranks: memoryview, hand_type: str, length: int):
+        self._keys = keys
+        self._ranks = ranks
+        self._hand_type = hand_type
+        self._length = length
+        self._decoded: List[Optional[object]] = [None] * len(ranks)
+
+    def __len__(self) -> int:
+        return len(self._decoded)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        move = self._decoded[i]
+        if move is None:
+            from game_logic.move_generator import Move # Local import
+            if i < 0:
+                i += len(self._decoded)
+            counts = tuple(self._keys[i * NUM_RANKS:(i + 1) * NUM_RANKS])
+            move = self._decoded[i] = Move(counts, HandInfo(self._hand_type, self._ranks[i], self._length))
+        return move
+
+
+class PatternFile:
+    """
+    An opened (memory-mapped) pattern table file. Raises ValueError if it doesn't match
+    `rules` or was generated from other inputs than the running code's.
+    """
+
+    def __init__(self, path: str, rules: RoomRules):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.path = path
+        self.buffer = memoryview(self._mmap)
+        (magic, version, flags, digest, self.bucket_count, self.move_count, self.buckets_offset, self.masks_offset,
+         self.ranks_offset) = _HEADER.unpack_from(self.buffer, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{path}: not a version {FORMAT_VERSION} pattern table file")
+        if flags != rules_flags(rules):
+            raise ValueError(f"{path}: built for rule flags {flags}, expected {rules_flags(rules)}")
+        if digest != inputs_digest(get_classification_table(rules)):
+            raise ValueError(f"{path}: built from other pattern rules or constants (stale file)")
+        self.keys_offset = self.ranks_offset + self.move_count
+        if len(self.buffer) != self.keys_offset + self.move_count * NUM_RANKS:
+            raise ValueError(f"{path}: truncated pattern table file")
+        self.rules = rules
+
+    def move_index(self):
+        """
+        A move_generator.MoveIndex over the mapped file. Ranks and masks are copied into
+        lists (about 1 MB; list indexing keeps _fitting as fast as with the in-memory index),
+        while the moves themselves, the bulk of the memory, are decoded from the file lazily.
+        """
+        from game_logic.move_generator import MoveIndex, make_bucket # Local import
+
+        masks = self.buffer[self.masks_offset:self.ranks_offset].cast("Q")
+        ranks = self.buffer[self.ranks_offset:self.keys_offset].cast("b")
+        keys = self.buffer[self.keys_offset:]
+        buckets = {}
+        for i in range(self.bucket_count):
+            code, length, cards, first, count = _BUCKET.unpack_from(self.buffer, self.buckets_offset + i * _BUCKET.size)
+            end = first + count
+            moves = MappedMoves(keys[first * NUM_RANKS:end * NUM_RANKS], ranks[first:end], TYPE_CODES[code], length)
+            buckets[(TYPE_CODES[code], length)] = make_bucket(cards, ranks[first:end].tolist(), masks[first:end].tolist(), moves)
+
+        rocket = buckets.pop((TYPE_ROCKET, 1))
+        bombs = buckets.pop((TYPE_BOMB, 1))
+        return MoveIndex(buckets, bombs, rocket.moves[0], rocket.masks[0])
+
+
+_opened: Dict[RoomRules, Optional[PatternFile]] = {}
+
+
+def open_pattern_file(rules: RoomRules) -> Optional[PatternFile]:
+    """
+    The mapped file for `rules`, or None when PATTERN_TABLE_DIR is unset or the file is
+    missing/stale (get_move_index then builds the index in memory). Opened once per process.
+    """
+    if rules in _opened:
+        return _opened[rules]
+    patterns = None
+    path = pattern_file_path(rules)
+    if path and os.path.exists(path):
+        try:
+            patterns = PatternFile(path, rules)
+        except (OSError, ValueError, struct.error) as e:
+            print(f"Ignoring pattern table file {path}: {e}. Run 'python -m game_logic.pattern_file' to rebuild it.")
+    _opened[rules] = patterns
+    return patterns
+
+
+def build_all(directory: Optional[str] = PATTERN_TABLE_DIR) -> List[str]:
+    """Builds the files for every combination of optional rules."""
+    if not directory:
+        raise ValueError("PATTERN_TABLE_DIR is not configured")
+    return [build_pattern_file(rules, pattern_file_path(rules, directory))
+            for rules in (RoomRules(*flags) for flags in product((True, False), repeat=len(RoomRules._fields)))]
+
+
+if __name__ == "__main__":
+    for built in build_all(sys.argv[1] if len(sys.argv) > 1 else PATTERN_TABLE_DIR):
+        print(f"Wrote {built} ({os.path.getsize(built)} bytes)")
@@ -0,0 +1,80 @@
+# telegram_doudizhu_bot/game_logic/snapshot.py
+"""
+Fixed-size binary snapshots of a game's state (about 120 bytes per game).
+
+Hands, the kitty, the played pile and the last play are 54-bit card masks (see
+card_codec), so a snapshot is one struct pack/unpack and restoring thousands of games
+needs no move replay. GameState is expected to build one in to_snapshot() after each
+state change and to rebuild itself from one in from_snapshot(); utils/game_snapshots.py
+stores them and restores them on startup.
+"""
+import struct
+from typing import NamedTuple, Optional, Tuple
+
+from constants import (
+    PHASE_WAITING_FOR_PLAYERS, PHASE_BIDDING, PHASE_PLAYING, PHASE_GAME_OVER,
+    JOB_TYPE_BID, JOB_TYPE_PLAY, JOB_TYPE_JOIN,
+)
+
+SNAPSHOT_VERSION = 2
+NO_SEAT = -1
+NOT_BID = -1 # Bid slot of a seat that hasn't been asked yet (0 means it passed)
+
+# Stored as indexes: append only, reordering needs a SNAPSHOT_VERSION bump
+PHASE_CODES = (PHASE_WAITING_FOR_PLAYERS, PHASE_BIDDING, PHASE_PLAYING, PHASE_GAME_OVER)
+TIMEOUT_CODES = (None, JOB_TYPE_BID, JOB_TYPE_PLAY, JOB_TYPE_JOIN)
+_PHASE_TO_CODE = {phase: code for code, phase in enumerate(PHASE_CODES)}
+_TIMEOUT_TO_CODE = {job: code for code, job in enumerate(TIMEOUT_CODES)}
+
+# version, chat_id, phase, 3 user ids, AI seat bits, 3 hands, kitty, played, landlord, turn, 3 bids,
+# multiplier, last play, last seat, consecutive passes, timeout job, timeout user, timeout deadline,
+# sequence number, rule flags, callback generation (version 2)
+_FORMAT = struct.Struct("<BqB3qB3QQQbb3bHQbBBqdIBI")
+_FORMAT_V1 = struct.Struct("<BqB3qB3QQQbb3bHQbBBqdIB") # Version 1: no callback generation
+_FORMATS = {1: _FORMAT_V1, SNAPSHOT_VERSION: _FORMAT}
+
+
+class GameSnapshot(NamedTuple):
+    chat_id: int
+    phase: str
+    user_ids: Tuple[int, int, int] # 0 for an empty seat
+    ai_seats: int # Bit i set when seat i is played by the AI
+    hands: Tuple[int, int, int] # Card masks
+    kitty: int
+    played: int # Every card played so far (for card counting / the AI's unseen cards)
+    landlord: int # NO_SEAT until bidding is over
+    turn: int # Seat to act
+    bids: Tuple[int, int, int] # NOT_BID, 0 (pass) or 1..3
+    multiplier: int # Bombs, rocket and spring multiply the base score
+    last_play: int # Card mask of the play to beat (0 when leading)
+    last_seat: int # Seat that made last_play, NO_SEAT when leading
+    passes: int # Consecutive passes since last_play
+    timeout_job: Optional[str] = None # JOB_TYPE_* of the pending timeout, if any
+    timeout_user: int = 0
+    timeout_deadline: float = 0.0 # Wall clock (time.time()); monotonic clocks don't survive a restart
+    sequence: int = 0 # Incremented on every state change; a restore never goes backwards
+    rules: int = 0 # pattern_file.rules_flags(RoomRules) of the room
+    generation: int = 0 # callback_codec GenerationRegistry.current(chat_id); 0 = not recorded (version 1)
+
+
+def encode_snapshot(snapshot: GameSnapshot) -> bytes:
+    return _FORMAT.pack(
+        SNAPSHOT_VERSION, snapshot.chat_id, _PHASE_TO_CODE[snapshot.phase], *snapshot.user_ids, snapshot.ai_seats,
+        *snapshot.hands, snapshot.kitty, snapshot.played, snapshot.landlord, snapshot.turn, *snapshot.bids,
+        snapshot.multiplier, snapshot.last_play, snapshot.last_seat, snapshot.passes,
+        _TIMEOUT_TO_CODE[snapshot.timeout_job], snapshot.timeout_user, snapshot.timeout_deadline,
+        snapshot.sequence, snapshot.rules, snapshot.generation)
+
+
+def decode_snapshot(data: bytes) -> GameSnapshot:
+    """Decodes the current or an older snapshot version. Raises ValueError for unknown versions or sizes."""
+    fmt = _FORMATS.get(data[0]) if data else None
+    if fmt is None or len(data) != fmt.size:
+        raise ValueError(f"Unsupported game snapshot (version {data[0] if data else None}, {len(data)} bytes)")
+    (_version, chat_id, phase, u0, u1, u2, ai_seats, h0, h1, h2, kitty, played, landlord, turn, b0, b1, b2,
+     multiplier, last_play, last_seat, passes, timeout_job, timeout_user, timeout_deadline,
+     sequence, rules, *generation) = fmt.unpack(data)
+    return GameSnapshot(chat_id, PHASE_CODES[phase], (u0, u1, u2), ai_seats, (h0, h1, h2), kitty, played,
+                        landlord, turn, (b0, b1, b2), multiplier, last_play, last_seat, passes,
+                        TIMEOUT_CODES[timeout_job], timeout_user, timeout_deadline, sequence, rules,
+                        generation[0] if generation else 0)
@@ -1,22 +1,36 @@
 # telegram_doudizhu_bot/i18n/translator.py
 import gettext
 import os
-from typing import Dict, Optional
+from functools import lru_cache
+from typing import Any, Callable, Dict, Hashable, List, Optional
 
 # Assuming config.py is in the parent directory of i18n
 # Correct path to config.py and locales directory
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 try:
-    from config import DEFAULT_LANG
+    from config import DEFAULT_LANG, TRANSLATION_RELOAD_SECONDS
 except ImportError:
     print("CRITICAL: config.py not found or DEFAULT_LANG not set. Falling back to 'en'.")
     DEFAULT_LANG = "en"
+    TRANSLATION_RELOAD_SECONDS = 60.0
 
 
 LOCALE_DIR = os.path.join(PROJECT_ROOT, 'i18n', 'locales')
+DOMAIN = 'bot'
+FORMAT_CACHE_SIZE = 8192 # Formatted strings memoised by format_cached
 
 loaded_translations: Dict[str, gettext.GNUTranslations] = {}
 
+# Flat msgid -> msgstr dicts per language, built once from the .mo files so `_` is a single dict lookup
+compiled_catalogs: Dict[str, Dict[str, str]] = {}
+_catalog_mtimes: Dict[str, float] = {}
+# Callbacks that drop caches of translated text held elsewhere (rendered hands, keyboards)
+_reload_hooks: List[Callable[[], None]] = []
+_reload_job = None
+
+def _mo_path(lang_code: str) -> str:
+    return os.path.join(LOCALE_DIR, lang_code, 'LC_MESSAGES', f'{DOMAIN}.mo')
+
 def get_translator(lang_code: Optional[str] = None) -> gettext.GNUTranslations:
     """
     Returns a gettext translation object for the given language code.
@@ -27,7 +41,7 @@ def get_translator(lang_code: Optional[str] = None) -> gettext.GNUTranslations:
     if effective_lang_code not in loaded_translations:
         try:
             # Ensure the domain 'bot' matches your .mo file names (e.g., bot.mo)
-            translation = gettext.translation('bot', localedir=LOCALE_DIR, languages=[effective_lang_code], fallback=True)
+            translation = gettext.translation(DOMAIN, localedir=LOCALE_DIR, languages=[effective_lang_code], fallback=True)
             loaded_translations[effective_lang_code] = translation
         except FileNotFoundError:
             # This fallback might not be strictly necessary if gettext.translation handles it with fallback=True
@@ -40,14 +54,125 @@ def get_translator(lang_code: Optional[str] = None) -> gettext.GNUTranslations:
                 return gettext.NullTranslations() # No translations will occur
     return loaded_translations[effective_lang_code]
 
+def compile_catalog(lang_code: str) -> Dict[str, str]:
+    """
+    Flattens a language's gettext catalog into a plain dict (singular messages only)
+    and stores it in compiled_catalogs. The translator's fallback chain is merged in
+    (zh_CN falls back to zh), with the more specific catalog winning, as gettext would
+    look them up. Languages without a .mo file get an empty catalog, so lookups return
+    the original text just like NullTranslations.
+    """
+    catalog: Dict[str, str] = {}
+    chain = []
+    translator = get_translator(lang_code)
+    while translator is not None:
+        chain.append(translator)
+        translator = getattr(translator, '_fallback', None)
+    for translator in reversed(chain): # Least specific first; more specific entries overwrite
+        raw = getattr(translator, '_catalog', None) or {}
+        for msgid, msgstr in raw.items():
+            if isinstance(msgid, str) and msgid and msgstr:
+                catalog[msgid] = msgstr
+    compiled_catalogs[lang_code] = catalog
+    mo_path = _mo_path(lang_code)
+    _catalog_mtimes[lang_code] = os.path.getmtime(mo_path) if os.path.exists(mo_path) else 0.0
+    return catalog
+
+def load_all_catalogs() -> None:
+    """Compiles every language found in LOCALE_DIR (plus DEFAULT_LANG). Runs when this module is imported."""
+    langs = {DEFAULT_LANG}
+    if os.path.isdir(LOCALE_DIR):
+        langs.update(name for name in os.listdir(LOCALE_DIR) if os.path.exists(_mo_path(name)))
+    for lang_code in sorted(langs):
+        compile_catalog(lang_code)
+
+def register_reload_hook(hook: Callable[[], None]) -> None:
+    """
+    Registers a callback run by reload_translations, for modules that cache text built
+    with `_` (e.g. card_codec's rendered hands and keyboards). Registering twice is a no-op.
+    """
+    if hook not in _reload_hooks:
+        _reload_hooks.append(hook)
+
+def reload_translations() -> None:
+    """
+    Drops every loaded/compiled catalog, the formatted-string memo and, through the
+    registered reload hooks, the caches that embed translated text, then recompiles from disk.
+    """
+    loaded_translations.clear()
+    compiled_catalogs.clear()
+    _catalog_mtimes.clear()
+    _format_cached.cache_clear()
+    for hook in _reload_hooks:
+        try:
+            hook()
+        except Exception as e:
+            print(f"Translation reload hook {getattr(hook, '__qualname__', hook)} failed: {e}")
+    load_all_catalogs()
+
+def reload_if_changed() -> bool:
+    """
+    Hot reload without a restart: recompiles if any .mo file was added, removed or modified.
+    Cheap enough (a few stat calls) to run from a repeating job. Returns True if reloaded.
+    """
+    on_disk = set()
+    if os.path.isdir(LOCALE_DIR):
+        on_disk = {name for name in os.listdir(LOCALE_DIR) if os.path.exists(_mo_path(name))}
+    for lang_code in on_disk | set(_catalog_mtimes):
+        mo_path = _mo_path(lang_code)
+        mtime = os.path.getmtime(mo_path) if os.path.exists(mo_path) else 0.0
+        if _catalog_mtimes.get(lang_code) != mtime:
+            reload_translations()
+            return True
+    return False
+
+async def _reload_job_callback(context: Any) -> None:
+    if reload_if_changed():
+        print("Translations changed on disk; catalogs reloaded.")
+
+def start_reload_job(job_queue, interval_seconds: float = TRANSLATION_RELOAD_SECONDS) -> None:
+    """
+    Registers a repeating JobQueue job running reload_if_changed, so edited .mo files
+    are picked up without a restart. An interval of 0 (or less) disables it.
+    """
+    global _reload_job
+    if _reload_job is None and interval_seconds > 0:
+        _reload_job = job_queue.run_repeating(_reload_job_callback, interval=interval_seconds, first=interval_seconds,
+                                              name="translation_reload")
+
+def stop_reload_job() -> None:
+    global _reload_job
+    if _reload_job is not None:
+        _reload_job.schedule_removal()
+        _reload_job = None
+
 def _(text: str, lang_code: Optional[str] = None) -> str:
     """
     Translate the given text using the translator for the specified or default language.
     This is the primary function to be used for localization.
     Example: message = _("Hello, world!", user_specific_lang_code)
     """
-    translator = get_translator(lang_code)
-    return translator.gettext(text)
+    catalog = compiled_catalogs.get(lang_code or DEFAULT_LANG)
+    if catalog is None:
+        catalog = compile_catalog(lang_code or DEFAULT_LANG)
+    return catalog.get(text, text)
+
+@lru_cache(maxsize=FORMAT_CACHE_SIZE)
+def _format_cached(text: str, lang_code: Optional[str], args: tuple, kwargs: tuple) -> str:
+    return _(text, lang_code).format(*args, **dict(kwargs))
+
+def format_cached(text: str, lang_code: Optional[str] = None, *args: Hashable, **kwargs: Hashable) -> str:
+    """
+    Translates and formats `text`, memoising the result for hot templates
+    (turn prompts, hand displays, repeated error messages).
+    Arguments must be hashable; the memo is cleared on reload.
+    Example: msg = format_cached("Your hand: {}", lang, hand_str)
+    """
+    return _format_cached(text, lang_code, args, tuple(sorted(kwargs.items())))
+
+# Compile at startup (first import), so no handler pays for reading a .mo file; start the
+# hot-reload check once with start_reload_job(application.job_queue)
+load_all_catalogs()
 
 # You would need to generate .po and .mo files.
 # Example .po file content (e.g., locales/zh_CN/LC_MESSAGES/bot.po):
@@ -0,0 +1,18 @@
+# telegram_doudizhu_bot/tests/test_bid_evaluator.py
+import numpy as np
+
+from game_logic.bid_evaluator import TABLE_SIZE, batch_features, hand_features
+
+
+def random_hands(count: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    deck = np.repeat(np.arange(15), [4] * 13 + [1, 1])
+    return np.array([np.bincount(rng.permutation(deck)[:17], minlength=15) for _ in range(count)], dtype=np.int8)
+
+
+def test_scalar_and_batch_features_agree_on_int8_rows():
+    hands = random_hands(2000)
+    expected = batch_features(hands)
+    assert all(0 <= index < TABLE_SIZE for index in expected.tolist())
+    assert [hand_features(hand) for hand in hands] == expected.tolist()
+    assert [hand_features(tuple(hand.tolist())) for hand in hands] == expected.tolist()
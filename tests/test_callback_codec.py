@@ -0,0 +1,116 @@
+# telegram_doudizhu_bot/tests/test_callback_codec.py
+import asyncio
+import types
+
+import pytest
+
+from constants import CALLBACK_BID_PREFIX, CALLBACK_JOIN_GAME, PHASE_BIDDING, PHASE_PLAYING
+from utils.callback_codec import (
+    ACTION_BID, ACTION_CHANGE_LANG, ACTION_JOIN, ACTION_PASS, ACTION_PLAY_SELECTED, ACTION_SELECT_CARD,
+    MAX_CALLBACK_BYTES, PACKED_MARKER, CallbackDispatcher, CallbackPayload, GenerationRegistry,
+    decode_callback, encode_callback,
+)
+
+CHAT_ID = -100777
+FULL_DECK = (1 << 54) - 1
+
+
+@pytest.mark.parametrize("action, generation, value", [
+    (ACTION_JOIN, 0, None),
+    (ACTION_PASS, 1, None),
+    (ACTION_BID, 300, 3),
+    (ACTION_SELECT_CARD, 2 ** 20, 53),
+    (ACTION_PLAY_SELECTED, 5, FULL_DECK),
+    (ACTION_CHANGE_LANG, 0, "zh_CN"),
+])
+def test_packed_round_trip(action, generation, value):
+    data = encode_callback(action, generation, value)
+    assert data.startswith(PACKED_MARKER) and len(data) <= MAX_CALLBACK_BYTES
+    assert decode_callback(data) == CallbackPayload(action, generation, value)
+
+
+def test_oversized_payload_is_rejected():
+    with pytest.raises(ValueError):
+        encode_callback(ACTION_CHANGE_LANG, 0, "x" * MAX_CALLBACK_BYTES)
+
+
+def test_legacy_strings_and_garbage():
+    assert decode_callback(CALLBACK_JOIN_GAME) == CallbackPayload(ACTION_JOIN, 0, None, True)
+    assert decode_callback(CALLBACK_BID_PREFIX + "2") == CallbackPayload(ACTION_BID, 0, "2", True)
+    assert decode_callback("no_such_button") is None
+    assert decode_callback(PACKED_MARKER + "!!!") is None
+    assert decode_callback(PACKED_MARKER + "AQ") is None # Truncated after the version byte
+    assert decode_callback(PACKED_MARKER + "Afg") is None # Unknown action id
+
+
+def make_press(data: str):
+    """Update/context pair for a button press in CHAT_ID, recording what the query was answered with."""
+    answers = []
+
+    async def answer(text=None):
+        answers.append(text)
+
+    query = types.SimpleNamespace(data=data, answer=answer)
+    update = types.SimpleNamespace(callback_query=query, effective_chat=types.SimpleNamespace(id=CHAT_ID),
+                                   effective_user=types.SimpleNamespace(id=11))
+    context = types.SimpleNamespace(bot_data={}, user_data={})
+    return update, context, answers
+
+
+def make_dispatcher(phase=None):
+    generations = GenerationRegistry()
+    dispatcher = CallbackDispatcher(generations, phase_of=lambda chat_id: phase)
+    handled = []
+
+    async def handler(update, context, payload):
+        handled.append(payload)
+
+    dispatcher.register(ACTION_BID, handler, game_bound=True)
+    dispatcher.register(ACTION_CHANGE_LANG, handler)
+    return dispatcher, generations, handled
+
+
+def test_only_the_current_round_is_dispatched():
+    dispatcher, generations, handled = make_dispatcher()
+    old = encode_callback(ACTION_BID, generations.current(CHAT_ID), 2)
+    generations.bump(CHAT_ID)
+    current = encode_callback(ACTION_BID, generations.current(CHAT_ID), 3)
+
+    update, context, answers = make_press(old)
+    asyncio.run(dispatcher.dispatch(update, context))
+    assert handled == [] and len(answers) == 1 and answers[0] # Answered with "This button has expired."
+
+    update, context, answers = make_press(current)
+    asyncio.run(dispatcher.dispatch(update, context))
+    assert handled == [CallbackPayload(ACTION_BID, 2, 3)] and answers == []
+    assert dispatcher.stats == {"dispatched": 1, "stale": 1, "unknown": 0}
+
+
+def test_restored_generation_keeps_old_keyboards_valid():
+    dispatcher, generations, handled = make_dispatcher()
+    data = encode_callback(ACTION_BID, 9, 1)
+    generations.restore(CHAT_ID, 9)
+    asyncio.run(dispatcher.dispatch(*make_press(data)[:2]))
+    assert handled == [CallbackPayload(ACTION_BID, 9, 1)]
+
+
+def test_non_game_actions_ignore_the_generation():
+    dispatcher, generations, handled = make_dispatcher()
+    generations.bump(CHAT_ID)
+    asyncio.run(dispatcher.dispatch(*make_press(encode_callback(ACTION_CHANGE_LANG, 0, "en"))[:2]))
+    assert handled == [CallbackPayload(ACTION_CHANGE_LANG, 0, "en")]
+
+
+@pytest.mark.parametrize("phase, dispatched", [(PHASE_BIDDING, True), (PHASE_PLAYING, False), (None, False)])
+def test_legacy_game_buttons_are_checked_against_the_phase(phase, dispatched):
+    dispatcher, _generations, handled = make_dispatcher(phase)
+    update, context, answers = make_press(CALLBACK_BID_PREFIX + "1")
+    asyncio.run(dispatcher.dispatch(update, context))
+    assert bool(handled) == dispatched and bool(answers) != dispatched
+
+
+def test_unknown_presses_are_answered():
+    dispatcher, _generations, handled = make_dispatcher()
+    update, context, answers = make_press("no_such_button")
+    asyncio.run(dispatcher.dispatch(update, context))
+    assert handled == [] and answers == [None] and dispatcher.stats["unknown"] == 1
@@ -0,0 +1,107 @@
+# telegram_doudizhu_bot/tests/test_event_log.py
+import os
+
+import pytest
+
+from utils.event_log import (
+    EVENT_BID, EVENT_GAME_CANCEL, EVENT_GAME_START, EVENT_PLAY, EVENT_SETTLE, EVENT_TIMEOUT, RECORD_SIZE,
+    TIMEOUT_JOIN, EventLog, iter_games, iter_segment, list_segments, read_segment_records, replay_game,
+)
+
+HEADER_SIZE = 16
+
+
+@pytest.fixture
+def segment(tmp_path):
+    log = EventLog(str(tmp_path))
+    for i in range(500):
+        log.append(chat_id=-100 - i % 7, game_id=1000 + i // 20, event_type=EVENT_PLAY if i % 2 else EVENT_BID,
+                   seat=i % 3, user_id=10 ** 9 + i, cards=(1 << (i % 54)) | 1, value=i - 250, aux=i % 5)
+    log.close()
+    return list_segments(str(tmp_path))[0]
+
+
+def corrupt(path, record, byte=30):
+    with open(path, "r+b") as f:
+        f.seek(HEADER_SIZE + record * RECORD_SIZE + byte)
+        value = f.read(1)[0]
+        f.seek(-1, os.SEEK_CUR)
+        f.write(bytes([value ^ 0x10]))
+
+
+def test_bulk_records_match_the_streaming_reader(segment):
+    records = read_segment_records(segment)
+    events = list(iter_segment(segment))
+    assert len(records) == len(events) == 500
+    assert records["cards"].tolist() == [event.cards for event in events]
+    assert records["value"].tolist() == [event.value for event in events]
+
+
+def test_corrupt_record_truncates_both_readers(segment):
+    corrupt(segment, 321)
+    assert len(read_segment_records(segment)) == 321
+    assert len(list(iter_segment(segment))) == 321
+
+
+def test_torn_tail_is_dropped(segment):
+    with open(segment, "r+b") as f:
+        f.truncate(HEADER_SIZE + 499 * RECORD_SIZE + 10)
+    assert len(read_segment_records(segment)) == 499
+
+
+def test_verified_prefix_is_not_checked_again(segment):
+    assert len(read_segment_records(segment)) == 500
+    assert os.path.exists(segment + ".verified")
+    corrupt(segment, 100, byte=0) # Breaks only the stored CRC of a verified record
+    assert len(read_segment_records(segment)) == 500
+    corrupt(segment, 499, byte=0) # The last verified CRC no longer matches: everything is checked again
+    assert len(read_segment_records(segment)) == 100
+
+
+def play_games(directory, segment_bytes=1 << 20):
+    """
+    Interleaves four games in chat -1 (game ids 1..4) at one event per second: 1 and 2
+    are settled, 3 is cancelled and 4 ends in a join timeout.
+    """
+    log = EventLog(directory, segment_bytes)
+    t = 1000.0
+    for game_id in (1, 2, 3, 4):
+        log.append(-1, game_id, EVENT_GAME_START, timestamp=t)
+        t += 1
+    for turn in range(6):
+        for game_id in (1, 2, 3):
+            log.append(-1, game_id, EVENT_PLAY, seat=turn % 3, cards=1 << turn, timestamp=t)
+            t += 1
+    log.append(-1, 3, EVENT_GAME_CANCEL, timestamp=t)
+    log.append(-1, 4, EVENT_TIMEOUT, aux=TIMEOUT_JOIN, timestamp=t)
+    for seat in range(3):
+        for game_id in (2, 1):
+            log.append(-1, game_id, EVENT_SETTLE, seat=seat, value=2 if seat == 0 else -1, timestamp=t)
+    log.close()
+
+
+def test_replay_game_follows_one_game_across_segments(tmp_path):
+    play_games(str(tmp_path), segment_bytes=16 + 5 * RECORD_SIZE)
+    assert len(list_segments(str(tmp_path))) > 1
+    events = list(replay_game(-1, 1, str(tmp_path)))
+    assert [e.event_type for e in events] == [EVENT_GAME_START] + [EVENT_PLAY] * 6 + [EVENT_SETTLE] * 3
+    assert [e.seq for e in events] == list(range(10))
+    assert [e.cards for e in events if e.event_type == EVENT_PLAY] == [1 << turn for turn in range(6)]
+    assert [e.event_type for e in replay_game(-1, 3, str(tmp_path))][-1] == EVENT_GAME_CANCEL
+    assert list(replay_game(-2, 1, str(tmp_path))) == []
+
+
+def test_iter_games_yields_settled_games_only(tmp_path):
+    play_games(str(tmp_path))
+    games = list(iter_games(str(tmp_path)))
+    assert [game[0].game_id for game in games] == [2, 1] # In the order they were settled
+    assert all(len(game) == 10 and sum(e.value for e in game if e.event_type == EVENT_SETTLE) == 0 for game in games)
+
+
+def test_corrupt_record_cuts_the_replay_short(tmp_path):
+    play_games(str(tmp_path))
+    segment = list_segments(str(tmp_path))[0]
+    corrupt(segment, 4 + 3 * 3) # Game 1's fourth play
+    events = list(replay_game(-1, 1, str(tmp_path)))
+    assert [e.event_type for e in events] == [EVENT_GAME_START] + [EVENT_PLAY] * 3
+    assert list(iter_games(str(tmp_path))) == []
@@ -0,0 +1,107 @@
+# telegram_doudizhu_bot/tests/test_game_snapshots.py
+import struct
+import time
+
+import pytest
+
+from constants import (
+    PHASE_BIDDING, JOB_TYPE_BID, JOB_TYPE_PLAY, RANK_3, RANK_4, RANK_A, RANK_2, RANK_BLACK_JOKER, RANK_RED_JOKER,
+)
+from game_logic.bid_evaluator import auto_bid
+from game_logic.card_codec import card_index
+from game_logic.snapshot import NO_SEAT, NOT_BID, GameSnapshot, decode_snapshot, encode_snapshot
+from utils.game_snapshots import SnapshotStore, restore_games, timeout_job_data
+from utils.persistence import WriteBehindStore
+from utils.timer_wheel import timer_wheel
+
+CHAT_ID = -100123
+STRONG_HAND = sum(1 << card_index(rank, suit) for rank in (RANK_A, RANK_2) for suit in range(4)) \
+    | (1 << card_index(RANK_BLACK_JOKER, 0)) | (1 << card_index(RANK_RED_JOKER, 0))
+WEAK_HAND = (1 << card_index(RANK_3, 0)) | (1 << card_index(RANK_4, 1))
+
+
+def bidding_snapshot(**changes) -> GameSnapshot:
+    snapshot = GameSnapshot(
+        chat_id=CHAT_ID, phase=PHASE_BIDDING, user_ids=(11, 22, 33), ai_seats=0,
+        hands=(WEAK_HAND, STRONG_HAND, WEAK_HAND), kitty=0, played=0, landlord=NO_SEAT, turn=1,
+        bids=(1, NOT_BID, NOT_BID), multiplier=1, last_play=0, last_seat=NO_SEAT, passes=0,
+        timeout_job=JOB_TYPE_BID, timeout_user=22, timeout_deadline=time.time() + 30, sequence=7)
+    return snapshot._replace(**changes)
+
+
+async def _noop(context, timers):
+    pass
+
+
+def test_restored_bid_timeout_carries_the_bidders_hand_and_high_bid():
+    installed = []
+    assert restore_games([bidding_snapshot()], installed.append, {JOB_TYPE_BID: _noop}) == 1
+    try:
+        timer = timer_wheel.get((JOB_TYPE_BID, CHAT_ID, 22))
+        assert timer is not None and timer.callback is _noop
+        assert timer.data == {"chat_id": CHAT_ID, "user_id": 22, "hand_mask": STRONG_HAND, "highest_bid": 1}
+        # What make_bid_timeouts_callback computes from it: a real bid, not a blind pass
+        assert auto_bid(timer.data["hand_mask"], timer.data["highest_bid"]) > 1
+    finally:
+        timer_wheel.cancel((JOB_TYPE_BID, CHAT_ID, 22))
+
+
+def test_bid_timeout_data_without_a_timeout_user_uses_the_seat_to_act():
+    data = timeout_job_data(bidding_snapshot(timeout_user=0, bids=(NOT_BID, NOT_BID, NOT_BID)))
+    assert data["hand_mask"] == STRONG_HAND and data["highest_bid"] == 0
+
+
+def test_play_timeout_data_has_no_bid_fields():
+    assert timeout_job_data(bidding_snapshot(timeout_job=JOB_TYPE_PLAY)) == {"chat_id": CHAT_ID, "user_id": 22}
+
+
+def test_snapshot_round_trip():
+    snapshot = bidding_snapshot(ai_seats=0b100, kitty=(1 << 53) | 1, played=(1 << 54) - 1, rules=5, generation=12)
+    data = encode_snapshot(snapshot)
+    assert decode_snapshot(data) == snapshot
+
+
+def test_version_1_snapshot_decodes_with_generation_0():
+    snapshot = bidding_snapshot(generation=12)
+    data = encode_snapshot(snapshot)
+    v1 = b"\x01" + data[1:-struct.calcsize("<I")] # Version 1 is version 2 without the trailing generation
+    assert decode_snapshot(v1) == snapshot._replace(generation=0)
+
+
+@pytest.mark.parametrize("data", [b"", b"\x09" + bytes(120), encode_snapshot(bidding_snapshot())[:-1]])
+def test_unknown_versions_and_sizes_are_rejected(data):
+    with pytest.raises(ValueError):
+        decode_snapshot(data)
+
+
+def test_store_never_replaces_a_snapshot_with_an_older_one(tmp_path):
+    store = WriteBehindStore(str(tmp_path / "bot.db"), flush_interval=0.05).start()
+    try:
+        snapshots = SnapshotStore(store)
+        snapshots.save(bidding_snapshot(sequence=8, turn=2))
+        snapshots.save(bidding_snapshot(sequence=7, turn=1)) # Late, out-of-order save
+        store.flush(timeout=5)
+        assert [(s.sequence, s.turn) for s in snapshots.load_all()] == [(8, 2)]
+
+        snapshots.save(bidding_snapshot(sequence=9, turn=0))
+        snapshots.save(bidding_snapshot(chat_id=CHAT_ID - 1, sequence=1))
+        store.flush(timeout=5)
+        assert sorted((s.chat_id, s.sequence) for s in snapshots.load_all()) == [(CHAT_ID - 1, 1), (CHAT_ID, 9)]
+
+        snapshots.delete(CHAT_ID)
+        store.flush(timeout=5)
+        assert [s.chat_id for s in snapshots.load_all()] == [CHAT_ID - 1]
+    finally:
+        store.close()
+
+
+def test_unreadable_rows_are_skipped(tmp_path):
+    store = WriteBehindStore(str(tmp_path / "bot.db"), flush_interval=0.05).start()
+    try:
+        snapshots = SnapshotStore(store)
+        snapshots.save(bidding_snapshot())
+        store.execute("INSERT INTO game_snapshots (chat_id, seq, data) VALUES (1, 1, ?)", (b"\x09garbage",))
+        store.flush(timeout=5)
+        assert [s.chat_id for s in snapshots.load_all()] == [CHAT_ID]
+    finally:
+        store.close()
@@ -0,0 +1,80 @@
+# telegram_doudizhu_bot/tests/test_hand_rules.py
+import pytest
+
+from constants import (
+    RANK_3, RANK_4, RANK_5, RANK_6, RANK_7, RANK_8, RANK_9, RANK_10, RANK_J, RANK_Q, RANK_K, RANK_A, RANK_2,
+    RANK_BLACK_JOKER, RANK_RED_JOKER,
+    TYPE_SINGLE, TYPE_PAIR, TYPE_TRIO, TYPE_TRIO_PLUS_ONE, TYPE_TRIO_PLUS_PAIR, TYPE_STRAIGHT,
+    TYPE_DOUBLE_STRAIGHT, TYPE_TRIPLE_STRAIGHT, TYPE_TRIPLE_STRAIGHT_PLUS_SINGLES, TYPE_TRIPLE_STRAIGHT_PLUS_PAIRS,
+    TYPE_QUAD_PLUS_TWO_SINGLES, TYPE_QUAD_PLUS_TWO_PAIRS, TYPE_BOMB, TYPE_ROCKET,
+)
+from game_logic.hand_rules import INVALID_HAND, HandInfo, RoomRules, classify_ranks
+
+ALL_RULES = RoomRules(True, True, True)
+NO_OPTIONAL_RULES = RoomRules(False, False, False)
+
+
+@pytest.mark.parametrize("ranks, expected", [
+    ([RANK_7], HandInfo(TYPE_SINGLE, RANK_7, 1)),
+    ([RANK_RED_JOKER], HandInfo(TYPE_SINGLE, RANK_RED_JOKER, 1)),
+    ([RANK_Q, RANK_Q], HandInfo(TYPE_PAIR, RANK_Q, 1)),
+    ([RANK_2] * 3, HandInfo(TYPE_TRIO, RANK_2, 1)),
+    ([RANK_5] * 3 + [RANK_BLACK_JOKER], HandInfo(TYPE_TRIO_PLUS_ONE, RANK_5, 1)),
+    ([RANK_5] * 3 + [RANK_K] * 2, HandInfo(TYPE_TRIO_PLUS_PAIR, RANK_5, 1)),
+    ([RANK_3, RANK_4, RANK_5, RANK_6, RANK_7], HandInfo(TYPE_STRAIGHT, RANK_7, 5)),
+    (list(range(RANK_3, RANK_A + 1)), HandInfo(TYPE_STRAIGHT, RANK_A, 12)),
+    ([RANK_9, RANK_9, RANK_10, RANK_10, RANK_J, RANK_J], HandInfo(TYPE_DOUBLE_STRAIGHT, RANK_J, 3)),
+    ([RANK_K] * 3 + [RANK_A] * 3, HandInfo(TYPE_TRIPLE_STRAIGHT, RANK_A, 2)),
+    ([RANK_3] * 3 + [RANK_4] * 3 + [RANK_9, RANK_2], HandInfo(TYPE_TRIPLE_STRAIGHT_PLUS_SINGLES, RANK_4, 2)),
+    ([RANK_3] * 3 + [RANK_4] * 3 + [RANK_9] * 2 + [RANK_2] * 2, HandInfo(TYPE_TRIPLE_STRAIGHT_PLUS_PAIRS, RANK_4, 2)),
+    ([RANK_8] * 4 + [RANK_3, RANK_RED_JOKER], HandInfo(TYPE_QUAD_PLUS_TWO_SINGLES, RANK_8, 1)),
+    ([RANK_8] * 4 + [RANK_3] * 2 + [RANK_K] * 2, HandInfo(TYPE_QUAD_PLUS_TWO_PAIRS, RANK_8, 1)),
+    ([RANK_6] * 4, HandInfo(TYPE_BOMB, RANK_6, 1)),
+    ([RANK_BLACK_JOKER, RANK_RED_JOKER], HandInfo(TYPE_ROCKET, RANK_RED_JOKER, 1)),
+])
+def test_classifies_every_hand_type(ranks, expected):
+    assert classify_ranks(ranks, ALL_RULES) == expected
+    assert classify_ranks(reversed(ranks), ALL_RULES) == expected # Order of the cards doesn't matter
+
+
+@pytest.mark.parametrize("ranks", [
+    [],
+    [RANK_3, RANK_4],
+    [RANK_3, RANK_4, RANK_5, RANK_6], # Straight too short
+    [RANK_J, RANK_Q, RANK_K, RANK_A, RANK_2], # 2s never appear in sequences
+    [RANK_BLACK_JOKER] * 2, # Jokers don't pair
+    [RANK_3, RANK_3, RANK_4, RANK_4], # Double straight too short
+    [RANK_A] * 3 + [RANK_2] * 3, # Airplane through the 2
+    [RANK_5] * 3 + [RANK_BLACK_JOKER, RANK_RED_JOKER], # The rocket is not a pair kicker
+    [RANK_3] * 3 + [RANK_4] * 3 + [RANK_BLACK_JOKER, RANK_RED_JOKER], # Nor two single wings
+    [RANK_8] * 4 + [RANK_BLACK_JOKER, RANK_RED_JOKER],
+    [RANK_8] * 4 + [RANK_9], # Quad with one kicker
+])
+def test_rejects_invalid_plays(ranks):
+    assert classify_ranks(ranks, ALL_RULES) == INVALID_HAND
+
+
+def test_airplane_of_four_trios_is_not_read_as_three_with_wings():
+    ranks = [RANK_3] * 3 + [RANK_4] * 3 + [RANK_5] * 3 + [RANK_6] * 3
+    assert classify_ranks(ranks, ALL_RULES) == HandInfo(TYPE_TRIPLE_STRAIGHT, RANK_6, 4)
+
+
+def test_bomb_is_not_read_as_trio_plus_one():
+    assert classify_ranks([RANK_9] * 4, ALL_RULES) == HandInfo(TYPE_BOMB, RANK_9, 1)
+
+
+@pytest.mark.parametrize("ranks, flag, hand_type", [
+    ([RANK_3] * 3 + [RANK_4] * 3 + [RANK_9, RANK_2], "allow_three_one_plane", TYPE_TRIPLE_STRAIGHT_PLUS_SINGLES),
+    ([RANK_8] * 4 + [RANK_3, RANK_K], "allow_four_two_single", TYPE_QUAD_PLUS_TWO_SINGLES),
+    ([RANK_8] * 4 + [RANK_3] * 2 + [RANK_K] * 2, "allow_four_two_pair", TYPE_QUAD_PLUS_TWO_PAIRS),
+])
+def test_rule_flags_toggle_their_hand_type(ranks, flag, hand_type):
+    assert classify_ranks(ranks, NO_OPTIONAL_RULES._replace(**{flag: True})).hand_type == hand_type
+    assert classify_ranks(ranks, ALL_RULES._replace(**{flag: False})) == INVALID_HAND
+
+
+def test_rule_flags_keep_the_core_types():
+    for rules in (ALL_RULES, NO_OPTIONAL_RULES):
+        assert classify_ranks([RANK_3] * 3 + [RANK_4] * 3 + [RANK_9] * 2 + [RANK_2] * 2, rules).hand_type \
+            == TYPE_TRIPLE_STRAIGHT_PLUS_PAIRS
+        assert classify_ranks([RANK_5] * 3 + [RANK_K], rules).hand_type == TYPE_TRIO_PLUS_ONE
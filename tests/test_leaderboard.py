@@ -0,0 +1,39 @@
+# telegram_doudizhu_bot/tests/test_leaderboard.py
+import pytest
+
+from utils.leaderboard import RATING_EPOCH_SQL, Leaderboard
+from utils.persistence import WriteBehindStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = WriteBehindStore(str(tmp_path / "bot.db"), flush_interval=0.01, max_batch=1).start()
+    yield store
+    store.close()
+
+
+def ratings(store):
+    with store.reader() as conn:
+        return sorted(tuple(row) for row in conn.execute("SELECT user_id, rating, rated_games FROM player_ratings"))
+
+
+def test_replace_ratings_commits_as_one_unit(store):
+    leaderboard = Leaderboard(store, top_n=5, rank_by="rating")
+    leaderboard.replace_ratings([(1, 1500.0, 3), (2, 1400.0, 2)])
+    store.flush()
+    leaderboard.replace_ratings([(3, 1600.0, 1)])
+    store.flush()
+    assert ratings(store) == [(3, 1600.0, 1)]
+    with store.reader() as conn:
+        assert conn.execute(RATING_EPOCH_SQL).fetchone()[0] == 2
+    assert leaderboard.ratings_epoch == 2
+
+
+def test_failed_replace_keeps_the_old_ratings(store):
+    leaderboard = Leaderboard(store, top_n=5, rank_by="rating")
+    leaderboard.replace_ratings([(1, 1500.0, 3)])
+    store.flush()
+    leaderboard.replace_ratings([(2, 1400.0, 1), (2, 1450.0, 1)]) # Duplicate user_id: the INSERT fails
+    store.flush()
+    assert ratings(store) == [(1, 1500.0, 3)]
+    assert store.stats["errors"] == 1
@@ -0,0 +1,99 @@
+# telegram_doudizhu_bot/tests/test_membership_cache.py
+import asyncio
+import time
+import types
+
+import pytest
+
+from utils.membership_cache import MembershipCache
+
+GROUP_ID = -100500
+
+
+class SlowBot:
+    """get_chat_member that takes `delay` seconds and counts its calls."""
+
+    def __init__(self, status: str = "member", delay: float = 0.05):
+        self.status = status
+        self.delay = delay
+        self.calls = 0
+
+    async def get_chat_member(self, chat_id, user_id):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return types.SimpleNamespace(status=self.status)
+
+
+class SlowSharedStore:
+    """In-memory stand-in for utils.shared_store.SharedStore whose reads block like SQLite."""
+
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key, default=None):
+        time.sleep(0.02)
+        return self.values.get(key, default)
+
+    def set(self, key, value, ttl=None):
+        self.values[key] = value
+
+    def incr(self, key):
+        self.values[key] = self.values.get(key, 0) + 1
+        return self.values[key]
+
+
+@pytest.mark.parametrize("shared", [False, True])
+def test_concurrent_checks_share_one_api_call(shared):
+    async def scenario():
+        cache, bot = MembershipCache(), SlowBot()
+        if shared:
+            cache.shared_store = SlowSharedStore()
+        results = await asyncio.gather(*(cache.is_member(bot, GROUP_ID, 7) for _ in range(5)))
+        return results, bot.calls, cache.stats()
+
+    results, calls, stats = asyncio.run(scenario())
+    assert results == [True] * 5
+    assert calls == 1
+    assert stats["coalesced"] == 4
+
+
+def test_shared_hit_is_shared_with_concurrent_waiters():
+    async def scenario():
+        cache, bot = MembershipCache(), SlowBot()
+        cache.shared_store = SlowSharedStore()
+        cache.shared_store.values[cache._shared_key((GROUP_ID, 7))] = False
+        results = await asyncio.gather(*(cache.is_member(bot, GROUP_ID, 7) for _ in range(3)))
+        return results, bot.calls
+
+    assert asyncio.run(scenario()) == ([False] * 3, 0)
+
+
+def test_cancelled_leader_does_not_cancel_waiters():
+    async def scenario():
+        cache, bot = MembershipCache(), SlowBot()
+        leader = asyncio.create_task(cache.is_member(bot, GROUP_ID, 7))
+        await asyncio.sleep(0)
+        waiters = [asyncio.create_task(cache.is_member(bot, GROUP_ID, 7)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await asyncio.gather(*waiters), bot.calls
+
+    results, calls = asyncio.run(scenario())
+    assert results == [True] * 3
+    assert calls == 2 # The cancelled call and one retry
+
+
+def test_errors_reach_every_waiter_and_are_not_cached():
+    class FailingBot(SlowBot):
+        async def get_chat_member(self, chat_id, user_id):
+            await super().get_chat_member(chat_id, user_id)
+            raise RuntimeError("boom")
+
+    async def scenario():
+        cache, bot = MembershipCache(), FailingBot()
+        results = await asyncio.gather(*(cache.is_member(bot, GROUP_ID, 7) for _ in range(3)), return_exceptions=True)
+        return results, cache, bot
+
+    results, cache, bot = asyncio.run(scenario())
+    assert all(isinstance(r, RuntimeError) for r in results) and bot.calls == 1
+    assert (GROUP_ID, 7) not in cache._entries
@@ -0,0 +1,71 @@
+# telegram_doudizhu_bot/tests/test_move_generator.py
+import random
+from itertools import product
+
+import pytest
+
+from constants import RANK_5, RANK_A, RANK_BLACK_JOKER, RANK_RED_JOKER, TYPE_INVALID, TYPE_BOMB, TYPE_ROCKET
+from game_logic.hand_rules import NUM_RANKS, RoomRules, classify_counts, classify_ranks, counts_from_ranks
+from game_logic.move_generator import can_beat, get_move_index, has_legal_move, legal_moves, level_mask, _fitting
+from game_logic.pattern_file import PatternFile, build_pattern_file
+
+RULE_SETS = [RoomRules(True, True, True), RoomRules(False, False, False), RoomRules(True, False, True)]
+
+
+def random_hand(rng: random.Random, size: int):
+    deck = [rank for rank in range(NUM_RANKS) for _ in range(1 if rank >= RANK_BLACK_JOKER else 4)]
+    return tuple(sum(1 for rank in rng.sample(deck, size) if rank == r) for r in range(NUM_RANKS))
+
+
+def brute_force_moves(hand, prev, rules):
+    """Every sub-multiset of the hand that classifies as a play beating `prev`."""
+    found = set()
+    for counts in product(*(range(count + 1) for count in hand)):
+        info = classify_counts(counts, rules)
+        if info.hand_type != TYPE_INVALID and can_beat(info, prev):
+            found.add((counts, info))
+    return found
+
+
+@pytest.mark.parametrize("seed, rules", list(enumerate(RULE_SETS)))
+def test_legal_moves_match_subset_enumeration(seed, rules):
+    rng = random.Random(seed)
+    for _ in range(25):
+        hand = random_hand(rng, rng.randint(1, 14))
+        opponent = random_hand(rng, 17)
+        previous_plays = [None] + [move.info for move in rng.sample(legal_moves(opponent, None, rules), 6)]
+        for prev in previous_plays:
+            moves = legal_moves(hand, prev, rules)
+            assert len(moves) == len(set(moves)), "duplicate moves"
+            assert set(moves) == brute_force_moves(hand, prev, rules)
+            assert has_legal_move(hand, prev, rules) == bool(moves)
+
+
+def test_bombs_and_rocket_beat_ordinary_plays():
+    hand = counts_from_ranks([RANK_5] * 4 + [RANK_BLACK_JOKER, RANK_RED_JOKER])
+    rocket = classify_ranks([RANK_BLACK_JOKER, RANK_RED_JOKER])
+    assert {move.info.hand_type for move in legal_moves(hand, classify_ranks([RANK_A, RANK_A]))} == {TYPE_BOMB, TYPE_ROCKET}
+    assert legal_moves(hand, rocket) == []
+    assert not has_legal_move(hand, rocket)
+
+
+def scan_all(index, hand):
+    """Leading moves by checking every indexed pattern, without the per-rank prefilter."""
+    hand_mask = level_mask(hand)
+    buckets = list(index.buckets.values()) + [index.bombs]
+    moves = {bucket.moves[i] for bucket in buckets for i, mask in enumerate(bucket.masks) if not mask & ~hand_mask}
+    return moves | ({index.rocket} if not index.rocket_mask & ~hand_mask else set())
+
+
+def test_rank_groups_skip_only_patterns_that_cannot_fit(tmp_path):
+    rng = random.Random(7)
+    airplane = counts_from_ranks([rank for rank in range(2, 7) for _ in range(3)] + [0, 0, 1, 1, 8])
+    hands = [airplane] + [random_hand(rng, 20) for _ in range(20)]
+    mapped = PatternFile(build_pattern_file(RULE_SETS[0], str(tmp_path / "patterns.bin")), RULE_SETS[0]).move_index()
+    for index in (get_move_index(RULE_SETS[0]), mapped):
+        for hand in hands:
+            buckets = list(index.buckets.values()) + [index.bombs]
+            found = [move for bucket in buckets for move in _fitting(bucket, level_mask(hand), -1)]
+            assert len(found) == len(set(found))
+            assert set(found) | {index.rocket} == scan_all(index, hand) | {index.rocket}
+    assert set(legal_moves(airplane, None, RULE_SETS[0])) == scan_all(get_move_index(RULE_SETS[0]), airplane)
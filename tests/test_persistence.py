@@ -0,0 +1,64 @@
+# telegram_doudizhu_bot/tests/test_persistence.py
+import pytest
+
+from utils.persistence import WriteBehindStore
+
+SCHEMA = "CREATE TABLE IF NOT EXISTS t (k INTEGER PRIMARY KEY, v TEXT NOT NULL);"
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = WriteBehindStore(str(tmp_path / "bot.db"), flush_interval=0.05, max_batch=100).start()
+    store.ensure_schema(SCHEMA)
+    yield store
+    store.close()
+
+
+def rows(store):
+    with store.reader() as conn:
+        return [tuple(row) for row in conn.execute("SELECT k, v FROM t ORDER BY k")]
+
+
+def test_flush_is_a_barrier_for_everything_queued_before_it(store):
+    for k in range(50):
+        store.execute("INSERT INTO t (k, v) VALUES (?, ?)", (k, str(k)))
+    assert store.flush(timeout=5)
+    assert len(rows(store)) == 50
+    assert store.stats["batches"] < 50 # Committed together, not one transaction per statement
+
+
+def test_failed_batch_is_retried_statement_by_statement(store):
+    committed = []
+    store.execute("INSERT INTO t (k, v) VALUES (1, 'a')", on_commit=lambda: committed.append(1))
+    store.execute("INSERT INTO t (k, v) VALUES (1, 'duplicate')", on_commit=lambda: committed.append("dup"))
+    store.execute("INSERT INTO t (k, v) VALUES (2, 'b')", on_commit=lambda: committed.append(2))
+    store.flush(timeout=5)
+    assert rows(store) == [(1, "a"), (2, "b")]
+    assert committed == [1, 2] # The dropped write's follow-up never runs
+    assert store.stats["errors"] == 1
+
+
+def test_group_is_all_or_nothing_on_retry(store):
+    store.execute("INSERT INTO t (k, v) VALUES (1, 'a')")
+    store.execute_group([("INSERT INTO t (k, v) VALUES (?, ?)", [(2, "b")]),
+                         ("INSERT INTO t (k, v) VALUES (?, ?)", [(1, "duplicate")])])
+    store.execute("INSERT INTO t (k, v) VALUES (3, 'c')")
+    store.flush(timeout=5)
+    assert rows(store) == [(1, "a"), (3, "c")]
+
+
+def test_bad_parameters_do_not_kill_the_writer(store):
+    store.execute("INSERT INTO t (k, v) VALUES (?, ?)", (1,)) # Wrong parameter count
+    store.execute("INSERT INTO t (k, v) VALUES (?, ?)", (2, "b"))
+    assert store.flush(timeout=5)
+    assert rows(store) == [(2, "b")]
+
+
+def test_close_drains_the_queue(tmp_path):
+    store = WriteBehindStore(str(tmp_path / "bot.db"), flush_interval=60.0).start()
+    store.ensure_schema(SCHEMA)
+    store.executemany("INSERT INTO t (k, v) VALUES (?, ?)", [(k, "x") for k in range(10)])
+    store.close()
+    reopened = WriteBehindStore(str(tmp_path / "bot.db"))
+    assert len(rows(reopened)) == 10
+    reopened.close()
@@ -0,0 +1,64 @@
+# telegram_doudizhu_bot/tests/test_rate_limiter.py
+import pytest
+
+from utils.rate_limiter import RateLimiter
+from utils.shared_store import SharedStore
+
+
+def test_bucket_allows_capacity_then_denies():
+    limiter = RateLimiter()
+    assert [limiter.allow("u1", 3, 10.0, now=0.0) for _ in range(4)] == [True, True, True, False]
+
+
+def test_tokens_refill_at_capacity_per_period():
+    limiter = RateLimiter()
+    for _ in range(3):
+        limiter.allow("u1", 3, 9.0, now=0.0)
+    assert not limiter.allow("u1", 3, 9.0, now=2.9)
+    assert limiter.allow("u1", 3, 9.0, now=6.0) # 3 s per token; the denied call used none
+    assert not limiter.allow("u1", 3, 9.0, now=6.0)
+
+
+def test_keys_are_independent():
+    limiter = RateLimiter()
+    assert limiter.allow(("chat", 1), 1, 60.0, now=0.0)
+    assert not limiter.allow(("chat", 1), 1, 60.0, now=0.0)
+    assert limiter.allow(("chat", 2), 1, 60.0, now=0.0)
+    assert limiter.allow(("cmd", "start", 1), 1, 60.0, now=0.0)
+
+
+def test_full_buckets_are_evicted():
+    limiter = RateLimiter()
+    for user in range(100):
+        limiter.allow(user, 5, 1.0, now=0.0)
+    assert limiter.stats()["tracked_keys"] == 100
+    limiter.allow("late", 5, 1.0, now=10.0) # Every earlier bucket is full again by now
+    assert limiter.stats()["tracked_keys"] == 1
+
+
+def test_max_keys_caps_tracked_buckets():
+    limiter = RateLimiter(max_keys=10)
+    for user in range(50):
+        limiter.allow(user, 5, 3600.0, now=float(user))
+    assert limiter.stats()["tracked_keys"] == 10
+    assert 0 not in limiter._buckets and 49 in limiter._buckets # The least recently used go first
+
+
+def test_stats_count_allowed_and_denied_per_label():
+    limiter = RateLimiter()
+    for _ in range(3):
+        limiter.allow("u1", 2, 60.0, label="play", now=0.0)
+    limiter.allow("u2", 1, 60.0, label="start", now=0.0)
+    stats = limiter.stats()
+    assert stats["per_label"] == {"play": {"allowed": 2, "denied": 1}, "start": {"allowed": 1, "denied": 0}}
+    assert stats["deny_ratio"] == pytest.approx(1 / 4)
+
+
+def test_shared_windows_add_up_across_limiters(tmp_path):
+    store = SharedStore(str(tmp_path / "shared.db"))
+    first, second = RateLimiter(shared_store=store), RateLimiter(shared_store=store)
+    assert all(first.allow("u1", 3, 3600.0) for _ in range(2))
+    first.sync_shared()
+    assert second.allow("u1", 3, 3600.0) # Knows nothing yet: 1 of 3 locally
+    second.sync_shared() # Pushes its hit and pulls the total of 3
+    assert not second.allow("u1", 3, 3600.0)
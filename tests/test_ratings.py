@@ -0,0 +1,45 @@
+# telegram_doudizhu_bot/tests/test_ratings.py
+import asyncio
+
+import pytest
+
+from utils.leaderboard import GameResult, Leaderboard
+from utils.persistence import WriteBehindStore
+from utils.ratings import RATING_INITIAL, RatingEngine
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = WriteBehindStore(str(tmp_path / "bot.db"), flush_interval=0.01).start()
+    yield store
+    store.close()
+
+
+def test_engine_reloads_on_the_writer_thread_after_a_recompute_elsewhere(store):
+    leaderboard = Leaderboard(store, top_n=5, rank_by="rating")
+    engine = RatingEngine(leaderboard)
+    asyncio.run(engine.load())
+    assert engine.rating(1) == RATING_INITIAL
+
+    Leaderboard(store, top_n=5, rank_by="rating").replace_ratings([(1, 1700.0, 5)]) # e.g. another process
+    store.flush()
+    assert engine.rating(1) == RATING_INITIAL # Not seen yet
+
+    leaderboard.record_game_result([GameResult(1, "a", True, 2), GameResult(2, "b", False, -1),
+                                    GameResult(3, "c", False, -1)])
+    store.flush()
+    assert engine.rating(1) == 1700.0
+
+
+def test_record_settlement_stores_the_deltas(store):
+    leaderboard = Leaderboard(store, top_n=5, rank_by="rating")
+    engine = RatingEngine(leaderboard)
+    asyncio.run(engine.load())
+    engine.record_settlement([GameResult(1, "a", True, 2), GameResult(2, "b", False, -1),
+                              GameResult(3, "c", False, -1)], landlord_id=1, multiplier=1)
+    store.flush()
+    with store.reader() as conn:
+        stored = dict(conn.execute("SELECT user_id, rating FROM player_ratings").fetchall())
+    assert stored[1] > RATING_INITIAL and stored[2] == stored[3] < RATING_INITIAL
+    assert stored[1] + stored[2] + stored[3] == pytest.approx(3 * RATING_INITIAL)
+    assert stored == {user_id: engine.rating(user_id) for user_id in (1, 2, 3)}
@@ -0,0 +1,75 @@
+# telegram_doudizhu_bot/tests/test_shared_store.py
+import multiprocessing
+import sqlite3
+
+import pytest
+
+from utils.shared_store import SharedStore
+
+
+@pytest.fixture
+def store_path(tmp_path):
+    return str(tmp_path / "shared.db")
+
+
+def _count_to(path: str, times: int, results) -> None:
+    store = SharedStore(path)
+    results.extend([store.incr("counter") for _ in range(times)])
+
+
+def test_incr_is_atomic_across_processes(store_path):
+    manager = multiprocessing.get_context("spawn").Manager()
+    results = manager.list()
+    ctx = multiprocessing.get_context("spawn")
+    workers = [ctx.Process(target=_count_to, args=(store_path, 200, results)) for _ in range(3)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert sorted(results) == list(range(1, 601)) # Every returned value is unique
+    assert SharedStore(store_path).get("counter") == 600
+
+
+def test_mapping_serves_reads_from_its_replica(store_path):
+    store = SharedStore(store_path)
+    store.set("users_lang:42", "zh")
+    users_lang = store.mapping("users_lang", sync_seconds=3600, key_type=int)
+    try:
+        assert users_lang.get(42) == "zh" and 42 in users_lang
+        users_lang[7] = "en"
+        assert users_lang[7] == "en" # Visible locally before the write is committed
+        assert sorted(users_lang) == [7, 42] # Keys come back as ints
+        users_lang.sync()
+        assert store.get("users_lang:7") == "en"
+    finally:
+        users_lang.close()
+
+
+def test_mapping_sees_other_shards_changes_after_a_sync(store_path):
+    first = SharedStore(store_path).mapping("chats_lang", sync_seconds=3600, key_type=int)
+    second = SharedStore(store_path).mapping("chats_lang", sync_seconds=3600, key_type=int)
+    try:
+        first[-100] = "zh"
+        first.sync()
+        assert second.get(-100) is None
+        second.sync()
+        assert second.get(-100) == "zh"
+        del first[-100]
+        first.sync()
+        assert SharedStore(store_path).get("chats_lang:-100") is None
+    finally:
+        first.close()
+        second.close()
+
+
+def test_old_databases_get_the_updated_at_column(store_path):
+    conn = sqlite3.connect(store_path)
+    conn.execute("CREATE TABLE kv (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)")
+    conn.execute("INSERT INTO kv VALUES ('users_lang:1', '\"en\"', NULL)")
+    conn.commit()
+    conn.close()
+    users_lang = SharedStore(store_path).mapping("users_lang", sync_seconds=3600, key_type=int)
+    try:
+        assert dict(users_lang) == {1: "en"}
+    finally:
+        users_lang.close()
@@ -0,0 +1,20 @@
+# telegram_doudizhu_bot/tests/test_simulator.py
+import numpy as np
+
+from game_logic.hand_rules import RoomRules
+from game_logic.simulator import _pack_levels, _remove_levels, simulate_batch
+
+
+def test_remove_levels_matches_packing_the_remaining_counts():
+    rng = np.random.default_rng(0)
+    hands = rng.integers(0, 5, size=(2000, 15)).astype(np.int8)
+    removed = (hands * rng.random((2000, 15))).round().astype(np.int8)
+    assert np.array_equal(_remove_levels(_pack_levels(hands), _pack_levels(removed)), _pack_levels(hands - removed))
+
+
+def test_every_game_ends_with_a_zero_sum_score():
+    for rules in (RoomRules(True, True, True), RoomRules(False, False, False)):
+        result = simulate_batch(2000, np.random.default_rng(1), rules)
+        assert (result.winner >= 0).all()
+        assert (result.scores.sum(axis=1) == 0).all()
+        assert np.array_equal(result.landlord_won, result.winner == result.landlord)
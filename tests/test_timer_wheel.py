@@ -0,0 +1,67 @@
+# telegram_doudizhu_bot/tests/test_timer_wheel.py
+import asyncio
+
+import pytest
+
+from utils.timer_wheel import TimerWheel
+
+
+async def noop(context, timers):
+    pass
+
+
+def make_wheel(tick=1.0, slots=8):
+    wheel = TimerWheel(tick_seconds=tick, slots=slots)
+    return wheel, wheel.next_tick_at - tick # Time the wheel was created at (tick 0)
+
+
+def test_timer_fires_on_the_first_tick_after_its_deadline():
+    wheel, start = make_wheel()
+    wheel.arm("a", 2.5, noop)
+    assert wheel.advance(start + 2.99) == []
+    assert [t.key for t in wheel.advance(start + 3.0)] == ["a"]
+    assert len(wheel) == 0
+
+
+def test_long_timers_wait_extra_rounds():
+    wheel, start = make_wheel(slots=8)
+    wheel.arm("long", 20.0, noop)
+    assert wheel.advance(start + 20.5) == [] # Its slot came round twice already
+    assert [t.key for t in wheel.advance(start + 21.0)] == ["long"]
+
+
+def test_rearm_replaces_and_cancel_removes():
+    wheel, start = make_wheel()
+    wheel.arm("a", 1.0, noop, data=1)
+    wheel.arm("a", 5.0, noop, data=2)
+    wheel.arm("b", 1.0, noop)
+    assert wheel.cancel("b") and not wheel.cancel("b")
+    assert wheel.advance(start + 4.0) == []
+    expired = wheel.advance(start + 6.0)
+    assert [(t.key, t.data) for t in expired] == [("a", 2)]
+
+
+def test_late_advance_catches_up_on_missed_ticks():
+    wheel, start = make_wheel()
+    for i in range(5):
+        wheel.arm(i, float(i), noop)
+    assert sorted(t.key for t in wheel.advance(start + 10.0)) == [0, 1, 2, 3, 4]
+    assert wheel.last_tick_lag == pytest.approx(9.0)
+
+
+def test_fire_awaits_each_callback_once_per_batch():
+    calls = []
+
+    async def on_bid(context, timers):
+        calls.append(("bid", sorted(t.key for t in timers)))
+
+    async def on_play(context, timers):
+        calls.append(("play", [t.key for t in timers]))
+        raise RuntimeError("a failing batch doesn't stop the others")
+
+    wheel, start = make_wheel()
+    wheel.arm(("bid", 1, None), 1.0, on_bid)
+    wheel.arm(("bid", 2, None), 1.0, on_bid)
+    wheel.arm(("play", 3, None), 1.0, on_play)
+    asyncio.run(wheel.fire(None, wheel.advance(start + 2.0)))
+    assert sorted(calls) == [("bid", [("bid", 1, None), ("bid", 2, None)]), ("play", [("play", 3, None)])]
@@ -0,0 +1,88 @@
+# telegram_doudizhu_bot/utils/ai_pool.py
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+try:
+    from config import AI_SEARCH_TIME_BUDGET_SECONDS, AI_SEARCH_WORKERS, AI_ENDGAME_MAX_CARDS
+except ImportError:
+    print("CRITICAL: config.py not found in utils.ai_pool.py. Using fallback defaults.")
+    AI_SEARCH_TIME_BUDGET_SECONDS = 3.0
+    AI_SEARCH_WORKERS = 2
+    AI_ENDGAME_MAX_CARDS = 12
+
+from game_logic.ai_search import SearchRequest, search_move, greedy_move
+from game_logic.hand_rules import DEFAULT_RULES, RoomRules
+from game_logic.move_generator import Move, get_move_index
+
+# Extra time allowed for process hand-off before the event loop gives up on a worker
+RESULT_GRACE_SECONDS = 1.0
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def _warm_worker() -> None:
+    """Builds the default pattern tables in each worker so the first search isn't slowed down."""
+    get_move_index(DEFAULT_RULES)
+
+
+def start_ai_pool(workers: Optional[int] = None) -> ProcessPoolExecutor:
+    """Starts the AI worker pool (idempotent). Call once at bot startup."""
+    global _executor
+    if _executor is None:
+        count = workers if workers is not None else AI_SEARCH_WORKERS
+        _executor = ProcessPoolExecutor(max_workers=count or os.cpu_count(), initializer=_warm_worker)
+    return _executor
+
+
+def shutdown_ai_pool() -> None:
+    """Stops the worker pool. Call on bot shutdown."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def build_search_request(
+    seat: int,
+    landlord: int,
+    hand: tuple,
+    unseen: tuple,
+    hand_sizes: tuple,
+    prev=None,
+    last_seat: int = -1,
+    rules: RoomRules = DEFAULT_RULES,
+    budget_seconds: Optional[float] = None
+) -> SearchRequest:
+    """Fills in config-driven search settings for a SearchRequest."""
+    return SearchRequest(
+        seat=seat, landlord=landlord, hand=tuple(hand), unseen=tuple(unseen), hand_sizes=tuple(hand_sizes),
+        prev=prev, last_seat=last_seat,
+        budget_seconds=budget_seconds if budget_seconds is not None else AI_SEARCH_TIME_BUDGET_SECONDS,
+        rules=rules, endgame_max_cards=AI_ENDGAME_MAX_CARDS,
+    )
+
+
+async def choose_ai_move(request: SearchRequest) -> Optional[Move]:
+    """
+    Runs the move search in the worker pool so the event loop keeps serving other chats.
+    Returns the chosen move (None = pass). If the worker misses its deadline or fails,
+    the cheap greedy policy is used instead so the AI never stalls its game.
+
+    The deadline is fixed here, at submit time: time spent queued behind other searches
+    counts against the budget, and a worker skips the search of a request that expired
+    before it was picked up instead of spending a full budget on an abandoned result.
+    """
+    if request.deadline is None:
+        request = request._replace(deadline=time.time() + request.budget_seconds)
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(start_ai_pool(), search_move, request)
+    try:
+        return await asyncio.wait_for(future, timeout=max(0.0, request.deadline - time.time()) + RESULT_GRACE_SECONDS)
+    except Exception as e: # Timeout, broken pool, pickling error...
+        print(f"AI search failed or timed out for seat {request.seat}: {e!r}. Using greedy fallback.")
+        prev = None if request.prev is None or request.last_seat == request.seat else request.prev
+        hold_back = prev is not None and request.seat != request.landlord and request.last_seat != request.landlord
+        return greedy_move(request.hand, prev, hold_back, request.rules)
@@ -0,0 +1,273 @@
+# telegram_doudizhu_bot/utils/callback_codec.py
+"""
+Packed callback_data and table-driven callback dispatch.
+
+Packed format (before URL-safe base64 without padding, prefixed with PACKED_MARKER):
+    byte 0      codec version
+    byte 1      action id (ACTION_*)
+    varint      game generation (0 for buttons not tied to a game round)
+    rest        action payload (card index, 54-bit card mask, bid value, page, ...)
+
+The generation is bumped whenever a chat starts a new round, so buttons left over from a
+previous round are rejected by one integer comparison before any game lookup. Legacy
+string callback_data (join, bid_2, selcard_H_3, ...) is still decoded for old messages;
+having no generation, a legacy game button is instead checked against the phase of the
+chat's game (LEGACY_ACTION_PHASES).
+"""
+import base64
+from functools import lru_cache
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from constants import (
+    PHASE_WAITING_FOR_PLAYERS, PHASE_BIDDING, PHASE_PLAYING, PHASE_GAME_OVER,
+    CALLBACK_JOIN_GAME, CALLBACK_START_GAME_MANUALLY, CALLBACK_BID_PREFIX, CALLBACK_SELECT_CARD_PREFIX,
+    CALLBACK_PLAY_SELECTED_CARDS, CALLBACK_PASS_TURN, CALLBACK_RESET_SELECTION, CALLBACK_PLAY_AGAIN,
+    CALLBACK_VIEW_RULES_PAGE_PREFIX, CALLBACK_CHANGE_LANG_PREFIX, CALLBACK_CONFIRM_ACTION_PREFIX,
+)
+from i18n.translator import register_reload_hook
+from utils.metrics import observe_api_call
+
+CODEC_VERSION = 1
+PACKED_MARKER = "~" # Never the first character of a legacy callback_data string
+MAX_CALLBACK_BYTES = 64 # Telegram limit on callback_data
+
+(ACTION_JOIN, ACTION_START_MANUALLY, ACTION_BID, ACTION_SELECT_CARD, ACTION_PLAY_SELECTED, ACTION_PASS,
+ ACTION_RESET_SELECTION, ACTION_PLAY_AGAIN, ACTION_RULES_PAGE, ACTION_CHANGE_LANG, ACTION_CONFIRM) = range(1, 12)
+
+# Payload kinds: how the bytes after the generation are interpreted
+PAYLOAD_NONE, PAYLOAD_INT, PAYLOAD_MASK, PAYLOAD_TEXT = range(4)
+MASK_BYTES = 7 # 54 card bits
+
+ACTION_PAYLOADS = {
+    ACTION_JOIN: PAYLOAD_NONE,
+    ACTION_START_MANUALLY: PAYLOAD_NONE,
+    ACTION_BID: PAYLOAD_INT, # 0 = pass, 1..3 = bid
+    ACTION_SELECT_CARD: PAYLOAD_INT, # Card bit index (game_logic.card_codec)
+    ACTION_PLAY_SELECTED: PAYLOAD_MASK, # Selected cards as a 54-bit mask
+    ACTION_PASS: PAYLOAD_NONE,
+    ACTION_RESET_SELECTION: PAYLOAD_NONE,
+    ACTION_PLAY_AGAIN: PAYLOAD_NONE,
+    ACTION_RULES_PAGE: PAYLOAD_INT,
+    ACTION_CHANGE_LANG: PAYLOAD_TEXT,
+    ACTION_CONFIRM: PAYLOAD_TEXT,
+}
+
+# Legacy string callback_data -> action (exact strings, then "prefix_" strings)
+LEGACY_EXACT = {
+    CALLBACK_JOIN_GAME: ACTION_JOIN,
+    CALLBACK_START_GAME_MANUALLY: ACTION_START_MANUALLY,
+    CALLBACK_PLAY_SELECTED_CARDS: ACTION_PLAY_SELECTED,
+    CALLBACK_PASS_TURN: ACTION_PASS,
+    CALLBACK_RESET_SELECTION: ACTION_RESET_SELECTION,
+    CALLBACK_PLAY_AGAIN: ACTION_PLAY_AGAIN,
+}
+LEGACY_PREFIXES = {
+    CALLBACK_BID_PREFIX: ACTION_BID,
+    CALLBACK_SELECT_CARD_PREFIX: ACTION_SELECT_CARD,
+    CALLBACK_VIEW_RULES_PAGE_PREFIX: ACTION_RULES_PAGE,
+    CALLBACK_CHANGE_LANG_PREFIX: ACTION_CHANGE_LANG,
+    CALLBACK_CONFIRM_ACTION_PREFIX: ACTION_CONFIRM,
+}
+
+# Game phases (None = no game in the chat) in which a legacy press of a game action can still apply
+LEGACY_ACTION_PHASES = {
+    ACTION_JOIN: (PHASE_WAITING_FOR_PLAYERS,),
+    ACTION_START_MANUALLY: (PHASE_WAITING_FOR_PLAYERS,),
+    ACTION_BID: (PHASE_BIDDING,),
+    ACTION_SELECT_CARD: (PHASE_PLAYING,),
+    ACTION_PLAY_SELECTED: (PHASE_PLAYING,),
+    ACTION_PASS: (PHASE_PLAYING,),
+    ACTION_RESET_SELECTION: (PHASE_PLAYING,),
+    ACTION_PLAY_AGAIN: (PHASE_GAME_OVER, None),
+}
+
+
+class CallbackPayload(NamedTuple):
+    action: int
+    generation: int # 0 = not tied to a round (or a legacy button)
+    value: object = None # int, card mask, text, or the raw legacy suffix
+    legacy: bool = False
+
+
+def _write_varint(value: int, out: bytearray) -> None:
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return
+
+
+def _read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, pos
+        shift += 7
+
+
+def encode_callback(action: int, generation: int = 0, value: object = None) -> str:
+    """Packs an action into callback_data (raises ValueError if it would exceed 64 bytes)."""
+    out = bytearray((CODEC_VERSION, action))
+    _write_varint(generation, out)
+    kind = ACTION_PAYLOADS[action]
+    if kind == PAYLOAD_INT:
+        _write_varint(int(value), out)
+    elif kind == PAYLOAD_MASK:
+        out += int(value).to_bytes(MASK_BYTES, "little")
+    elif kind == PAYLOAD_TEXT:
+        out += str(value).encode("utf-8")
+    data = PACKED_MARKER + base64.urlsafe_b64encode(bytes(out)).decode("ascii").rstrip("=")
+    if len(data) > MAX_CALLBACK_BYTES:
+        raise ValueError(f"callback_data for action {action} is {len(data)} bytes (max {MAX_CALLBACK_BYTES})")
+    return data
+
+
+def _decode_legacy(data: str) -> Optional[CallbackPayload]:
+    action = LEGACY_EXACT.get(data)
+    if action is not None:
+        return CallbackPayload(action, 0, None, True)
+    prefix, sep, rest = data.partition("_")
+    action = LEGACY_PREFIXES.get(prefix + sep)
+    if action is None:
+        return None
+    return CallbackPayload(action, 0, rest, True)
+
+
+@lru_cache(maxsize=4096)
+def decode_callback(data: str) -> Optional[CallbackPayload]:
+    """Decodes packed or legacy callback_data. Returns None for unknown/malformed data."""
+    if not data.startswith(PACKED_MARKER):
+        return _decode_legacy(data)
+    try:
+        raw = base64.urlsafe_b64decode(data[1:] + "=" * (-(len(data) - 1) % 4))
+        if raw[0] != CODEC_VERSION:
+            return None
+        action = raw[1]
+        kind = ACTION_PAYLOADS.get(action)
+        if kind is None:
+            return None
+        generation, pos = _read_varint(raw, 2)
+        value: object = None
+        if kind == PAYLOAD_INT:
+            value, pos = _read_varint(raw, pos)
+        elif kind == PAYLOAD_MASK:
+            value = int.from_bytes(raw[pos:pos + MASK_BYTES], "little")
+        elif kind == PAYLOAD_TEXT:
+            value = raw[pos:].decode("utf-8")
+        return CallbackPayload(action, generation, value)
+    except (ValueError, IndexError, UnicodeDecodeError):
+        return None
+
+
+class GenerationRegistry:
+    """Current round number per chat; bump() whenever a chat deals a new round or ends a game."""
+
+    def __init__(self):
+        self._generations: Dict[int, int] = {}
+
+    def current(self, chat_id: int) -> int:
+        return self._generations.get(chat_id, 1)
+
+    def bump(self, chat_id: int) -> int:
+        generation = self._generations.get(chat_id, 1) + 1
+        self._generations[chat_id] = generation
+        return generation
+
+    def restore(self, chat_id: int, generation: int) -> None:
+        """Sets a chat's round number from a game snapshot, so its keyboards stay valid across a restart."""
+        self._generations[chat_id] = generation
+
+    def forget(self, chat_id: int) -> None:
+        self._generations.pop(chat_id, None)
+
+
+CallbackHandler = Callable[..., Awaitable[object]]
+
+
+class CallbackDispatcher:
+    """
+    Routes callback queries by action id through a flat table (one index per press)
+    instead of a chain of prefix checks. Handlers are called as
+    `handler(update, context, payload)` with the decoded CallbackPayload.
+
+    `phase_of(chat_id)` returns the phase of the chat's game (PHASE_*, None without a
+    game); it validates legacy presses of game-bound actions, which carry no generation.
+    Without it those presses are rejected as expired.
+    """
+
+    def __init__(self, generations: GenerationRegistry, phase_of: Optional[Callable[[int], Optional[str]]] = None):
+        self.generations = generations
+        self.phase_of = phase_of
+        self._handlers: List[Optional[Tuple[CallbackHandler, bool]]] = [None] * 256
+        self.stats = {"dispatched": 0, "stale": 0, "unknown": 0}
+
+    def register(self, action: int, handler: CallbackHandler, game_bound: bool = False) -> None:
+        """
+        game_bound handlers (buttons of a game round: join, bid, cards, play again) only
+        receive presses of the chat's current round. Others (language, rules pages,
+        confirmations) are sent with generation 0 and always dispatched.
+        """
+        self._handlers[action] = (handler, game_bound)
+
+    def _is_stale(self, payload: CallbackPayload, chat_id: int) -> bool:
+        if not payload.legacy:
+            return payload.generation != self.generations.current(chat_id)
+        if self.phase_of is None:
+            return True
+        return self.phase_of(chat_id) not in LEGACY_ACTION_PHASES.get(payload.action, ())
+
+    async def dispatch(self, update, context) -> None:
+        """CallbackQueryHandler callback for every button press."""
+        query = update.callback_query
+        payload = decode_callback(query.data or "")
+        entry = self._handlers[payload.action] if payload else None
+        if entry is None:
+            self.stats["unknown"] += 1
+            await observe_api_call("answerCallbackQuery", query.answer())
+            return
+
+        handler, game_bound = entry
+        chat = update.effective_chat
+        if game_bound and chat and self._is_stale(payload, chat.id):
+            self.stats["stale"] += 1
+            from i18n.translator import _ # Local import
+            from utils.helpers import get_user_lang # Local import
+            user = update.effective_user
+            await observe_api_call("answerCallbackQuery",
+                                   query.answer(_("This button has expired.", get_user_lang(context, user.id if user else None))))
+            return
+
+        self.stats["dispatched"] += 1
+        await handler(update, context, payload)
+
+
+@lru_cache(maxsize=16384)
+def build_packed_selection_keyboard(hand_mask: int, selected_mask: int, lang: str, generation: int):
+    """
+    Card-selection keyboard (see game_logic.card_codec) whose buttons carry packed
+    callback_data for `generation`; cached per (hand, selection, language, generation).
+    """
+    from telegram import InlineKeyboardButton, InlineKeyboardMarkup # Local import
+    from i18n.translator import _ # Local import
+    from game_logic.card_codec import selection_keyboard_layout, parse_card_callback # Local import
+
+    rows = [
+        [InlineKeyboardButton(text, callback_data=encode_callback(ACTION_SELECT_CARD, generation, parse_card_callback(data)))
+         for text, data in row]
+        for row in selection_keyboard_layout(hand_mask, selected_mask)
+    ]
+    rows.append([
+        InlineKeyboardButton(_("Play", lang), callback_data=encode_callback(ACTION_PLAY_SELECTED, generation, selected_mask)),
+        InlineKeyboardButton(_("Pass", lang), callback_data=encode_callback(ACTION_PASS, generation)),
+        InlineKeyboardButton(_("Reset", lang), callback_data=encode_callback(ACTION_RESET_SELECTION, generation)),
+    ])
+    return InlineKeyboardMarkup(rows)
+
+
+register_reload_hook(build_packed_selection_keyboard.cache_clear) # Its button labels are translated
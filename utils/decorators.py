@@ -1,31 +1,25 @@
 # telegram_doudizhu_bot/utils/decorators.py
-from functools import wraps
 import time
-from typing import Callable, Dict, List, Any, Coroutine
+from functools import wraps
+from typing import Callable, List, Any, Coroutine, Optional
 
 from telegram import Update
 from telegram.ext import ContextTypes
 
-from i18n.translator import _
-from utils.helpers import get_user_lang, is_user_admin, check_group_membership_and_reply
-
-# Store last call times for rate limiting (user_id -> list of timestamps)
-# This should ideally be in context.bot_data for persistence across restarts if needed,
-# or handled by a more robust rate-limiting library. For simplicity, module-level dict.
-user_call_times: Dict[int, List[float]] = {}
+from i18n.translator import format_cached
+from utils.helpers import check_group_membership_and_reply
+from utils.request_context import get_request_context
+from utils.rate_limiter import rate_limiter
+from utils.metrics import metrics, instrument_handler, observe_api_call
 
 
 def admin_command(func: Callable[..., Coroutine[Any, Any, Any]]):
     """Decorator to restrict a command handler to admins only."""
     @wraps(func)
     async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE, *args, **kwargs):
-        user = update.effective_user
-        user_lang = get_user_lang(context, user.id if user else None)
-        if not user or not is_user_admin(user.id, context):
-            if update.message:
-                await update.message.reply_text(_("⛔ Access denied. This command is for admins only.", user_lang))
-            elif update.callback_query:
-                await update.callback_query.answer(_("⛔ Access denied. Admin only.", user_lang), show_alert=True)
+        request = get_request_context(update, context)
+        if not request.is_admin:
+            await request.reject("⛔ Access denied. This command is for admins only.", "⛔ Access denied. Admin only.")
             return
         return await func(update, context, *args, **kwargs)
     return wrapper
@@ -42,47 +36,44 @@ def group_member_command(func: Callable[..., Coroutine[Any, Any, Any]]):
 
 def rate_limit_command(
     calls: int = None, # Max calls. Uses config if None.
-    period: int = None # Per X seconds. Uses config if None.
+    period: int = None, # Per X seconds. Uses config if None.
+    per: str = "user", # Bucket scope: "user" or "chat"
+    per_command: bool = False # If True, each decorated command gets its own bucket
 ):
     """
-    Decorator to rate limit a command handler per user.
+    Decorator to rate limit a command handler per user (or per chat).
     Uses values from config.py if not specified in decorator args.
+    Buckets live in utils.rate_limiter.rate_limiter (token bucket, O(1) per check, idle entries evicted).
+    Also the handler's instrumentation point: calls are counted and a sample is timed (utils.metrics).
     """
     def decorator(func: Callable[..., Coroutine[Any, Any, Any]]):
+        label = func.__name__ if per_command else per
+
         @wraps(func)
         async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE, *args, **kwargs):
-            user = update.effective_user
-            if not user: # Should not happen for most handlers
+            request = get_request_context(update, context)
+            if request.user_id is None: # Should not happen for most handlers
                 return await func(update, context, *args, **kwargs)
 
-            user_lang = get_user_lang(context, user.id)
-            
-            # Get rate limit settings from bot_data (config) or use decorator args
-            _calls = calls if calls is not None else context.bot_data.get("config", {}).get("RATE_LIMIT_CALLS", 5)
-            _period = period if period is not None else context.bot_data.get("config", {}).get("RATE_LIMIT_PERIOD", 10)
+            if per == "chat" and request.chat_id is not None:
+                key = ("chat", request.chat_id)
+            else:
+                key = ("user", request.user_id)
+            if per_command:
+                key += (func.__name__,)
 
-            current_time = time.time()
-            if user.id not in user_call_times:
-                user_call_times[user.id] = []
-
-            # Remove timestamps older than the period
-            user_call_times[user.id] = [t for t in user_call_times[user.id] if t > current_time - _period]
+            # Get rate limit settings from bot_data (config) or use decorator args
+            _calls = calls if calls is not None else request.config.get("RATE_LIMIT_CALLS", 5)
+            _period = period if period is not None else request.config.get("RATE_LIMIT_PERIOD", 10)
 
-            if len(user_call_times[user.id]) >= _calls:
+            if not rate_limiter.allow(key, _calls, _period, label):
                 # User has exceeded the rate limit
-                if update.message:
-                    await update.message.reply_text(
-                        _("⏳ You are sending commands too quickly. Please wait a moment.", user_lang)
-                    )
-                elif update.callback_query:
-                    await update.callback_query.answer(
-                        _("⏳ Too many requests. Please wait.", user_lang), show_alert=True
-                    )
+                await request.reject("⏳ You are sending commands too quickly. Please wait a moment.",
+                                     "⏳ Too many requests. Please wait.")
                 return
 
-            user_call_times[user.id].append(current_time)
             return await func(update, context, *args, **kwargs)
-        return wrapper
+        return instrument_handler(wrapper, func.__name__)
     return decorator
 
 def game_command( # A meta-decorator for commands that require an active game
@@ -93,59 +84,59 @@ def game_command( # A meta-decorator for commands that require an active game
     """
     Decorator for command handlers that operate on an active game.
     Checks for active game, optionally specific phase, and if it's player's turn.
+    The handler receives game, player and the update's RequestContext as `request` keyword arguments.
     """
     def decorator(func: Callable[..., Coroutine[Any, Any, Any]]):
         @wraps(func)
         async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE, *args, **kwargs):
-            chat_id = update.effective_chat.id
-            user = update.effective_user
-            user_id = user.id if user else None
-            user_lang = get_user_lang(context, user_id)
-            
-            game_manager = context.bot_data.get("game_manager")
-            if not game_manager:
+            request = get_request_context(update, context)
+
+            if not request.game_manager:
                 # This is a critical setup error
                 print("CRITICAL: GameManager not found in context.bot_data")
-                if update.message: await update.message.reply_text(_("Bot error: Game service unavailable.", user_lang))
-                elif update.callback_query: await update.callback_query.answer(_("Bot error.", user_lang), show_alert=True)
+                await request.reject("Bot error: Game service unavailable.", "Bot error.")
                 return
 
-            game = game_manager.get_game(chat_id)
+            game = request.game
             if not game:
-                if update.message: await update.message.reply_text(_("No active game in this chat. Start one with /newgame.", user_lang))
-                elif update.callback_query: await update.callback_query.answer(_("No active game.", user_lang), show_alert=True)
+                await request.reject("No active game in this chat. Start one with /newgame.", "No active game.")
                 return
 
-            player = game.get_player(user_id) if user_id else None
+            player = request.player
             if not player and not allow_spectators and require_game_phase: # If needs phase, usually needs player
-                if update.message: await update.message.reply_text(_("You are not part of the current game.", user_lang))
-                elif update.callback_query: await update.callback_query.answer(_("Not in game.", user_lang), show_alert=True)
+                await request.reject("You are not part of the current game.", "Not in game.")
                 return
-            
+
             if require_game_phase and game.phase not in require_game_phase:
                 # Example: Trying to /play when game is in PHASE_BIDDING
-                phases_str = ", ".join([_(p, user_lang) for p in require_game_phase])
-                msg = _("This action is only allowed during game phase(s): {}.", user_lang).format(phases_str)
-                if update.message: await update.message.reply_text(msg)
-                elif update.callback_query: await update.callback_query.answer(msg, show_alert=True)
+                phases_str = ", ".join([request._(p) for p in require_game_phase])
+                msg = format_cached("This action is only allowed during game phase(s): {}.", request.lang, phases_str)
+                if update.message: await observe_api_call("sendMessage", update.message.reply_text(msg))
+                elif update.callback_query:
+                    await observe_api_call("answerCallbackQuery", update.callback_query.answer(msg, show_alert=True))
                 return
 
             if require_player_turn:
                 if not player: # Should have been caught above if not allow_spectators
-                    if update.message: await update.message.reply_text(_("You are not part of this game.", user_lang))
-                    elif update.callback_query: await update.callback_query.answer(_("Not in game.", user_lang), show_alert=True)
+                    await request.reject("You are not part of this game.", "Not in game.")
                     return
-                
+
                 current_player_in_game = game.get_current_player() if game.phase == "playing" else game.get_current_bidder()
-                if not current_player_in_game or current_player_in_game.user_id != user_id:
-                    msg = _("It's not your turn.", user_lang)
-                    if update.message: await update.message.reply_text(msg)
-                    elif update.callback_query: await update.callback_query.answer(msg, show_alert=True)
+                if not current_player_in_game or current_player_in_game.user_id != request.user_id:
+                    await request.reject("It's not your turn.")
                     return
-            
-            # Pass game and player objects to the handler if needed
+
+            # Pass game, player and the request context to the handler
             kwargs['game'] = game
             kwargs['player'] = player
-            return await func(update, context, *args, **kwargs)
+            kwargs['request'] = request
+            if not metrics.sampled():
+                return await func(update, context, *args, **kwargs)
+            phase = game.phase # The handler may move the game on; attribute time to the phase it started in
+            start = time.perf_counter()
+            try:
+                return await func(update, context, *args, **kwargs)
+            finally:
+                metrics.game_handler_seconds.observe(time.perf_counter() - start, func.__name__, phase)
         return wrapper
     return decorator
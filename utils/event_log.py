@@ -0,0 +1,430 @@
+# telegram_doudizhu_bot/utils/event_log.py
+"""
+Append-only game event log for offline use (stats, AI training data, disputes).
+
+Every bid, play, pass, timeout and settlement is one fixed-size 56-byte record appended
+to the current segment file in EVENT_LOG_DIR (events-000001.log, ...), or with
+SHARD_COUNT > 0 in the shard's own EVENT_LOG_DIR/shard-NNN directory, so every directory
+has a single writer (log_directories() lists them all for readers). A segment is
+closed once it reaches EVENT_LOG_SEGMENT_BYTES and never written again. Readers mmap the
+segments and stream records with generators, so replaying a game or scanning a month of
+games never loads more than one record at a time; export_columnar() turns closed
+segments into numpy .npz column files.
+
+Records carry a CRC32, so a record torn by a crash is detected and the scan stops there.
+read_segment_records() checks a segment's CRCs in bulk with numpy and remembers how many
+records it verified in a small .verified file next to the segment, so a scan only checks
+records appended since the last one.
+Appends go through a userspace buffer, flushed by the job registered with start() (and
+by stop() on shutdown). Whatever was appended since the last flush is lost on a hard crash; the
+database stays the source of truth for scores.
+"""
+import functools
+import mmap
+import os
+import struct
+import sys
+import time
+import zlib
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+try:
+    from config import EVENT_LOG_DIR, EVENT_LOG_SEGMENT_BYTES
+except ImportError:
+    print("CRITICAL: config.py not found in utils.event_log.py. Using fallback defaults.")
+    EVENT_LOG_DIR = "event_log"
+    EVENT_LOG_SEGMENT_BYTES = 64 * 1024 * 1024
+
+SEGMENT_MAGIC = b"DDZEVLOG"
+SEGMENT_VERSION = 1
+_SEGMENT_HEADER = struct.Struct("<8sI4x") # magic, version, padding to 16 bytes
+# crc32 (of the rest), timestamp, chat_id, game_id, seq in game, event type, seat, user_id, cards, value, aux
+_RECORD = struct.Struct("<Idqq HBb qQii")
+RECORD_SIZE = _RECORD.size
+_SEGMENT_PREFIX, _SEGMENT_SUFFIX = "events-", ".log"
+_VERIFIED_SUFFIX = ".verified" # Next to a segment: records already CRC-checked, and the last one's CRC
+_VERIFIED = struct.Struct("<QI")
+_CRC_CHUNK = 65536 # Records per numpy CRC pass (keeps the working set in cache)
+STALE_GAME_SECONDS = 24 * 3600 # iter_games drops games with no event for this long (log time)
+
+# Event types (stored as codes: append only)
+EVENT_GAME_START = 1 # value = room rule flags
+EVENT_DEAL = 2 # seat's cards; seat -1 = kitty
+EVENT_BID = 3 # value = bid (0 = pass)
+EVENT_LANDLORD = 4 # seat becomes landlord, cards = kitty, value = winning bid
+EVENT_PLAY = 5 # cards = played mask, aux = multiplier after the play
+EVENT_PASS = 6
+EVENT_TIMEOUT = 7 # aux = 1 bid / 2 play / 3 join timeout
+EVENT_SETTLE = 8 # one per seat: value = score delta, aux = final multiplier
+EVENT_GAME_CANCEL = 9 # game ended without a settlement (/cancel, everyone left, abandoned)
+EVENT_NAMES = {
+    EVENT_GAME_START: "game_start", EVENT_DEAL: "deal", EVENT_BID: "bid", EVENT_LANDLORD: "landlord",
+    EVENT_PLAY: "play", EVENT_PASS: "pass", EVENT_TIMEOUT: "timeout", EVENT_SETTLE: "settle",
+    EVENT_GAME_CANCEL: "game_cancel",
+}
+TIMEOUT_JOIN = 3 # EVENT_TIMEOUT aux of a join timeout, which ends the game before it starts
+_SHARD_PREFIX = "shard-"
+
+
+class GameEvent(NamedTuple):
+    timestamp: float
+    chat_id: int
+    game_id: int
+    seq: int
+    event_type: int
+    seat: int
+    user_id: int
+    cards: int # 54-bit card mask (game_logic.card_codec)
+    value: int
+    aux: int
+
+
+def _segment_name(number: int) -> str:
+    return f"{_SEGMENT_PREFIX}{number:06d}{_SEGMENT_SUFFIX}"
+
+
+def is_game_end(event_type: int, aux: int = 0) -> bool:
+    """True for the events that end a game without a settlement (cancellation, join timeout)."""
+    return event_type == EVENT_GAME_CANCEL or (event_type == EVENT_TIMEOUT and aux == TIMEOUT_JOIN)
+
+
+def shard_log_dir(shard_id: Optional[int], directory: str = EVENT_LOG_DIR) -> str:
+    """The log directory a shard writes to (the base directory when not sharded)."""
+    return directory if shard_id is None else os.path.join(directory, f"{_SHARD_PREFIX}{shard_id:03d}")
+
+
+def log_directories(directory: str = EVENT_LOG_DIR) -> List[str]:
+    """The base directory and every shard directory under it: everything a full scan must read."""
+    if not os.path.isdir(directory):
+        return []
+    shards = sorted(n for n in os.listdir(directory)
+                    if n.startswith(_SHARD_PREFIX) and os.path.isdir(os.path.join(directory, n)))
+    return [directory] + [os.path.join(directory, n) for n in shards]
+
+
+def list_segments(directory: str = EVENT_LOG_DIR) -> List[str]:
+    """Segment paths in write order."""
+    if not os.path.isdir(directory):
+        return []
+    names = sorted(n for n in os.listdir(directory) if n.startswith(_SEGMENT_PREFIX) and n.endswith(_SEGMENT_SUFFIX))
+    return [os.path.join(directory, n) for n in names]
+
+
+class EventLog:
+    """Writer side of the log. Single writer per directory: shards each use their shard_log_dir()."""
+
+    def __init__(self, directory: str = EVENT_LOG_DIR, segment_bytes: int = EVENT_LOG_SEGMENT_BYTES):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self._file = None
+        self._segment_number = 0
+        self._segment_size = 0
+        self._game_seq: Dict[int, int] = {}
+        self._last_game_id = 0
+        self._job = None
+
+    def _open_segment(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        existing = list_segments(self.directory)
+        # Never append to an existing segment: it may end in a torn record from a crash
+        last = int(os.path.basename(existing[-1])[len(_SEGMENT_PREFIX):-len(_SEGMENT_SUFFIX)]) if existing else 0
+        self._segment_number = max(last, self._segment_number) + 1
+        while True:
+            try:
+                self._file = open(os.path.join(self.directory, _segment_name(self._segment_number)), "xb")
+                break
+            except FileExistsError: # Another writer got there first; never share a segment
+                print(f"Event log segment {_segment_name(self._segment_number)} in {self.directory} already exists, "
+                      "skipping it (is a second writer using this directory?)")
+                self._segment_number += 1
+        self._file.write(_SEGMENT_HEADER.pack(SEGMENT_MAGIC, SEGMENT_VERSION))
+        self._segment_size = _SEGMENT_HEADER.size
+
+    def new_game_id(self) -> int:
+        """A game id unique within this log (milliseconds since the epoch, bumped on collisions)."""
+        game_id = max(int(time.time() * 1000), self._last_game_id + 1)
+        self._last_game_id = game_id
+        return game_id
+
+    def append(self, chat_id: int, game_id: int, event_type: int, seat: int = -1, user_id: int = 0,
+               cards: int = 0, value: int = 0, aux: int = 0, timestamp: Optional[float] = None) -> None:
+        if self._file is None or self._segment_size + RECORD_SIZE > self.segment_bytes:
+            self._roll()
+        seq = self._game_seq.get(game_id, 0)
+        self._game_seq[game_id] = seq + 1
+        body = _RECORD.pack(0, time.time() if timestamp is None else timestamp, chat_id, game_id, seq & 0xFFFF,
+                            event_type, seat, user_id, cards, value, aux)[4:]
+        self._file.write(struct.pack("<I", zlib.crc32(body)) + body)
+        self._segment_size += RECORD_SIZE
+        if (event_type == EVENT_SETTLE and seat == 2) or is_game_end(event_type, aux): # The game's last record
+            self._game_seq.pop(game_id, None)
+
+    def _roll(self) -> None:
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+        self._open_segment()
+
+    def flush(self, fsync: bool = False) -> None:
+        if self._file is not None:
+            self._file.flush()
+            if fsync:
+                os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        if self._file is not None:
+            self.flush(fsync=True)
+            self._file.close()
+            self._file = None
+
+    async def _flush_job(self, context: Any) -> None:
+        self.flush()
+
+    def start(self, job_queue, interval_seconds: float = 1.0) -> None:
+        """Registers a repeating JobQueue job that flushes the buffer, bounding what a crash can lose."""
+        if self._job is None:
+            self._job = job_queue.run_repeating(self._flush_job, interval=interval_seconds, first=interval_seconds,
+                                                name="event_log_flush")
+
+    def stop(self) -> None:
+        if self._job is not None:
+            self._job.schedule_removal()
+            self._job = None
+        self.close()
+
+    @property
+    def current_segment(self) -> Optional[str]:
+        return self._file.name if self._file is not None else None
+
+
+_event_log: Optional[EventLog] = None
+
+
+def get_event_log() -> EventLog:
+    global _event_log
+    if _event_log is None:
+        _event_log = EventLog()
+    return _event_log
+
+
+def use_shard_event_log(shard_id: int) -> EventLog:
+    """Points the shared EventLog at the shard's own directory. Call in the shard process before any append."""
+    global _event_log
+    directory = shard_log_dir(shard_id)
+    if _event_log is not None and _event_log.directory != directory:
+        _event_log.close()
+        _event_log = None
+    if _event_log is None:
+        _event_log = EventLog(directory)
+    return _event_log
+
+
+# --- Reading ---------------------------------------------------------------------------
+
+def iter_segment(path: str) -> Iterator[GameEvent]:
+    """Streams one segment's records, stopping at the first torn or corrupt one."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size <= _SEGMENT_HEADER.size:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            magic, version = _SEGMENT_HEADER.unpack_from(mm, 0)
+            if magic != SEGMENT_MAGIC or version != SEGMENT_VERSION:
+                print(f"Skipping event log segment {path}: unknown format")
+                return
+            end = _SEGMENT_HEADER.size + (len(mm) - _SEGMENT_HEADER.size) // RECORD_SIZE * RECORD_SIZE
+            for offset in range(_SEGMENT_HEADER.size, end, RECORD_SIZE):
+                fields = _RECORD.unpack_from(mm, offset)
+                if fields[0] != zlib.crc32(mm[offset + 4:offset + RECORD_SIZE]):
+                    print(f"Event log segment {path}: corrupt record at byte {offset}, stopping")
+                    return
+                yield GameEvent(*fields[1:])
+
+
+def iter_events(directory: str = EVENT_LOG_DIR, since: float = 0.0, until: float = float("inf")) -> Iterator[GameEvent]:
+    """Streams every event in log order, optionally limited to a time window."""
+    for path in list_segments(directory):
+        for event in iter_segment(path):
+            if since <= event.timestamp < until:
+                yield event
+
+
+def replay_game(chat_id: int, game_id: int, directory: str = EVENT_LOG_DIR) -> Iterator[GameEvent]:
+    """Streams one game's events in order (stops at its settlement or cancellation)."""
+    settled = 0
+    for event in iter_events(directory):
+        if event.game_id != game_id or event.chat_id != chat_id:
+            continue
+        yield event
+        if is_game_end(event.event_type, event.aux):
+            return
+        if event.event_type == EVENT_SETTLE:
+            settled += 1
+            if settled == 3:
+                return
+
+
+def iter_games(directory: str = EVENT_LOG_DIR, abandon_after: float = STALE_GAME_SECONDS) -> Iterator[List[GameEvent]]:
+    """
+    Streams settled games as lists of their events in a single pass over the log; only
+    the games still in progress at the current read position are held in memory.
+    Cancelled games are dropped at their end event, and games with no event for
+    `abandon_after` seconds of log time (e.g. cut short by a crash) are dropped too.
+    """
+    open_games: Dict[Tuple[int, int], List[GameEvent]] = {}
+    settles: Dict[Tuple[int, int], int] = {}
+    last_seen: Dict[Tuple[int, int], float] = {}
+    next_sweep = None
+    for event in iter_events(directory):
+        key = (event.chat_id, event.game_id)
+        if is_game_end(event.event_type, event.aux):
+            open_games.pop(key, None)
+            settles.pop(key, None)
+            last_seen.pop(key, None)
+            continue
+        open_games.setdefault(key, []).append(event)
+        last_seen[key] = event.timestamp
+        if event.event_type == EVENT_SETTLE:
+            settles[key] = settles.get(key, 0) + 1
+            if settles[key] == 3:
+                del settles[key], last_seen[key]
+                yield open_games.pop(key)
+                continue
+        if next_sweep is None:
+            next_sweep = event.timestamp + abandon_after
+        elif event.timestamp >= next_sweep: # At most one sweep per abandon_after of log time
+            cutoff = event.timestamp - abandon_after
+            for stale in [k for k, seen in last_seen.items() if seen < cutoff]:
+                del open_games[stale], last_seen[stale]
+                settles.pop(stale, None)
+            next_sweep = event.timestamp + abandon_after
+
+
+# --- Columnar export -------------------------------------------------------------------
+
+def _record_dtype():
+    import numpy as np # Local import
+    dtype = np.dtype([("crc", "<u4"), ("timestamp", "<f8"), ("chat_id", "<i8"), ("game_id", "<i8"),
+                      ("seq", "<u2"), ("event_type", "u1"), ("seat", "i1"), ("user_id", "<i8"),
+                      ("cards", "<u8"), ("value", "<i4"), ("aux", "<i4")])
+    assert dtype.itemsize == RECORD_SIZE
+    return dtype
+
+
+@functools.lru_cache(maxsize=1)
+def _crc_tables():
+    """
+    CRC32 is affine over a fixed-length message: the CRC of a record body is the CRC of
+    an all-zero body XOR one table entry per byte. The tables here are per 16-bit word
+    (26 words x 65536 entries, 6.8 MB), so a record costs 26 lookups.
+    """
+    import numpy as np # Local import
+    size = RECORD_SIZE - 4
+    zero_crc = zlib.crc32(bytes(size))
+    byte_tables = np.zeros((size, 256), dtype=np.uint32)
+    for position in range(size):
+        body = bytearray(size)
+        for value in range(256):
+            body[position] = value
+            byte_tables[position, value] = zlib.crc32(body) ^ zero_crc
+    low, high = np.arange(65536) & 0xFF, np.arange(65536) >> 8
+    return zero_crc, byte_tables[0::2][:, low] ^ byte_tables[1::2][:, high]
+
+
+def _first_bad_record(records, start: int = 0) -> int:
+    """Index of the first record from `start` whose CRC doesn't match its body (len(records) if none)."""
+    import numpy as np # Local import
+    zero_crc, word_tables = _crc_tables()
+    words = records.view(np.uint8).reshape(len(records), RECORD_SIZE)[:, 4:].view("<u2")
+    for chunk_start in range(start, len(records), _CRC_CHUNK):
+        chunk = words[chunk_start:chunk_start + _CRC_CHUNK].T.copy() # One row per word position
+        crc = word_tables[0][chunk[0]]
+        for position in range(1, len(word_tables)):
+            crc ^= word_tables[position][chunk[position]]
+        crc ^= zero_crc
+        bad = np.flatnonzero(crc != records["crc"][chunk_start:chunk_start + _CRC_CHUNK])
+        if len(bad):
+            return chunk_start + int(bad[0])
+    return len(records)
+
+
+def _read_verified(path: str, records) -> int:
+    """Records of the segment already verified, if its .verified file still matches the segment."""
+    try:
+        with open(path + _VERIFIED_SUFFIX, "rb") as f:
+            verified, last_crc = _VERIFIED.unpack(f.read())
+    except (OSError, struct.error):
+        return 0
+    if 0 < verified <= len(records) and int(records["crc"][verified - 1]) == last_crc:
+        return verified
+    return 0
+
+
+def _write_verified(path: str, records, verified: int) -> None:
+    try:
+        with open(path + _VERIFIED_SUFFIX, "wb") as f:
+            f.write(_VERIFIED.pack(verified, int(records["crc"][verified - 1])))
+    except OSError as e: # e.g. a read-only copy of the log: every scan just verifies everything
+        print(f"Event log segment {path}: could not record verified records: {e}")
+
+
+def read_segment_records(path: str):
+    """
+    One segment as a numpy structured array (fields as in GameEvent, plus crc), truncated
+    at the first torn or corrupt record like the streaming reader. Only records past the
+    segment's .verified count are CRC-checked; segments are append-only, so a verified
+    prefix never changes.
+    """
+    import numpy as np # Local import
+    dtype = _record_dtype()
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < _SEGMENT_HEADER.size or _SEGMENT_HEADER.unpack_from(data, 0) != (SEGMENT_MAGIC, SEGMENT_VERSION):
+        print(f"Skipping event log segment {path}: unknown format")
+        return np.zeros(0, dtype=dtype)
+    count = (len(data) - _SEGMENT_HEADER.size) // RECORD_SIZE
+    records = np.frombuffer(data, dtype=dtype, count=count, offset=_SEGMENT_HEADER.size)
+    verified = _read_verified(path, records)
+    good = _first_bad_record(records, verified)
+    if good < count:
+        print(f"Event log segment {path}: corrupt record at byte {_SEGMENT_HEADER.size + good * RECORD_SIZE}, "
+              "stopping")
+    if good > verified:
+        _write_verified(path, records, good)
+    return records[:good]
+
+
+def export_columnar(out_directory: str, directory: str = EVENT_LOG_DIR, include_open_segment: bool = False,
+                    writer: Optional[EventLog] = None) -> List[str]:
+    """
+    Writes one .npz per closed segment (columns: timestamp, chat_id, game_id, seq, event_type,
+    seat, user_id, cards, value, aux). Segments already exported are skipped, so this can
+    run from cron. Pass the live `writer` (or include_open_segment=False) so the segment
+    being written isn't exported half-full.
+    """
+    import numpy as np # Local import
+
+    segments = list_segments(directory)
+    open_segment = writer.current_segment if writer is not None else (segments[-1] if segments else None)
+    os.makedirs(out_directory, exist_ok=True)
+    written = []
+    for path in segments:
+        if path == open_segment and not include_open_segment:
+            continue
+        out_path = os.path.join(out_directory, os.path.basename(path)[:-len(_SEGMENT_SUFFIX)] + ".npz")
+        if os.path.exists(out_path):
+            continue
+        records = read_segment_records(path)
+        np.savez_compressed(out_path, **{name: records[name] for name in records.dtype.names if name != "crc"})
+        written.append(out_path)
+    return written
+
+if __name__ == "__main__":
+    # python -m utils.event_log <out_dir> [log_dir]: export closed segments (every shard's) for offline analysis
+    if len(sys.argv) < 2:
+        print("Usage: python -m utils.event_log <out_dir> [log_dir]")
+        sys.exit(2)
+    base = sys.argv[2] if len(sys.argv) > 2 else EVENT_LOG_DIR
+    for log_dir in log_directories(base):
+        for exported in export_columnar(os.path.join(sys.argv[1], os.path.relpath(log_dir, base)), log_dir):
+            print(f"Wrote {exported}")
@@ -0,0 +1,110 @@
+# telegram_doudizhu_bot/utils/fake_bot.py
+import asyncio
+import time
+from types import SimpleNamespace
+from typing import Dict, List, Optional, Tuple
+
+from utils.outbound import (
+    OutboundScheduler, TokenBucket, CHAT_BURST, CHAT_RATE_PER_SECOND, GROUP_BURST, GROUP_RATE_PER_SECOND,
+    GLOBAL_BURST, GLOBAL_RATE_PER_SECOND,
+)
+
+
+class FakeRetryAfter(Exception):
+    """Stand-in for telegram.error.RetryAfter (same `retry_after` attribute, in seconds)."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Flood control exceeded. Retry in {retry_after:.2f} seconds")
+        self.retry_after = retry_after
+
+
+class FakeBot:
+    """
+    Offline Bot API double for throughput tests of the outbound path.
+
+    Implements send_message / edit_message_text / edit_message_reply_markup with a fixed
+    network latency and enforces flood limits as token buckets (per chat, per group, global),
+    raising FakeRetryAfter the way Telegram answers with 429. Every accepted call is
+    recorded in `calls`; rejected ones are counted in `rejected`.
+    """
+
+    def __init__(self, latency: float = 0.02,
+                 chat_limit: Tuple[float, float] = (CHAT_BURST, CHAT_RATE_PER_SECOND),
+                 group_limit: Tuple[float, float] = (GROUP_BURST, GROUP_RATE_PER_SECOND),
+                 global_limit: Tuple[float, float] = (GLOBAL_BURST, GLOBAL_RATE_PER_SECOND)):
+        self.latency = latency
+        self.chat_limit = chat_limit
+        self.group_limit = group_limit
+        self.calls: List[Tuple[str, int, dict]] = []
+        self.rejected = 0
+        self._chat_buckets: Dict[int, TokenBucket] = {}
+        self._group_buckets: Dict[int, TokenBucket] = {}
+        self._global_bucket = TokenBucket(*global_limit)
+        self._next_message_id = 1
+
+    def _check_limits(self, chat_id: int) -> None:
+        now = time.monotonic()
+        buckets = [self._global_bucket, self._chat_buckets.setdefault(chat_id, TokenBucket(*self.chat_limit))]
+        if chat_id < 0:
+            buckets.append(self._group_buckets.setdefault(chat_id, TokenBucket(*self.group_limit)))
+        wait = max(bucket.wait_time(now) for bucket in buckets)
+        if wait > 0:
+            raise self._reject(wait)
+        for bucket in buckets:
+            bucket.take(now)
+
+    def _reject(self, retry_after: float) -> FakeRetryAfter:
+        self.rejected += 1
+        return FakeRetryAfter(max(retry_after, 0.01))
+
+    async def _request(self, method: str, chat_id: int, **kwargs):
+        await asyncio.sleep(self.latency)
+        self._check_limits(chat_id)
+        self.calls.append((method, chat_id, kwargs))
+
+    async def send_message(self, chat_id: int, text: str, **kwargs):
+        await self._request("sendMessage", chat_id, text=text, **kwargs)
+        message_id = self._next_message_id
+        self._next_message_id += 1
+        return SimpleNamespace(message_id=message_id, chat_id=chat_id, text=text, reply_markup=kwargs.get("reply_markup"))
+
+    async def edit_message_text(self, chat_id: int, message_id: int, text: str, **kwargs):
+        await self._request("editMessageText", chat_id, message_id=message_id, text=text, **kwargs)
+        return SimpleNamespace(message_id=message_id, chat_id=chat_id, text=text, reply_markup=kwargs.get("reply_markup"))
+
+    async def edit_message_reply_markup(self, chat_id: int, message_id: int, reply_markup=None, **kwargs):
+        await self._request("editMessageReplyMarkup", chat_id, message_id=message_id, reply_markup=reply_markup)
+        return SimpleNamespace(message_id=message_id, chat_id=chat_id, reply_markup=reply_markup)
+
+
+async def run_offline_throughput(chats: int = 50, turns_per_chat: int = 10, toggles_per_turn: int = 5,
+                                 latency: float = 0.02, bot: Optional[FakeBot] = None) -> dict:
+    """
+    Drives OutboundScheduler against FakeBot with a game-like mix per chat: each turn sends
+    a turn announcement and a hand refresh, then a burst of card-selection keyboard edits.
+    Returns request/API-call counts, 429s and elapsed time.
+    """
+    bot = bot or FakeBot(latency=latency)
+    scheduler = OutboundScheduler(bot)
+    start = time.monotonic()
+
+    async def play_chat(chat_id: int) -> None:
+        for turn in range(turns_per_chat):
+            scheduler.send_message(chat_id, f"Turn {turn}: it's your move")
+            hand = await scheduler.send_message(chat_id, f"Your hand (turn {turn})", reply_markup=f"kb-{turn}-0")
+            edits = [scheduler.edit_message_reply_markup(chat_id, hand.message_id, reply_markup=f"kb-{turn}-{i}")
+                     for i in range(1, toggles_per_turn + 1)]
+            await asyncio.gather(*edits)
+
+    await asyncio.gather(*(play_chat(-1000 - i) for i in range(chats)))
+    await scheduler.drain()
+    elapsed = time.monotonic() - start
+    return {
+        "elapsed_seconds": elapsed,
+        "requested": scheduler.stats["requested"],
+        "api_calls": len(bot.calls),
+        "flood_waits": bot.rejected,
+        "coalesced_edits": scheduler.stats["coalesced_edits"],
+        "merged_sends": scheduler.stats["merged_sends"],
+        "requests_per_second": scheduler.stats["requested"] / elapsed if elapsed else 0.0,
+    }
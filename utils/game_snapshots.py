@@ -0,0 +1,124 @@
+# telegram_doudizhu_bot/utils/game_snapshots.py
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from constants import JOB_TYPE_BID
+from game_logic.snapshot import GameSnapshot, encode_snapshot, decode_snapshot
+from utils.callback_codec import GenerationRegistry
+from utils.persistence import WriteBehindStore, get_store
+from utils.timer_wheel import BatchCallback, timer_wheel
+
+SNAPSHOT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS game_snapshots (chat_id INTEGER PRIMARY KEY, seq INTEGER NOT NULL, data BLOB NOT NULL);
+"""
+
+
+class SnapshotStore:
+    """
+    Crash-safe storage of live games' snapshots, one row per chat.
+
+    save() is called on every state change and only enqueues an upsert on the
+    WriteBehindStore, whose writer thread commits everything queued within
+    DB_FLUSH_INTERVAL_SECONDS in one transaction. The upsert never replaces a row with
+    an older sequence number, so out-of-order saves can't roll a game back.
+    """
+
+    def __init__(self, store: WriteBehindStore):
+        self.store = store
+        store.ensure_schema(SNAPSHOT_SCHEMA)
+
+    def save(self, snapshot: GameSnapshot) -> None:
+        self.store.execute(
+            "INSERT INTO game_snapshots (chat_id, seq, data) VALUES (?, ?, ?) "
+            "ON CONFLICT(chat_id) DO UPDATE SET seq = excluded.seq, data = excluded.data "
+            "WHERE excluded.seq >= game_snapshots.seq",
+            (snapshot.chat_id, snapshot.sequence, encode_snapshot(snapshot)))
+
+    def delete(self, chat_id: int) -> None:
+        """Drops a finished or cancelled game."""
+        self.store.execute("DELETE FROM game_snapshots WHERE chat_id = ?", (chat_id,))
+
+    def load_all(self) -> List[GameSnapshot]:
+        """Every stored snapshot; rows of another snapshot version are skipped with a warning."""
+        with self.store.reader() as conn:
+            rows = conn.execute("SELECT chat_id, data FROM game_snapshots").fetchall()
+        snapshots = []
+        for chat_id, data in rows:
+            try:
+                snapshots.append(decode_snapshot(data))
+            except (ValueError, IndexError) as e:
+                print(f"Skipping game snapshot of chat {chat_id}: {e}")
+        return snapshots
+
+
+_snapshot_store: Optional[SnapshotStore] = None
+
+
+def get_snapshot_store() -> SnapshotStore:
+    """Shared SnapshotStore on the shared WriteBehindStore (utils.persistence.get_store)."""
+    global _snapshot_store
+    if _snapshot_store is None:
+        _snapshot_store = SnapshotStore(get_store())
+    return _snapshot_store
+
+
+def timeout_deadline(job_type: str, chat_id: int, user_id: Optional[int] = None) -> float:
+    """Wall-clock deadline of a timeout armed with scheduler_utils.arm_timeout (0.0 if none), for snapshots."""
+    timer = timer_wheel.get((job_type, chat_id, user_id))
+    if timer is None:
+        return 0.0
+    return time.time() + (timer.deadline - time.monotonic())
+
+
+def timeout_job_data(snapshot: GameSnapshot) -> Dict[str, Any]:
+    """
+    job_context_data of the snapshot's pending timeout, as the game armed it: chat and
+    user, plus for a BID timeout the bidder's hand mask and the high bid so far (what
+    scheduler_utils.make_bid_timeouts_callback auto-bids from).
+    """
+    user_id = snapshot.timeout_user or None
+    data: Dict[str, Any] = {"chat_id": snapshot.chat_id, "user_id": user_id}
+    if snapshot.timeout_job == JOB_TYPE_BID:
+        seat = snapshot.user_ids.index(user_id) if user_id in snapshot.user_ids else snapshot.turn
+        data["hand_mask"] = snapshot.hands[seat]
+        data["highest_bid"] = max((bid for bid in snapshot.bids if bid > 0), default=0)
+    return data
+
+
+def restore_games(
+    snapshots: List[GameSnapshot],
+    install_game: Callable[[GameSnapshot], Any],
+    timeout_callbacks: Dict[str, BatchCallback],
+    generations: Optional[GenerationRegistry] = None,
+) -> int:
+    """
+    Bulk restore on startup: install_game(snapshot) rebuilds and registers one game
+    (e.g. game_manager.games[s.chat_id] = GameState.from_snapshot(s)); then each game's
+    callback generation is put back into `generations` (the CallbackDispatcher's
+    registry), so the round's keyboards sent before the restart keep working, and its
+    pending BID/PLAY/JOIN timeout is re-armed on the timer wheel with its remaining time
+    and timeout_job_data(snapshot) (timeouts that expired while the bot was down fire on
+    the first tick). Returns the number of games restored. Call it before the application
+    starts polling.
+    """
+    now = time.time()
+    restored = 0
+    for snapshot in snapshots:
+        try:
+            install_game(snapshot)
+        except Exception as e:
+            print(f"Could not restore the game in chat {snapshot.chat_id}: {e}")
+            continue
+        restored += 1
+        if generations is not None and snapshot.generation:
+            generations.restore(snapshot.chat_id, snapshot.generation)
+        if snapshot.timeout_job is None:
+            continue
+        callback = timeout_callbacks.get(snapshot.timeout_job)
+        if callback is None:
+            print(f"No timeout callback for {snapshot.timeout_job}; chat {snapshot.chat_id} restored without it.")
+            continue
+        # Same key as scheduler_utils.arm_timeout, so cancel_timeout works on restored timers
+        timer_wheel.arm((snapshot.timeout_job, snapshot.chat_id, snapshot.timeout_user or None),
+                        max(0.0, snapshot.timeout_deadline - now), callback, timeout_job_data(snapshot))
+    return restored
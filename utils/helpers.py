@@ -1,34 +1,46 @@
 # telegram_doudizhu_bot/utils/helpers.py
-from typing import List, Optional, Tuple
+from __future__ import annotations # Annotations below name types that are only imported for type checking
 
-from telegram import Update
-from telegram.ext import ContextTypes
+from typing import TYPE_CHECKING, List, Optional, Tuple
 
 try:
-    from config import ADMIN_USER_IDS, REQUIRED_GROUP_ID, DEFAULT_LANG
+    from config import ADMIN_USER_IDS, DEFAULT_LANG
 except ImportError:
     print("CRITICAL: config.py not found in utils.helpers.py. Using fallback defaults.")
     ADMIN_USER_IDS = []
-    REQUIRED_GROUP_ID = 0
     DEFAULT_LANG = "en"
 
-from game_logic.card import Card # Assuming Card class is defined
-from game_logic.player import Player # Assuming Player class
-from game_logic.game_state import GameState # Assuming GameState class
-# from game_manager import GameManager # Careful with circular imports if GameManager also imports this
+from utils.membership_cache import membership_cache
+from utils.metrics import observe_api_call
+
+if TYPE_CHECKING: # telegram and game_logic are heavy; helpers only needs them for annotations
+    from telegram import Update
+    from telegram.ext import ContextTypes
+    from game_logic.card import Card # Assuming Card class is defined
+    from game_logic.player import Player # Assuming Player class
+    from game_logic.game_state import GameState # Assuming GameState class
+    # from game_manager import GameManager # Careful with circular imports if GameManager also imports this
 
 def get_user_lang(context: ContextTypes.DEFAULT_TYPE, user_id: Optional[int] = None) -> str:
     """Gets the user's preferred language from context.user_data, fallback to DEFAULT_LANG."""
-    if user_id and 'users_lang' in context.bot_data and user_id in context.bot_data['users_lang']:
-        return context.bot_data['users_lang'][user_id]
-    if 'lang' in context.user_data: # Check current user's context first
-        return context.user_data['lang']
-    return context.bot_data.get("config", {}).get("DEFAULT_LANG", DEFAULT_LANG)
+    return user_lang_from(context.bot_data, context.user_data, user_id)
+
+def user_lang_from(bot_data: dict, user_data: dict, user_id: Optional[int] = None) -> str:
+    """get_user_lang for callers that hold bot_data/user_data rather than the context."""
+    if user_id and 'users_lang' in bot_data:
+        lang = bot_data['users_lang'].get(user_id) # One lookup: a SharedMapping in shard mode
+        if lang is not None:
+            return lang
+    if 'lang' in user_data: # Check current user's context first
+        return user_data['lang']
+    return bot_data.get("config", {}).get("DEFAULT_LANG", DEFAULT_LANG)
 
 def get_chat_lang(context: ContextTypes.DEFAULT_TYPE, chat_id: Optional[int] = None) -> str:
     """Gets the chat's preferred language from context.chat_data, fallback to DEFAULT_LANG."""
-    if chat_id and 'chats_lang' in context.bot_data and chat_id in context.bot_data['chats_lang']:
-        return context.bot_data['chats_lang'][chat_id]
+    if chat_id and 'chats_lang' in context.bot_data:
+        lang = context.bot_data['chats_lang'].get(chat_id)
+        if lang is not None:
+            return lang
     if 'lang' in context.chat_data: # Check current chat's context
         return context.chat_data['lang']
     return context.bot_data.get("config", {}).get("DEFAULT_LANG", DEFAULT_LANG)
@@ -45,59 +57,56 @@ async def check_group_membership_and_reply(update: Update, context: ContextTypes
     Replies to the user if they are not a member.
     Returns True if member (or no group required, or admin), False otherwise.
     """
-    user = update.effective_user
+    from utils.request_context import get_request_context # Local import
+    request = get_request_context(update, context)
+    user = request.user
     if not user:
         return False # Should not happen
 
-    user_lang = get_user_lang(context, user.id)
-    
-    # Get current REQUIRED_GROUP_ID, allowing for dynamic changes through bot_data
-    current_required_group_id = context.bot_data.get("db_config", {}).get("REQUIRED_GROUP_ID")
-    if current_required_group_id is None: # Fallback to hardcoded config if not in db_config
-        current_required_group_id = context.bot_data.get("config", {}).get("REQUIRED_GROUP_ID", REQUIRED_GROUP_ID)
-
-    if not current_required_group_id or current_required_group_id == 0:
+    # Current REQUIRED_GROUP_ID: db_config (changed at runtime) first, then config
+    current_required_group_id = request.required_group_id
+    if not current_required_group_id:
         return True # No group requirement set
 
-    if is_user_admin(user.id, context):
+    if request.is_admin:
         return True # Admins bypass this check
 
+    user_lang = request.lang
+
     try:
-        member = await context.bot.get_chat_member(chat_id=current_required_group_id, user_id=user.id)
-        if member.status not in ['member', 'administrator', 'creator']:
+        # Cached with positive/negative TTLs; concurrent checks for the same user share one API call
+        if not await membership_cache.is_member(context.bot, current_required_group_id, user.id):
             # User is not in the group or has left/been banned
             from i18n.translator import _ # Local import
-            # Try to get group info for a more helpful message
+            # Try to get group info for a more helpful message (cached, None if fetching fails)
             group_name_or_link = str(current_required_group_id)
-            try:
-                chat_info = await context.bot.get_chat(current_required_group_id)
-                if chat_info.invite_link:
-                    group_name_or_link = f"[{chat_info.title}]({chat_info.invite_link})"
-                elif chat_info.title:
-                    group_name_or_link = chat_info.title
-            except Exception:
-                pass # Stick with ID if fetching info fails
-
-            await update.message.reply_text(
+            chat_info = await membership_cache.get_group_info(context.bot, current_required_group_id)
+            if chat_info and chat_info.invite_link:
+                group_name_or_link = f"[{chat_info.title}]({chat_info.invite_link})"
+            elif chat_info and chat_info.title:
+                group_name_or_link = chat_info.title
+
+            await observe_api_call("sendMessage", update.message.reply_text(
                 _(("You must be a member of our designated group to use this command.\n"
                    "Please join: {}"), user_lang).format(group_name_or_link),
                 parse_mode='Markdown'
-            )
+            ))
             return False
     except Exception as e: # Bot not in group, user not found, etc.
         from i18n.translator import _ # Local import
         print(f"Error checking group membership for user {user.id} in group {current_required_group_id}: {e}")
-        await update.message.reply_text(
+        await observe_api_call("sendMessage", update.message.reply_text(
             _("Could not verify your group membership. The bot might not be in the required group, or an error occurred. Please contact an admin.", user_lang)
-        )
+        ))
         return False
     return True
 
 def format_cards_for_display(cards: List[Card], separator: str = ", ") -> str:
-    """Converts a list of Card objects to a displayable string."""
+    """Converts a list of Card objects to a displayable string (sorted, cached by the hand's card mask)."""
     if not cards:
         return ""
-    return separator.join(str(card) for card in sorted(cards)) # DouDizhu hands usually sorted
+    from game_logic.card_codec import mask_from_cards, format_hand # Local import
+    return format_hand(mask_from_cards(cards), separator)
 
 def get_player_and_game(
     game_manager, # Pass Game Manager instance
@@ -119,7 +128,9 @@ def get_job_name(job_type: str, chat_id: int, user_id: Optional[int] = None) ->
         return f"{job_type}_{chat_id}_{user_id}"
     return f"{job_type}_{chat_id}"
 
-def format_leaderboard_display(leaderboard_data: List[dict], lang: str, bot_username: str) -> str:
+def format_leaderboard_display(leaderboard_data: List[dict], lang: str, bot_username: str,
+                               show_rating: bool = False) -> str:
+    """Leaderboard table; the Rating column is only shown when ranking by rating (LEADERBOARD_RANK_BY)."""
     from i18n.translator import _ # Local import
     if not leaderboard_data:
         return _("The leaderboard is empty right now!", lang)
@@ -127,8 +138,8 @@ def format_leaderboard_display(leaderboard_data: List[dict], lang: str, bot_user
     header = _("🏆 **Dou Dizhu Leaderboard** 🏆\n\n", lang)
     table_header = "| " + _("Rank", lang) + " | " + _("Player", lang) + \
                    " | " + _("Wins", lang) + " | " + _("Played", lang) + \
-                   " | " + _("Score", lang) + " |\n"
-    table_sep =    "|:----:|:-----------|:------:|:--------:|:-------:|\n"
+                   " | " + _("Score", lang) + " |" + (" " + _("Rating", lang) + " |" if show_rating else "") + "\n"
+    table_sep =    "|:----:|:-----------|:------:|:--------:|:-------:|" + (":------:|" if show_rating else "") + "\n"
     
     rows = []
     for i, entry in enumerate(leaderboard_data):
@@ -141,6 +152,9 @@ def format_leaderboard_display(leaderboard_data: List[dict], lang: str, bot_user
 
         row_str = f"| {i+1:^4} | {player_name_display:<11} | {entry.get('games_won', 0):^6} | " \
                   f"{entry.get('games_played', 0):^8} | {entry.get('total_score', 0):^7} |"
+        if show_rating:
+            rating = round(entry['rating']) if entry.get('rating') is not None else "-"
+            row_str += f" {rating:^6} |"
         rows.append(row_str)
 
     return header + table_header + table_sep + "\n".join(rows)
@@ -149,3 +163,8 @@ def get_bot_username(context: ContextTypes.DEFAULT_TYPE) -> str:
     if "bot_username" not in context.bot_data:
         context.bot_data["bot_username"] = context.bot.username
     return context.bot_data["bot_username"]
+
+def get_leaderboard_text(context: ContextTypes.DEFAULT_TYPE, lang: str) -> str:
+    """Cached leaderboard text; only re-rendered when a settled game changes the top N."""
+    from utils.leaderboard import get_leaderboard # Local import
+    return get_leaderboard().render(lang, get_bot_username(context))
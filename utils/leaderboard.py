@@ -0,0 +1,231 @@
+# telegram_doudizhu_bot/utils/leaderboard.py
+import sqlite3
+import threading
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+try:
+    from config import LEADERBOARD_TOP_N, LEADERBOARD_RANK_BY
+except ImportError:
+    print("CRITICAL: config.py not found in utils.leaderboard.py. Using fallback defaults.")
+    LEADERBOARD_TOP_N = 10
+    LEADERBOARD_RANK_BY = "score"
+
+from utils.persistence import WriteBehindStore, get_store
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS player_stats (
+    user_id INTEGER PRIMARY KEY,
+    username TEXT,
+    games_played INTEGER NOT NULL DEFAULT 0,
+    games_won INTEGER NOT NULL DEFAULT 0,
+    total_score INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_player_stats_rank ON player_stats (total_score DESC, games_won DESC, user_id);
+CREATE TABLE IF NOT EXISTS player_ratings (
+    user_id INTEGER PRIMARY KEY,
+    rating REAL NOT NULL,
+    rated_games INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_player_ratings_rank ON player_ratings (rating DESC, user_id);
+CREATE TABLE IF NOT EXISTS rating_epoch (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    epoch INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO rating_epoch (id, epoch) VALUES (0, 0);
+"""
+
+UPSERT_RESULT_SQL = """
+INSERT INTO player_stats (user_id, username, games_played, games_won, total_score)
+VALUES (?, ?, 1, ?, ?)
+ON CONFLICT(user_id) DO UPDATE SET
+    username = COALESCE(excluded.username, player_stats.username),
+    games_played = player_stats.games_played + 1,
+    games_won = player_stats.games_won + excluded.games_won,
+    total_score = player_stats.total_score + excluded.total_score
+"""
+
+# Parameters: user_id, rating for a first game (initial + delta), delta
+UPSERT_RATING_SQL = """
+INSERT INTO player_ratings (user_id, rating, rated_games) VALUES (?, ?, 1)
+ON CONFLICT(user_id) DO UPDATE SET
+    rating = player_ratings.rating + ?,
+    rated_games = player_ratings.rated_games + 1
+"""
+
+RATING_EPOCH_SQL = "SELECT epoch FROM rating_epoch WHERE id = 0"
+
+TOP_N_SQL = {
+    "score": """
+SELECT s.user_id, s.username, s.games_played, s.games_won, s.total_score, r.rating FROM player_stats s
+LEFT JOIN player_ratings r ON r.user_id = s.user_id
+ORDER BY s.total_score DESC, s.games_won DESC, s.user_id LIMIT ?
+""",
+    "rating": """
+SELECT r.user_id, s.username, s.games_played, s.games_won, s.total_score, r.rating FROM player_ratings r
+JOIN player_stats s ON s.user_id = r.user_id
+ORDER BY r.rating DESC, r.user_id LIMIT ?
+""",
+}
+
+
+class GameResult(NamedTuple):
+    """One player's outcome of a settled game."""
+    user_id: int
+    username: Optional[str]
+    won: bool
+    score_delta: int
+    rating_delta: Optional[float] = None # Set by utils.ratings.RatingEngine
+    rating: Optional[float] = None # Rating after the game, as the engine sees it
+
+
+class Leaderboard:
+    """
+    Materialized top-N leaderboard.
+
+    player_stats is updated incrementally when a game ends and is indexed by score, so
+    refreshing the top N is an index range scan. The top N rows are kept in memory and
+    rendered text is cached per (language, bot username); both are only rebuilt when a
+    settled game actually changes the visible ranking, so /leaderboard is a dict read.
+
+    Writes go through the write-behind store: the refresh runs on the writer thread
+    right after the game's batch commits, so handlers never wait on SQLite.
+    """
+
+    def __init__(self, store: WriteBehindStore, top_n: int = LEADERBOARD_TOP_N, rank_by: str = LEADERBOARD_RANK_BY):
+        if rank_by not in TOP_N_SQL:
+            raise ValueError(f"Unknown leaderboard ranking {rank_by!r} (expected one of {', '.join(TOP_N_SQL)})")
+        self.store = store
+        self.top_n = top_n
+        self.rank_by = rank_by
+        self.version = 0 # Bumped whenever the visible top N changes
+        # Bumped in the database by every full ratings recompute (from any process); a change is
+        # passed to the add_epoch_listener() listeners (RatingEngine). None until first read.
+        self.ratings_epoch: Optional[int] = None
+        self._epoch_listeners: List[Callable[[sqlite3.Connection, int], None]] = []
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._top: List[dict] = []
+        self._top_ids: set = set()
+        self._rendered: Dict[Tuple[str, str], str] = {}
+        store.ensure_schema(SCHEMA)
+
+    def _refresh_top(self, conn: sqlite3.Connection) -> bool:
+        """Reloads the top N from the index. Returns True if the visible ranking changed."""
+        epoch = conn.execute(RATING_EPOCH_SQL).fetchone()[0]
+        if epoch != self.ratings_epoch:
+            for listener in self._epoch_listeners:
+                try:
+                    listener(conn, epoch)
+                except Exception as e:
+                    print(f"Leaderboard: ratings epoch listener failed: {e}")
+        self.ratings_epoch = epoch
+        rows = [dict(row) for row in conn.execute(TOP_N_SQL[self.rank_by], (self.top_n,))]
+        for row in rows:
+            row['username'] = row['username'] or str(row['user_id'])
+        with self._lock:
+            self._loaded = True
+            if rows == self._top:
+                return False
+            self._top = rows
+            self._top_ids = {row['user_id'] for row in rows}
+            self.version += 1
+            self._rendered.clear()
+            return True
+
+    def _may_affect_top(self, conn: sqlite3.Connection, results: Sequence[GameResult]) -> bool:
+        if len(self._top) < self.top_n:
+            return True
+        if self.rank_by == "rating":
+            cutoff = self._top[-1]['rating']
+            return any(r.user_id in self._top_ids or (r.rating is not None and r.rating >= cutoff) for r in results)
+        cutoff = self._top[-1]['total_score']
+        for result in results:
+            if result.user_id in self._top_ids:
+                return True
+            if result.score_delta >= 0:
+                row = conn.execute("SELECT total_score FROM player_stats WHERE user_id = ?", (result.user_id,)).fetchone()
+                if row is not None and row['total_score'] >= cutoff:
+                    return True
+        return False
+
+    def _after_commit(self, results: Sequence[GameResult]) -> None:
+        with self.store.reader() as conn:
+            recomputed = conn.execute(RATING_EPOCH_SQL).fetchone()[0] != self.ratings_epoch
+            if recomputed or self._may_affect_top(conn, results): # A recompute elsewhere reorders everything
+                self._refresh_top(conn)
+
+    def add_epoch_listener(self, listener: Callable[[sqlite3.Connection, int], None]) -> None:
+        """
+        Calls listener(conn, epoch) with a read connection whenever the ratings epoch read
+        differs from the last one (the first read included), normally on the writer thread
+        after a commit. RatingEngine reloads its cache there.
+        """
+        self._epoch_listeners.append(listener)
+
+    def record_game_result(self, results: Sequence[GameResult]) -> None:
+        """
+        Queues one settled game's player_stats updates (committed as one batch by the writer),
+        plus its player_ratings deltas when the results carry them. The cached ranking is refreshed after the commit if the result can touch the top N.
+        """
+        rows = [(r.user_id, r.username, 1 if r.won else 0, r.score_delta) for r in results]
+        results = list(results)
+        rated = [(r.user_id, r.rating, r.rating_delta) for r in results if r.rating_delta is not None]
+        if rated: # Queued first, so it is committed by the time the stats batch's on_commit runs
+            self.store.executemany(UPSERT_RATING_SQL, rated)
+        self.store.executemany(UPSERT_RESULT_SQL, rows, on_commit=lambda: self._after_commit(results))
+
+    def replace_ratings(self, rows: Sequence[Tuple[int, float, int]]) -> None:
+        """
+        Replaces every stored rating with (user_id, rating, rated_games) rows from a full
+        recompute and bumps the ratings epoch, so running bots drop their cached ratings.
+        All three statements commit as one unit: readers never see an empty table.
+        """
+        self.store.execute_group([
+            ("DELETE FROM player_ratings", [()]),
+            ("INSERT INTO player_ratings (user_id, rating, rated_games) VALUES (?, ?, ?)", rows),
+            ("UPDATE rating_epoch SET epoch = epoch + 1 WHERE id = 0", [()]),
+        ], on_commit=self._reload)
+
+    def _reload(self) -> None:
+        with self.store.reader() as conn:
+            self._refresh_top(conn)
+
+    def get_top(self) -> List[dict]:
+        """The current top N rows (dicts with the keys format_leaderboard_display expects)."""
+        if not self._loaded:
+            with self.store.reader() as conn:
+                self._refresh_top(conn)
+        return self._top
+
+    def render(self, lang: str, bot_username: str) -> str:
+        """Leaderboard text for `lang`, rendered once per ranking change."""
+        key = (lang, bot_username)
+        text = self._rendered.get(key)
+        if text is None:
+            from utils.helpers import format_leaderboard_display # Local import
+            version = self.version
+            text = format_leaderboard_display(self.get_top(), lang, bot_username, show_rating=self.rank_by == "rating")
+            with self._lock:
+                if version == self.version:
+                    self._rendered[key] = text
+        return text
+
+    def invalidate(self) -> None:
+        """Forces a reload from the database (e.g. after manual edits or a stats reset)."""
+        with self._lock:
+            self._top = []
+            self._top_ids = set()
+            self._loaded = False
+            self.version += 1
+            self._rendered.clear()
+
+
+_leaderboard: Optional[Leaderboard] = None
+
+
+def get_leaderboard() -> Leaderboard:
+    """Shared Leaderboard instance backed by the shared write-behind store."""
+    global _leaderboard
+    if _leaderboard is None:
+        _leaderboard = Leaderboard(get_store())
+    return _leaderboard
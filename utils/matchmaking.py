@@ -0,0 +1,200 @@
+# telegram_doudizhu_bot/utils/matchmaking.py
+"""
+Cross-chat matchmaking: players queue from any chat and are seated three at a time as
+soon as three compatible players are waiting, instead of each chat waiting up to
+JOIN_GAME_TIMEOUT_SECONDS for its own players.
+
+Waiting players sit in one heap per rating bucket, ordered by arrival, so forming a table
+is a few heap pops. Each player also gets a deadline on the timer wheel: when it
+expires the player is seated with the longest-waiting players of any bucket, and AI
+fills the empty seats (at least AI_PLAYER_COUNT_TO_START_GAME humans per table; with
+fewer the player keeps waiting for another round).
+
+The queue lives in the process; with SHARD_COUNT > 0 each shard matches the chats it owns.
+"""
+import heapq
+import itertools
+import time
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+try:
+    from config import MATCHMAKING_WAIT_SECONDS, MATCHMAKING_BUCKET_WIDTH, AI_PLAYER_COUNT_TO_START_GAME
+except ImportError:
+    print("CRITICAL: config.py not found in utils.matchmaking.py. Using fallback defaults.")
+    MATCHMAKING_WAIT_SECONDS = 20
+    MATCHMAKING_BUCKET_WIDTH = 0
+    AI_PLAYER_COUNT_TO_START_GAME = 1
+
+from constants import JOB_TYPE_MATCH
+from utils.metrics import Histogram, metrics
+from utils.timer_wheel import Timer, TimerWheel, timer_wheel
+
+WAIT_BUCKETS = (1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0)
+TABLE_SIZE = 3
+
+matchmaking_wait_seconds = Histogram("doudizhu_matchmaking_wait_seconds",
+                                     "Time from joining the queue to being seated.", ("fill",), buckets=WAIT_BUCKETS)
+metrics.register(matchmaking_wait_seconds)
+
+
+class Ticket:
+    """One queued player. `data` is whatever the caller passed to enqueue() (e.g. the username)."""
+    __slots__ = ("user_id", "chat_id", "rating", "bucket", "seq", "enqueued_at", "data")
+
+    def __init__(self, user_id: int, chat_id: int, rating: Optional[float], bucket: int, seq: int, data: Any):
+        self.user_id = user_id
+        self.chat_id = chat_id
+        self.rating = rating
+        self.bucket = bucket
+        self.seq = seq
+        self.enqueued_at = time.monotonic()
+        self.data = data
+
+
+class MatchedTable(NamedTuple):
+    host_chat_id: int # Chat of the longest-waiting player; the game is created there
+    players: Tuple[Ticket, ...] # Humans, longest-waiting first
+    ai_seats: int # Seats to fill with AI players
+
+    @property
+    def user_ids(self) -> Tuple[int, ...]:
+        return tuple(ticket.user_id for ticket in self.players)
+
+
+TableCallback = Callable[[Any, MatchedTable], Awaitable[Any]]
+
+
+class Matchmaker:
+    """
+    Queue of players waiting for a table. `on_table(context, table)` is awaited for every
+    table formed; it creates the game (e.g. in table.host_chat_id with table.ai_seats AI
+    players) and notifies the players. `rating_of(user_id)` enables rating buckets of
+    `bucket_width` points; without it everyone shares one bucket.
+    """
+
+    def __init__(self, on_table: TableCallback, rating_of: Optional[Callable[[int], float]] = None,
+                 wait_seconds: float = MATCHMAKING_WAIT_SECONDS, bucket_width: float = MATCHMAKING_BUCKET_WIDTH,
+                 min_humans: int = AI_PLAYER_COUNT_TO_START_GAME, wheel: TimerWheel = timer_wheel):
+        self.on_table = on_table
+        self.rating_of = rating_of if bucket_width > 0 else None
+        self.wait_seconds = wait_seconds
+        self.bucket_width = bucket_width
+        self.min_humans = max(1, min(min_humans, TABLE_SIZE))
+        self.wheel = wheel
+        self._waiting: Dict[int, Ticket] = {}
+        self._heaps: Dict[int, List[Tuple[int, int]]] = {} # bucket -> [(seq, user_id)]; stale entries skipped
+        self._bucket_sizes: Dict[int, int] = {}
+        self._seq = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._waiting)
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._waiting
+
+    def _bucket_of(self, rating: Optional[float]) -> int:
+        if rating is None or self.bucket_width <= 0:
+            return 0
+        return int(rating // self.bucket_width)
+
+    async def enqueue(self, context: Any, user_id: int, chat_id: int, data: Any = None) -> Optional[MatchedTable]:
+        """
+        Queues a player (a no-op if already queued) and seats them right away when their
+        bucket now has three players. Returns the table formed, if any.
+        """
+        if user_id in self._waiting:
+            return None
+        rating = self.rating_of(user_id) if self.rating_of is not None else None
+        ticket = Ticket(user_id, chat_id, rating, self._bucket_of(rating), next(self._seq), data)
+        self._waiting[user_id] = ticket
+        heapq.heappush(self._heaps.setdefault(ticket.bucket, []), (ticket.seq, user_id))
+        self._bucket_sizes[ticket.bucket] = self._bucket_sizes.get(ticket.bucket, 0) + 1
+        self.wheel.arm((JOB_TYPE_MATCH, 0, user_id), self.wait_seconds, self._deadlines_callback, user_id)
+
+        if self._bucket_sizes[ticket.bucket] < TABLE_SIZE:
+            return None
+        table = self._seat(self._oldest(ticket.bucket, TABLE_SIZE), fill="matched")
+        await self._deliver(context, table)
+        return table
+
+    def cancel(self, user_id: int) -> bool:
+        """Takes a player out of the queue (/leave, or they joined a game some other way)."""
+        ticket = self._waiting.get(user_id)
+        if ticket is None:
+            return False
+        self._remove(ticket)
+        return True
+
+    def _remove(self, ticket: Ticket) -> None:
+        del self._waiting[ticket.user_id]
+        self._bucket_sizes[ticket.bucket] -= 1
+        if not self._bucket_sizes[ticket.bucket]:
+            del self._bucket_sizes[ticket.bucket]
+            del self._heaps[ticket.bucket]
+        self.wheel.cancel((JOB_TYPE_MATCH, 0, ticket.user_id))
+
+    def _oldest(self, bucket: int, count: int, exclude: Optional[Ticket] = None) -> List[Ticket]:
+        """Up to `count` longest-waiting players of a bucket (drops stale heap entries on the way)."""
+        heap = self._heaps.get(bucket)
+        found: List[Tuple[int, int]] = []
+        while heap and len(found) < count:
+            seq, user_id = heapq.heappop(heap)
+            ticket = self._waiting.get(user_id)
+            if ticket is None or ticket.seq != seq:
+                continue
+            found.append((seq, user_id))
+        for entry in found: # Still queued until _seat() takes them
+            heapq.heappush(heap, entry)
+        tickets = [self._waiting[user_id] for _seq, user_id in found]
+        return [t for t in tickets if t is not exclude]
+
+    def _seat(self, tickets: List[Ticket], fill: str) -> MatchedTable:
+        now = time.monotonic()
+        for ticket in tickets:
+            self._remove(ticket)
+            matchmaking_wait_seconds.observe(now - ticket.enqueued_at, fill)
+        tickets.sort(key=lambda t: t.seq)
+        return MatchedTable(tickets[0].chat_id, tuple(tickets), TABLE_SIZE - len(tickets))
+
+    async def _deliver(self, context: Any, table: MatchedTable) -> None:
+        try:
+            await self.on_table(context, table)
+        except Exception as e:
+            print(f"Error starting the matched table in chat {table.host_chat_id} for {table.user_ids}: {e}")
+
+    async def _deadlines_callback(self, context: Any, timers: List[Timer]) -> None:
+        """Timer wheel batch callback: seats every player whose wait deadline passed, oldest first."""
+        expired = sorted((self._waiting[t.data] for t in timers if t.data in self._waiting), key=lambda t: t.seq)
+        for ticket in expired:
+            if ticket.user_id not in self._waiting: # Already seated with an earlier expired player
+                continue
+            # Any bucket will do now: the longest-waiting players across all of them
+            others = sorted((other for bucket in list(self._heaps)
+                             for other in self._oldest(bucket, TABLE_SIZE - 1, exclude=ticket)),
+                            key=lambda t: t.seq)[:TABLE_SIZE - 1]
+            tickets = [ticket] + others
+            if len(tickets) < self.min_humans:
+                self.wheel.arm((JOB_TYPE_MATCH, 0, ticket.user_id), self.wait_seconds, self._deadlines_callback,
+                               ticket.user_id)
+                continue
+            await self._deliver(context, self._seat(tickets, fill="ai" if len(tickets) < TABLE_SIZE else "widened"))
+
+
+_matchmaker: Optional[Matchmaker] = None
+
+
+def get_matchmaker(on_table: Optional[TableCallback] = None) -> Matchmaker:
+    """
+    Shared Matchmaker; the first call must pass `on_table`. Rating buckets use the shared
+    RatingEngine when MATCHMAKING_BUCKET_WIDTH > 0.
+    """
+    global _matchmaker
+    if _matchmaker is None:
+        if on_table is None:
+            raise ValueError("The matchmaker is not set up yet: pass on_table on the first call")
+        rating_of = None
+        if MATCHMAKING_BUCKET_WIDTH > 0:
+            from utils.ratings import get_rating_engine # Local import
+            rating_of = get_rating_engine().rating
+        _matchmaker = Matchmaker(on_table, rating_of)
+    return _matchmaker
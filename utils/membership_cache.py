@@ -0,0 +1,212 @@
+# telegram_doudizhu_bot/utils/membership_cache.py
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    from config import MEMBERSHIP_CACHE_POSITIVE_TTL, MEMBERSHIP_CACHE_NEGATIVE_TTL
+except ImportError:
+    print("CRITICAL: config.py not found in utils.membership_cache.py. Using fallback defaults.")
+    MEMBERSHIP_CACHE_POSITIVE_TTL = 300
+    MEMBERSHIP_CACHE_NEGATIVE_TTL = 30
+
+from utils.metrics import observe_api_call
+
+MEMBER_STATUSES = ('member', 'administrator', 'creator')
+GROUP_INFO_TTL = 3600 # Group title/invite link rarely change
+DEFAULT_MAX_ENTRIES = 50_000
+# Shard mode: shared key bumped by every membership change, and how often a shard re-reads it
+EPOCH_KEY = "membership_epoch"
+EPOCH_CHECK_SECONDS = 1.0
+
+_Key = Tuple[int, int] # (group_id, user_id)
+
+
+class _LeaderCancelled(Exception):
+    """Set on a coalesced lookup whose leading caller was cancelled; its waiters retry on their own."""
+
+
+class MembershipCache:
+    """
+    Caches REQUIRED_GROUP_ID membership lookups.
+
+    - Positive and negative results have separate TTLs (members are re-checked rarely,
+      non-members soon so that joining the group takes effect quickly).
+    - Concurrent checks for the same (group, user) share one in-flight lookup (shared
+      store, then get_chat_member).
+    - Errors are never cached; every waiter of the failed call sees the exception. If the
+      caller making the shared call is cancelled, the waiters are not: one of them makes
+      the call again and the rest wait for it.
+    - chat_member updates (see on_chat_member_update) overwrite entries immediately.
+    - In shard mode every change also bumps a shared epoch; a shard that sees a new
+      epoch (checked at most every EPOCH_CHECK_SECONDS) drops its local entries, and
+      reloads them from the shared store, which has the fresh values. Shared store I/O
+      runs in a thread, never on the event loop.
+    """
+
+    def __init__(self, positive_ttl: float = MEMBERSHIP_CACHE_POSITIVE_TTL,
+                 negative_ttl: float = MEMBERSHIP_CACHE_NEGATIVE_TTL,
+                 max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[_Key, Tuple[bool, float]]" = OrderedDict()
+        self._inflight: Dict[_Key, asyncio.Future] = {}
+        self._group_info: Dict[int, Tuple[Optional[Any], float]] = {}
+        self._stats = {"hits": 0, "shared_hits": 0, "misses": 0, "coalesced": 0, "api_calls": 0, "errors": 0,
+                       "invalidations": 0}
+        # In shard mode (utils.sharding) a utils.shared_store.SharedStore consulted before the Bot API
+        self.shared_store = None
+        self._epoch: Optional[int] = None
+        self._epoch_checked_at = 0.0
+
+    def _shared_key(self, key: _Key) -> str:
+        return f"member:{key[0]}:{key[1]}"
+
+    def _store(self, key: _Key, is_member: bool) -> None:
+        ttl = self.positive_ttl if is_member else self.negative_ttl
+        self._entries[key] = (is_member, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def is_member(self, bot, group_id: int, user_id: int) -> bool:
+        """Returns whether user_id is a member of group_id, calling the Bot API only on a cache miss."""
+        key = (group_id, user_id)
+        if self.shared_store is not None and time.monotonic() >= self._epoch_checked_at + EPOCH_CHECK_SECONDS:
+            await self._check_epoch()
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] > time.monotonic():
+            self._stats["hits"] += 1
+            return entry[0]
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self._stats["coalesced"] += 1
+            try:
+                return await asyncio.shield(pending)
+            except _LeaderCancelled:
+                return await self.is_member(bot, group_id, user_id) # The first waiter to get here leads the retry
+
+        # Registered before the first await, so concurrent checks of this key wait for this one
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            if self.shared_store is not None:
+                shared = await asyncio.to_thread(self.shared_store.get, self._shared_key(key))
+                if shared is not None:
+                    self._stats["shared_hits"] += 1
+                    self._store(key, shared)
+                    future.set_result(shared)
+                    return shared
+
+            self._stats["misses"] += 1
+            self._stats["api_calls"] += 1
+            member = await observe_api_call("getChatMember", bot.get_chat_member(chat_id=group_id, user_id=user_id))
+            result = member.status in MEMBER_STATUSES
+            self._store(key, result)
+            future.set_result(result)
+            if self.shared_store is not None:
+                try:
+                    await asyncio.to_thread(self._share, key, result, False)
+                except Exception as e: # The local result stands; other shards just ask the API themselves
+                    print(f"Membership cache: could not share the result for {key}: {e}")
+            return result
+        except asyncio.CancelledError:
+            if not future.done():
+                future.set_exception(_LeaderCancelled())
+                future.exception() # Mark retrieved so an unawaited future doesn't log a warning
+            raise
+        except Exception as e:
+            self._stats["errors"] += 1
+            if not future.done():
+                future.set_exception(e)
+                future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    async def get_group_info(self, bot, group_id: int):
+        """Returns the cached Chat object for group_id (None if it could not be fetched)."""
+        cached = self._group_info.get(group_id)
+        if cached is not None and cached[1] > time.monotonic():
+            return cached[0]
+        try:
+            self._stats["api_calls"] += 1
+            chat = await observe_api_call("getChat", bot.get_chat(group_id))
+        except Exception:
+            chat = None
+        self._group_info[group_id] = (chat, time.monotonic() + (GROUP_INFO_TTL if chat else self.negative_ttl))
+        return chat
+
+    async def _check_epoch(self) -> None:
+        self._epoch_checked_at = time.monotonic()
+        epoch = await asyncio.to_thread(self.shared_store.get, EPOCH_KEY, 0)
+        if self._epoch is not None and epoch != self._epoch: # Another shard saw a membership change
+            self._entries.clear()
+        self._epoch = epoch
+
+    async def set_status(self, group_id: int, user_id: int, status: str) -> None:
+        """Records a membership status learned from an update (no API call needed), in every shard."""
+        self._stats["invalidations"] += 1
+        self._store((group_id, user_id), status in MEMBER_STATUSES)
+        if self.shared_store is not None:
+            await asyncio.to_thread(self._share, (group_id, user_id), status in MEMBER_STATUSES, True)
+
+    def _share(self, key: _Key, is_member: bool, changed: bool) -> None:
+        """Writes a result to the shared store; `changed` also bumps the epoch so other shards drop stale entries."""
+        self.shared_store.set(self._shared_key(key), is_member,
+                              ttl=self.positive_ttl if is_member else self.negative_ttl)
+        if changed:
+            self._epoch = self.shared_store.incr(EPOCH_KEY) # Our own entries are current
+
+    async def invalidate(self, group_id: Optional[int] = None, user_id: Optional[int] = None) -> None:
+        """Drops one entry, all entries of a group, or everything (no arguments), in every shard."""
+        self._stats["invalidations"] += 1
+        if group_id is None:
+            self._entries.clear()
+            self._group_info.clear()
+        elif user_id is None:
+            for key in [k for k in self._entries if k[0] == group_id]:
+                del self._entries[key]
+            self._group_info.pop(group_id, None)
+        else:
+            self._entries.pop((group_id, user_id), None)
+        if self.shared_store is not None:
+            await asyncio.to_thread(self._unshare, group_id, user_id)
+
+    def _unshare(self, group_id: Optional[int], user_id: Optional[int]) -> None:
+        """Deletes shared results (same scopes as invalidate) and bumps the epoch. Blocks on SQLite."""
+        if group_id is None:
+            self.shared_store.delete_prefix("member:")
+        elif user_id is None:
+            self.shared_store.delete_prefix(f"member:{group_id}:")
+        else:
+            self.shared_store.delete(self._shared_key((group_id, user_id)))
+        self._epoch = self.shared_store.incr(EPOCH_KEY)
+
+    def stats(self) -> Dict[str, float]:
+        """Counters plus the hit rate over all membership checks."""
+        served = self._stats["hits"] + self._stats["shared_hits"] + self._stats["coalesced"]
+        lookups = served + self._stats["misses"]
+        stats: Dict[str, float] = dict(self._stats)
+        stats["entries"] = len(self._entries)
+        stats["hit_rate"] = served / lookups if lookups else 0.0
+        return stats
+
+
+# Shared instance used by utils.helpers.check_group_membership_and_reply
+membership_cache = MembershipCache()
+
+
+async def on_chat_member_update(update, context) -> None:
+    """
+    ChatMemberHandler callback: keeps the cache in sync with joins, leaves and bans.
+    Register with ChatMemberHandler(on_chat_member_update, ChatMemberHandler.CHAT_MEMBER);
+    the bot must be an admin of the group and "chat_member" must be in allowed_updates.
+    """
+    change = update.chat_member
+    if not change:
+        return
+    await membership_cache.set_status(change.chat.id, change.new_chat_member.user.id, change.new_chat_member.status)
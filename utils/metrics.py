@@ -0,0 +1,243 @@
+# telegram_doudizhu_bot/utils/metrics.py
+"""
+In-process metrics exported in the Prometheus text format.
+
+Counters are always exact. Latency histograms are sampled (METRICS_SAMPLE_RATE): only a
+random share of calls is timed, so their _count/_sum describe the sample, not the
+traffic; use the matching *_total counter for call rates. Gauges can either be set
+directly or computed at scrape time from a function (see Gauge.set_function); the game
+gauges read bot_data['game_manager'] once Metrics.track_games(bot_data) was called.
+Every Bot API call goes through observe_api_call, so doudizhu_bot_api_* covers direct
+replies and alerts as well as the outbound queue.
+
+Everything is updated from the event loop thread; the HTTP server thread only reads.
+"""
+import bisect
+import random
+import threading
+import time
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+try:
+    from config import METRICS_PORT, METRICS_SAMPLE_RATE
+except ImportError:
+    print("CRITICAL: config.py not found in utils.metrics.py. Using fallback defaults.")
+    METRICS_PORT = 0
+    METRICS_SAMPLE_RATE = 0.1
+
+# Seconds; handlers are usually well under a millisecond, Bot API calls tens to hundreds of ms
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+METRICS_BIND_ADDRESS = "127.0.0.1" # Local only; scrape through a sidecar/agent
+
+_Labels = Tuple[str, ...]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values: Dict[_Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for labels, value in list(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.label_names, labels)} {value:g}")
+        return lines
+
+
+class Gauge:
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values: Dict[_Labels, float] = {}
+        self._function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float, *labels: str) -> None:
+        self._values[labels] = value
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """Computes the (unlabelled) value at scrape time, e.g. lambda: len(game_manager.games)."""
+        self._function = function
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge"]
+        if self._function is not None:
+            try:
+                lines.append(f"{self.name} {float(self._function()):g}")
+            except Exception as e:
+                print(f"Metrics: gauge {self.name} failed: {e}")
+        for labels, value in list(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.label_names, labels)} {value:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (last one is +Inf), sum]
+        self._series: Dict[_Labels, list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        bounds = [f'le="{bound:g}"' for bound in self.buckets] + ['le="+Inf"']
+        for labels, (counts, total) in list(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, labels, bound)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, labels)} {total:g}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, labels)} {cumulative}")
+        return lines
+
+
+class Metrics:
+    """The bot's metric registry (module-level singleton `metrics`)."""
+
+    def __init__(self, sample_rate: float = METRICS_SAMPLE_RATE):
+        self.sample_rate = sample_rate
+        self.handler_calls = Counter("doudizhu_handler_calls_total", "Handler invocations.", ("handler",))
+        self.handler_seconds = Histogram("doudizhu_handler_seconds",
+                                         "Sampled wall time of a handler including its decorator checks.", ("handler",))
+        self.game_handler_seconds = Histogram("doudizhu_game_handler_seconds",
+                                              "Sampled wall time of game handlers by game phase.", ("handler", "phase"))
+        self.bot_api_calls = Counter("doudizhu_bot_api_calls_total", "Bot API calls by method and result.",
+                                     ("method", "result"))
+        self.bot_api_seconds = Histogram("doudizhu_bot_api_seconds", "Sampled Bot API call latency.", ("method",))
+        self.job_lag_seconds = Histogram("doudizhu_job_lag_seconds", "How late timer wheel ticks ran.")
+        self.active_games = Gauge("doudizhu_active_games", "Games currently in progress.")
+        self.active_players = Gauge("doudizhu_active_players", "Players seated in games in progress.")
+        self._all = [self.handler_calls, self.handler_seconds, self.game_handler_seconds, self.bot_api_calls,
+                     self.bot_api_seconds, self.job_lag_seconds, self.active_games, self.active_players]
+
+    def sampled(self) -> bool:
+        """True for the share of calls whose latency should be recorded."""
+        return self.sample_rate >= 1.0 or random.random() < self.sample_rate
+
+    def track_games(self, bot_data: dict) -> None:
+        """
+        Computes active_games/active_players at scrape time from bot_data['game_manager']
+        (its `games` dict by chat id). Call once the application's bot_data is set up.
+        """
+        def games() -> list:
+            game_manager = bot_data.get("game_manager")
+            return list(getattr(game_manager, "games", {}).values()) if game_manager is not None else []
+
+        self.active_games.set_function(lambda: len(games()))
+        self.active_players.set_function(lambda: sum(len(getattr(game, "players", ())) for game in games()))
+
+    def register(self, metric) -> None:
+        """Adds a Counter/Gauge/Histogram created elsewhere to the export."""
+        self._all.append(metric)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._all:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = metrics.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args): # Scrapes would flood the console otherwise
+        pass
+
+
+_server: Optional[ThreadingHTTPServer] = None
+
+
+def start_metrics_server(port: int = METRICS_PORT, address: str = METRICS_BIND_ADDRESS) -> Optional[ThreadingHTTPServer]:
+    """Serves /metrics on a daemon thread. Does nothing if port is 0 or the server already runs."""
+    global _server
+    if not port or _server is not None:
+        return _server
+    try:
+        _server = ThreadingHTTPServer((address, port), _MetricsRequestHandler)
+    except OSError as e:
+        print(f"Metrics: could not listen on {address}:{port}: {e}")
+        return None
+    threading.Thread(target=_server.serve_forever, name="metrics-http", daemon=True).start()
+    print(f"Metrics: serving on http://{address}:{port}/metrics")
+    return _server
+
+
+def stop_metrics_server() -> None:
+    global _server
+    if _server is not None:
+        _server.shutdown()
+        _server.server_close()
+        _server = None
+
+
+async def observe_api_call(method: str, call: Awaitable[Any]) -> Any:
+    """Awaits one Bot API call (e.g. "answerCallbackQuery"), counting its result and timing a sample."""
+    start = time.perf_counter() if metrics.sampled() else None
+    try:
+        result = await call
+    except Exception as e:
+        metrics.bot_api_calls.inc(method, "retry_after" if getattr(e, "retry_after", None) is not None else "error")
+        raise
+    else:
+        metrics.bot_api_calls.inc(method, "ok")
+        return result
+    finally:
+        if start is not None:
+            metrics.bot_api_seconds.observe(time.perf_counter() - start, method)
+
+
+def instrument_handler(func: Callable, name: Optional[str] = None) -> Callable:
+    """Wraps an async handler to count its calls and time a sample of them (doudizhu_handler_*)."""
+    name = name or func.__name__
+
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        metrics.handler_calls.inc(name)
+        if not metrics.sampled():
+            return await func(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            metrics.handler_seconds.observe(time.perf_counter() - start, name)
+    return wrapper
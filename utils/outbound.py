@@ -0,0 +1,239 @@
+# telegram_doudizhu_bot/utils/outbound.py
+import asyncio
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from utils.metrics import observe_api_call
+
+# Telegram's documented limits: about 1 message/second per chat (short bursts tolerated),
+# 20 messages/minute per group and 30 messages/second overall.
+CHAT_BURST = 3
+CHAT_RATE_PER_SECOND = 1.0
+GROUP_BURST = 20
+GROUP_RATE_PER_SECOND = 20 / 60
+GLOBAL_BURST = 30
+GLOBAL_RATE_PER_SECOND = 30.0
+MAX_MESSAGE_LENGTH = 4096
+MERGE_SEPARATOR = "\n\n"
+MAX_RETRIES = 5
+
+OP_SEND, OP_EDIT_TEXT, OP_EDIT_MARKUP = "send", "edit_text", "edit_markup"
+_API_METHODS = {OP_SEND: "sendMessage", OP_EDIT_TEXT: "editMessageText", OP_EDIT_MARKUP: "editMessageReplyMarkup"}
+
+
+class TokenBucket:
+    """Tokens refill continuously at `rate` per second up to `capacity`."""
+    __slots__ = ("capacity", "rate", "tokens", "updated")
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        self._refill(now)
+        return 0.0 if self.tokens >= 1.0 else (1.0 - self.tokens) / self.rate
+
+    def take(self, now: float) -> None:
+        self._refill(now)
+        self.tokens -= 1.0
+
+    def block_for(self, seconds: float, now: float) -> None:
+        """Empties the bucket so the next token is available only after `seconds` (flood wait)."""
+        self._refill(now)
+        self.tokens = min(self.tokens, 1.0 - seconds * self.rate)
+
+
+class _Op:
+    __slots__ = ("kind", "chat_id", "message_id", "kwargs", "futures", "attempts")
+
+    def __init__(self, kind: str, chat_id: int, message_id: Optional[int], kwargs: Dict[str, Any]):
+        self.kind = kind
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.kwargs = kwargs
+        self.futures: List[asyncio.Future] = []
+        self.attempts = 0
+
+
+class OutboundScheduler:
+    """
+    Per-chat outbound queue in front of the Bot API.
+
+    - Every chat has a FIFO of pending calls drained by its own task, paced by per-chat,
+      per-group and global token buckets so we stay under Telegram's limits instead of
+      discovering them through 429s.
+    - Pending edits of the same message are coalesced: only the latest text/keyboard is
+      sent (rapid card-selection toggles become one edit).
+    - Consecutive plain sends to a chat are merged into one message (e.g. the turn
+      announcement plus the hand refresh) while they fit in one Telegram message.
+    - A 429 (any exception with a `retry_after` attribute, e.g. telegram.error.RetryAfter)
+      pauses only the affected chat and the call is retried in place.
+    Callers await the returned future to get the Message (or the exception).
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self._queues: Dict[int, Deque[_Op]] = {}
+        self._pending_edits: Dict[Tuple[int, int], _Op] = {}
+        self._workers: Dict[int, asyncio.Task] = {}
+        self._chat_buckets: Dict[int, TokenBucket] = {}
+        self._group_buckets: Dict[int, TokenBucket] = {}
+        self._global_bucket = TokenBucket(GLOBAL_BURST, GLOBAL_RATE_PER_SECOND)
+        self.stats = {"api_calls": 0, "requested": 0, "coalesced_edits": 0, "merged_sends": 0,
+                      "flood_waits": 0, "errors": 0}
+
+    # --- Public API -------------------------------------------------------------------
+
+    def send_message(self, chat_id: int, text: str, **kwargs) -> asyncio.Future:
+        """Queues a sendMessage. Plain consecutive sends may be merged into one message."""
+        return self._enqueue(_Op(OP_SEND, chat_id, None, dict(kwargs, text=text)))
+
+    def edit_message_text(self, chat_id: int, message_id: int, text: str, **kwargs) -> asyncio.Future:
+        """Queues an editMessageText; supersedes any still-pending edit of the same message."""
+        return self._enqueue(_Op(OP_EDIT_TEXT, chat_id, message_id, dict(kwargs, text=text)))
+
+    def edit_message_reply_markup(self, chat_id: int, message_id: int, reply_markup=None) -> asyncio.Future:
+        """Queues an editMessageReplyMarkup; supersedes any still-pending edit of the same message."""
+        return self._enqueue(_Op(OP_EDIT_MARKUP, chat_id, message_id, {"reply_markup": reply_markup}))
+
+    async def drain(self) -> None:
+        """Waits until every queued call has been sent (useful on shutdown and in benchmarks)."""
+        while self._workers:
+            await asyncio.gather(*list(self._workers.values()), return_exceptions=True)
+
+    def queue_depth(self, chat_id: Optional[int] = None) -> int:
+        if chat_id is not None:
+            return len(self._queues.get(chat_id, ()))
+        return sum(len(q) for q in self._queues.values())
+
+    # --- Queueing ---------------------------------------------------------------------
+
+    def _enqueue(self, op: _Op) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self.stats["requested"] += 1
+
+        if op.kind != OP_SEND:
+            pending = self._pending_edits.get((op.chat_id, op.message_id))
+            if pending is not None:
+                self._coalesce(pending, op)
+                pending.futures.append(future)
+                self.stats["coalesced_edits"] += 1
+                return future
+            self._pending_edits[(op.chat_id, op.message_id)] = op
+
+        queue = self._queues.setdefault(op.chat_id, deque())
+        if op.kind == OP_SEND and queue and self._merge_send(queue[-1], op):
+            queue[-1].futures.append(future)
+            self.stats["merged_sends"] += 1
+            return future
+
+        op.futures.append(future)
+        queue.append(op)
+        if op.chat_id not in self._workers:
+            self._workers[op.chat_id] = asyncio.create_task(self._run_chat(op.chat_id))
+        return future
+
+    @staticmethod
+    def _coalesce(pending: _Op, newer: _Op) -> None:
+        if newer.kind == OP_EDIT_TEXT:
+            # A text edit carries its own keyboard; keep the pending keyboard only if the new one has none
+            markup = newer.kwargs.get("reply_markup", pending.kwargs.get("reply_markup"))
+            pending.kind = OP_EDIT_TEXT
+            pending.kwargs = dict(newer.kwargs)
+            if markup is not None:
+                pending.kwargs["reply_markup"] = markup
+        else:
+            pending.kwargs["reply_markup"] = newer.kwargs.get("reply_markup")
+
+    @staticmethod
+    def _merge_send(last: _Op, op: _Op) -> bool:
+        """Appends op's text to the still-queued send `last` if both are plain messages that fit together."""
+        if last.kind != OP_SEND or last.attempts or last.kwargs.get("reply_markup") is not None:
+            return False
+        extra_last = {k: v for k, v in last.kwargs.items() if k not in ("text", "reply_markup")}
+        extra_op = {k: v for k, v in op.kwargs.items() if k not in ("text", "reply_markup")}
+        if extra_last != extra_op:
+            return False
+        merged = last.kwargs["text"] + MERGE_SEPARATOR + op.kwargs["text"]
+        if len(merged) > MAX_MESSAGE_LENGTH:
+            return False
+        last.kwargs["text"] = merged
+        if op.kwargs.get("reply_markup") is not None:
+            last.kwargs["reply_markup"] = op.kwargs["reply_markup"]
+        return True
+
+    # --- Sending ----------------------------------------------------------------------
+
+    def _buckets_for(self, chat_id: int) -> List[TokenBucket]:
+        buckets = [self._global_bucket]
+        chat_bucket = self._chat_buckets.get(chat_id)
+        if chat_bucket is None:
+            chat_bucket = self._chat_buckets[chat_id] = TokenBucket(CHAT_BURST, CHAT_RATE_PER_SECOND)
+        buckets.append(chat_bucket)
+        if chat_id < 0: # Groups and supergroups
+            group_bucket = self._group_buckets.get(chat_id)
+            if group_bucket is None:
+                group_bucket = self._group_buckets[chat_id] = TokenBucket(GROUP_BURST, GROUP_RATE_PER_SECOND)
+            buckets.append(group_bucket)
+        return buckets
+
+    async def _call(self, op: _Op):
+        return await observe_api_call(_API_METHODS[op.kind], self._call_api(op))
+
+    async def _call_api(self, op: _Op):
+        if op.kind == OP_SEND:
+            return await self.bot.send_message(chat_id=op.chat_id, **op.kwargs)
+        if op.kind == OP_EDIT_TEXT:
+            return await self.bot.edit_message_text(chat_id=op.chat_id, message_id=op.message_id, **op.kwargs)
+        return await self.bot.edit_message_reply_markup(chat_id=op.chat_id, message_id=op.message_id, **op.kwargs)
+
+    async def _run_chat(self, chat_id: int) -> None:
+        queue = self._queues[chat_id]
+        buckets = self._buckets_for(chat_id)
+        try:
+            while queue:
+                now = time.monotonic()
+                wait = max(bucket.wait_time(now) for bucket in buckets)
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                    continue
+
+                op = queue[0]
+                if op.kind != OP_SEND:
+                    # From here on, newer edits of this message queue behind it instead of merging
+                    self._pending_edits.pop((chat_id, op.message_id), None)
+                op.attempts += 1
+                now = time.monotonic()
+                for bucket in buckets:
+                    bucket.take(now)
+                self.stats["api_calls"] += 1
+                try:
+                    result = await self._call(op)
+                except Exception as e:
+                    retry_after = getattr(e, "retry_after", None)
+                    if retry_after is not None and op.attempts < MAX_RETRIES:
+                        self.stats["flood_waits"] += 1
+                        seconds = retry_after.total_seconds() if hasattr(retry_after, "total_seconds") else float(retry_after)
+                        buckets[1].block_for(seconds, time.monotonic())
+                        continue
+                    self.stats["errors"] += 1
+                    queue.popleft()
+                    for future in op.futures:
+                        if not future.done():
+                            future.set_exception(e)
+                    continue
+                queue.popleft()
+                for future in op.futures:
+                    if not future.done():
+                        future.set_result(result)
+        finally:
+            self._workers.pop(chat_id, None)
+            if not queue:
+                self._queues.pop(chat_id, None)
@@ -0,0 +1,293 @@
+# telegram_doudizhu_bot/utils/persistence.py
+import json
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    from config import DATABASE_NAME, DB_FLUSH_INTERVAL_SECONDS, DB_MAX_BATCH_SIZE, DB_READER_POOL_SIZE
+except ImportError:
+    print("CRITICAL: config.py not found in utils.persistence.py. Using fallback defaults.")
+    DATABASE_NAME = "doudizhu_bot.db"
+    DB_FLUSH_INTERVAL_SECONDS = 0.2
+    DB_MAX_BATCH_SIZE = 500
+    DB_READER_POOL_SIZE = 4
+
+SETTINGS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chat_settings (chat_id INTEGER PRIMARY KEY, lang TEXT);
+CREATE TABLE IF NOT EXISTS user_settings (user_id INTEGER PRIMARY KEY, lang TEXT);
+CREATE TABLE IF NOT EXISTS db_config (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+_STOP = object()
+
+
+class _Write:
+    """One queued write: a statement (`many`: for several parameter rows) or, with sql=None, a group of them."""
+    __slots__ = ("sql", "params", "many", "on_commit")
+
+    def __init__(self, sql: Optional[str], params: Any, many: bool, on_commit: Optional[Callable[[], None]]):
+        self.sql = sql
+        self.params = params
+        self.many = many
+        self.on_commit = on_commit
+
+
+class WriteBehindStore:
+    """
+    Write-behind SQLite persistence.
+
+    Handlers enqueue writes and return immediately; a single writer thread drains the
+    queue and commits everything that arrived within DB_FLUSH_INTERVAL_SECONDS (or up to
+    DB_MAX_BATCH_SIZE statements) as one transaction, so a burst of games ending together
+    costs one commit. The database runs in WAL mode so readers, which get their own
+    pooled connections, never block on the writer. close() drains the queue and
+    checkpoints the WAL so nothing queued is lost on shutdown.
+    """
+
+    def __init__(self, db_path: str = DATABASE_NAME, flush_interval: float = DB_FLUSH_INTERVAL_SECONDS,
+                 max_batch: int = DB_MAX_BATCH_SIZE, reader_pool_size: int = DB_READER_POOL_SIZE):
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._readers: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._reader_pool_size = reader_pool_size
+        self._readers_created = 0
+        self._readers_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {"writes": 0, "batches": 0, "largest_batch": 0, "errors": 0}
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def ensure_schema(self, script: str) -> None:
+        """Runs CREATE TABLE/INDEX statements synchronously (call at startup, before reads)."""
+        conn = self._connect()
+        try:
+            conn.executescript(script)
+        finally:
+            conn.close()
+
+    def start(self) -> "WriteBehindStore":
+        """Starts the writer thread (idempotent)."""
+        if self._thread is None:
+            self.ensure_schema(SETTINGS_SCHEMA)
+            self._thread = threading.Thread(target=self._writer_loop, name="db-writer", daemon=True)
+            self._thread.start()
+        return self
+
+    def execute(self, sql: str, params: Sequence[Any] = (), on_commit: Optional[Callable[[], None]] = None) -> None:
+        """Queues one statement. `on_commit` runs on the writer thread after its batch commits."""
+        self._queue.put(_Write(sql, tuple(params), False, on_commit))
+
+    def executemany(self, sql: str, seq_of_params: Sequence[Sequence[Any]],
+                    on_commit: Optional[Callable[[], None]] = None) -> None:
+        """Queues a statement for several parameter rows (committed in the same batch)."""
+        self._queue.put(_Write(sql, [tuple(p) for p in seq_of_params], True, on_commit))
+
+    def execute_group(self, statements: Sequence[Tuple[str, Sequence[Sequence[Any]]]],
+                      on_commit: Optional[Callable[[], None]] = None) -> None:
+        """
+        Queues (sql, parameter rows) statements that must commit together: they are one
+        queue item, so a batch never splits them, and if the batch fails they are retried
+        as one transaction (all or none).
+        """
+        self._queue.put(_Write(None, [(sql, [tuple(p) for p in rows]) for sql, rows in statements], True, on_commit))
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Blocks until everything queued so far is committed. Not for use on the event loop."""
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self) -> None:
+        """Durable shutdown: drains the queue, checkpoints the WAL and closes all connections."""
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
+        while not self._readers.empty():
+            self._readers.get_nowait().close()
+        self._readers_created = 0
+
+    @contextmanager
+    def reader(self) -> Iterator[sqlite3.Connection]:
+        """Borrows a read connection from the pool (opened lazily, up to reader_pool_size)."""
+        conn = None
+        try:
+            conn = self._readers.get_nowait()
+        except queue.Empty:
+            with self._readers_lock:
+                if self._readers_created < self._reader_pool_size:
+                    self._readers_created += 1
+                    conn = self._connect()
+                    conn.execute("PRAGMA query_only=1")
+            if conn is None:
+                conn = self._readers.get()
+        try:
+            yield conn
+        finally:
+            self._readers.put(conn)
+
+    def _collect_batch(self) -> Tuple[List[_Write], List[threading.Event], bool]:
+        item = self._queue.get()
+        writes: List[_Write] = []
+        barriers: List[threading.Event] = []
+        stop = False
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            if item is _STOP:
+                stop = True
+            elif isinstance(item, threading.Event):
+                barriers.append(item)
+            else:
+                writes.append(item)
+            if stop or barriers or len(writes) >= self.max_batch:
+                break
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+        if stop or barriers: # Don't leave anything that was queued before the flush/stop behind
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    barriers.append(item)
+                else:
+                    writes.append(item)
+        return writes, barriers, stop
+
+    def _apply(self, conn: sqlite3.Connection, write: _Write) -> None:
+        if write.sql is None:
+            for sql, rows in write.params:
+                conn.executemany(sql, rows)
+        elif write.many:
+            conn.executemany(write.sql, write.params)
+        else:
+            conn.execute(write.sql, write.params)
+
+    def _apply_alone(self, conn: sqlite3.Connection, write: _Write) -> bool:
+        """Applies one write in its own transaction. Returns False (and rolls back) if it fails."""
+        try:
+            conn.execute("BEGIN")
+            self._apply(conn, write)
+            conn.execute("COMMIT")
+            return True
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            self.stats["errors"] += 1
+            sql = write.sql if write.sql is not None else write.params[0][0]
+            print(f"DB writer: dropping failed write '{sql.strip()[:60]}': {e}")
+            return False
+
+    def _commit_batch(self, conn: sqlite3.Connection, writes: List[_Write]) -> None:
+        try:
+            conn.execute("BEGIN")
+            for write in writes:
+                self._apply(conn, write)
+            conn.execute("COMMIT")
+            committed = writes
+        except Exception as e: # sqlite3.Error, but also e.g. a TypeError from bad parameters
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            print(f"DB writer: batch of {len(writes)} failed ({e}); retrying statements individually.")
+            committed = [write for write in writes if self._apply_alone(conn, write)]
+        self.stats["writes"] += len(committed)
+        self.stats["batches"] += 1
+        self.stats["largest_batch"] = max(self.stats["largest_batch"], len(writes))
+        for write in committed: # Dropped writes must not trigger their follow-ups (e.g. a leaderboard refresh)
+            if write.on_commit is not None:
+                try:
+                    write.on_commit()
+                except Exception as e:
+                    print(f"DB writer: on_commit callback failed: {e}")
+
+    def _writer_loop(self) -> None:
+        conn = self._connect()
+        try:
+            while True:
+                writes, barriers, stop = self._collect_batch()
+                try:
+                    if writes:
+                        self._commit_batch(conn, writes)
+                    if stop:
+                        conn.execute("PRAGMA wal_checkpoint(FULL)")
+                except Exception as e: # Keep the writer alive: flush() and close() wait on it
+                    print(f"DB writer: unexpected error ({e!r}); continuing.")
+                finally:
+                    for barrier in barriers:
+                        barrier.set()
+                if stop:
+                    break
+        finally:
+            conn.close()
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+
+_store: Optional[WriteBehindStore] = None
+
+
+def get_store() -> WriteBehindStore:
+    """Shared, started WriteBehindStore for DATABASE_NAME."""
+    global _store
+    if _store is None:
+        _store = WriteBehindStore().start()
+    return _store
+
+
+def save_chat_lang(chat_id: int, lang: str) -> None:
+    get_store().execute(
+        "INSERT INTO chat_settings (chat_id, lang) VALUES (?, ?) ON CONFLICT(chat_id) DO UPDATE SET lang = excluded.lang",
+        (chat_id, lang))
+
+
+def save_user_lang(user_id: int, lang: str) -> None:
+    get_store().execute(
+        "INSERT INTO user_settings (user_id, lang) VALUES (?, ?) ON CONFLICT(user_id) DO UPDATE SET lang = excluded.lang",
+        (user_id, lang))
+
+
+def save_db_config(key: str, value: Any) -> None:
+    """Persists one db_config entry (JSON-encoded), e.g. a runtime REQUIRED_GROUP_ID change."""
+    get_store().execute(
+        "INSERT INTO db_config (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+        (key, json.dumps(value)))
+
+
+def load_settings() -> dict:
+    """Reads chats_lang/users_lang/db_config for bot_data at startup."""
+    with get_store().reader() as conn:
+        return {
+            "chats_lang": {row["chat_id"]: row["lang"] for row in conn.execute("SELECT chat_id, lang FROM chat_settings")},
+            "users_lang": {row["user_id"]: row["lang"] for row in conn.execute("SELECT user_id, lang FROM user_settings")},
+            "db_config": {row["key"]: json.loads(row["value"]) for row in conn.execute("SELECT key, value FROM db_config")},
+        }
+
+
+def shutdown_store() -> None:
+    """Flushes and closes the shared store. Call from the application's post_shutdown hook."""
+    global _store
+    if _store is not None:
+        _store.close()
+        _store = None
@@ -0,0 +1,160 @@
+# telegram_doudizhu_bot/utils/rate_limiter.py
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional
+
+# Hard cap on tracked buckets; the least recently used ones are dropped first.
+DEFAULT_MAX_KEYS = 100_000
+# Shard mode: how often local hits are pushed to the SharedStore and the shared totals pulled back
+SHARED_SYNC_SECONDS = 0.25
+
+
+class RateLimiter:
+    """
+    Token-bucket rate limiter with constant-time checks.
+
+    Each key holds a bucket of `capacity` tokens refilled at capacity/period per second,
+    stored as a compact [tokens, last_seen, full_at] list. Buckets are kept in an
+    OrderedDict in last-use order, so eviction only ever looks at the front: entries
+    whose bucket would be full again (indistinguishable from a fresh bucket) are
+    dropped, and the total is capped at max_keys.
+    """
+
+    def __init__(self, max_keys: int = DEFAULT_MAX_KEYS, shared_store=None):
+        self.max_keys = max_keys
+        # In shard mode (utils.sharding) a utils.shared_store.SharedStore: limits are then
+        # fixed-window counters shared by every worker process instead of local buckets.
+        # Checks never touch SQLite: they use the last synced shared total plus the hits
+        # not pushed yet, and a background thread syncs every SHARED_SYNC_SECONDS. What
+        # other shards counted since the last sync is not seen yet (a shard starts a new
+        # window from 0), so a key can overshoot by up to one capacity per other shard.
+        self.shared_store = shared_store
+        self._buckets: "OrderedDict[Hashable, list]" = OrderedDict()
+        self._counters: Dict[str, Dict[str, int]] = {}
+        self._windows: Dict[str, List[float]] = {} # window key -> [shared total, unsynced hits, expires_at]
+        self._windows_lock = threading.Lock()
+        self._sync_thread: Optional[threading.Thread] = None
+
+    def allow(self, key: Hashable, capacity: int, period: float, label: str = "default",
+              now: Optional[float] = None) -> bool:
+        """Consumes one token from `key`'s bucket. Returns False if the call should be throttled."""
+        if self.shared_store is not None:
+            allowed = self._allow_shared(key, capacity, period)
+            self._count(label, allowed)
+            return allowed
+
+        now = time.monotonic() if now is None else now
+        rate = capacity / period if period > 0 else float("inf")
+
+        entry = self._buckets.get(key)
+        if entry is None:
+            tokens = float(capacity)
+        else:
+            tokens = min(float(capacity), entry[0] + (now - entry[1]) * rate)
+            self._buckets.move_to_end(key)
+
+        allowed = tokens >= 1.0
+        if allowed:
+            tokens -= 1.0
+        full_at = now + (capacity - tokens) / rate if rate != float("inf") else now
+        if entry is None:
+            self._buckets[key] = [tokens, now, full_at]
+        else:
+            entry[0], entry[1], entry[2] = tokens, now, full_at
+
+        self._count(label, allowed)
+        self._evict(now)
+        return allowed
+
+    def _allow_shared(self, key: Hashable, capacity: int, period: float) -> bool:
+        now = time.time()
+        window_key = f"rl:{key!r}@{int(now // period)}"
+        with self._windows_lock:
+            window = self._windows.get(window_key)
+            if window is None:
+                window = self._windows[window_key] = [0, 0, (now // period + 1) * period]
+            allowed = window[0] + window[1] < capacity
+            window[1] += 1
+        if self._sync_thread is None:
+            self._sync_thread = threading.Thread(target=self._sync_loop, name="rate-limit-sync", daemon=True)
+            self._sync_thread.start()
+        return allowed
+
+    def _sync_loop(self) -> None:
+        while True:
+            time.sleep(SHARED_SYNC_SECONDS)
+            try:
+                self.sync_shared()
+            except Exception as e: # Keep syncing; the hits are retried next round
+                print(f"Rate limiter: syncing with the shared store failed: {e}")
+
+    def sync_shared(self) -> None:
+        """Pushes unsynced hits to the shared store and refreshes those windows' totals."""
+        store = self.shared_store
+        if store is None:
+            return
+        now = time.time()
+        with self._windows_lock:
+            for window_key in [k for k, w in self._windows.items() if w[2] <= now]:
+                del self._windows[window_key]
+            pending = {k: (int(w[1]), w[2]) for k, w in self._windows.items() if w[1]}
+            for window_key in pending:
+                self._windows[window_key][1] = 0
+        if not pending:
+            return
+        try:
+            totals = store.add_window_hits(pending)
+        except Exception:
+            with self._windows_lock:
+                for window_key, (hits, _expires_at) in pending.items():
+                    window = self._windows.get(window_key)
+                    if window is not None:
+                        window[1] += hits
+            raise
+        with self._windows_lock:
+            for window_key, total in totals.items():
+                window = self._windows.get(window_key)
+                if window is not None:
+                    window[0] = total
+
+    def _count(self, label: str, allowed: bool) -> None:
+        counter = self._counters.get(label)
+        if counter is None:
+            counter = self._counters[label] = {"allowed": 0, "denied": 0}
+        counter["allowed" if allowed else "denied"] += 1
+
+    def _evict(self, now: float) -> None:
+        buckets = self._buckets
+        while buckets:
+            oldest = next(iter(buckets.values()))
+            if oldest[2] > now and len(buckets) <= self.max_keys:
+                break
+            buckets.popitem(last=False)
+
+    def reset(self, key: Optional[Hashable] = None) -> None:
+        """Forgets one key's bucket, or all buckets and counters if key is None."""
+        if key is None:
+            self._buckets.clear()
+            self._counters.clear()
+            with self._windows_lock:
+                self._windows.clear()
+        else:
+            self._buckets.pop(key, None)
+
+    def stats(self) -> Dict[str, object]:
+        """Allowed/denied counts per label plus the number of live buckets."""
+        per_label = {label: dict(counts) for label, counts in self._counters.items()}
+        allowed = sum(c["allowed"] for c in per_label.values())
+        denied = sum(c["denied"] for c in per_label.values())
+        return {
+            "tracked_keys": len(self._buckets),
+            "allowed": allowed,
+            "denied": denied,
+            "deny_ratio": denied / (allowed + denied) if allowed + denied else 0.0,
+            "per_label": per_label,
+        }
+
+
+# Shared instance used by utils.decorators.rate_limit_command
+rate_limiter = RateLimiter()
@@ -0,0 +1,274 @@
+# telegram_doudizhu_bot/utils/ratings.py
+"""
+Elo-style player ratings for landlord-vs-farmers games.
+
+A game is the landlord against the average rating of the two farmers. The landlord gains
+K * weight * (won - expected) and each farmer loses half of it, where the weight grows
+with the final score multiplier (bombs, rocket, spring), so ratings stay zero-sum and
+track the same scoring the totals use.
+
+Two paths share that formula:
+- RatingEngine.record_settlement() updates the three players as each game settles and
+  hands the deltas to the leaderboard (stored in player_ratings with the stats batch).
+- recompute_ratings() rebuilds every rating from the game event log (utils/event_log.py,
+  every shard's directory) in rating periods: all games of a period are rated against
+  the ratings at its start, vectorized with numpy, so millions of games take seconds.
+  Run it after a rules change or a scoring fix: python -m utils.ratings [log_dir]. It
+  bumps the ratings epoch, and a running bot reloads its cached ratings and leaderboard
+  on the DB writer thread after its next settled game.
+"""
+from __future__ import annotations # numpy is only imported for type checking at module level
+
+import asyncio
+import math
+import sys
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, NamedTuple, Optional, Sequence, Tuple
+
+try:
+    from config import RATING_INITIAL, RATING_K_FACTOR, RATING_PERIOD_SECONDS, EVENT_LOG_DIR
+except ImportError:
+    print("CRITICAL: config.py not found in utils.ratings.py. Using fallback defaults.")
+    RATING_INITIAL = 1500.0
+    RATING_K_FACTOR = 24.0
+    RATING_PERIOD_SECONDS = 3600
+    EVENT_LOG_DIR = "event_log"
+
+from utils.event_log import EVENT_LANDLORD, EVENT_SETTLE, list_segments, log_directories, read_segment_records
+from utils.leaderboard import GameResult, Leaderboard, get_leaderboard
+
+if TYPE_CHECKING:
+    import numpy as np
+
+RATING_SCALE = 400.0 # A 400 point gap means 10:1 expected odds
+
+
+def multiplier_weight(multiplier: int) -> float:
+    """K-factor weight of a game: 1 for a plain game, +1 per doubling of the score multiplier."""
+    return 1.0 + math.log2(max(multiplier, 1))
+
+
+def landlord_delta(landlord: float, farmer_a: float, farmer_b: float, landlord_won: float, weight: float,
+                   k: float = RATING_K_FACTOR) -> float:
+    """The landlord's rating change (farmers each get minus half). Works on floats and numpy arrays alike."""
+    expected = 1.0 / (1.0 + 10.0 ** (((farmer_a + farmer_b) / 2.0 - landlord) / RATING_SCALE))
+    return k * weight * (landlord_won - expected)
+
+
+class RatingEngine:
+    """
+    Incremental ratings for live games. Current ratings are loaded from player_ratings
+    once and then kept in memory; the database is updated with deltas, so shards rating
+    the same player from slightly different cached values still add up. The cache is
+    reloaded when the leaderboard sees a new ratings epoch (a recompute, in any process),
+    on the thread that saw it (the DB writer), so the event loop never reads the table:
+    await load() at startup, before the first game is rated.
+    """
+
+    def __init__(self, leaderboard: Leaderboard, k: float = RATING_K_FACTOR, initial: float = RATING_INITIAL):
+        self.leaderboard = leaderboard
+        self.k = k
+        self.initial = initial
+        self._ratings: Optional[Dict[int, float]] = None
+        self._epoch: Optional[int] = None # Ratings epoch the cache was loaded at
+        self._lock = threading.Lock()
+        leaderboard.add_epoch_listener(self._on_epoch)
+
+    def _reload(self, conn) -> None:
+        """Reads every rating from player_ratings. Blocks on SQLite: never called on the event loop."""
+        from utils.leaderboard import RATING_EPOCH_SQL # Local import
+        loaded_epoch = conn.execute(RATING_EPOCH_SQL).fetchone()[0]
+        ratings = {row[0]: row[1] for row in conn.execute("SELECT user_id, rating FROM player_ratings")}
+        with self._lock:
+            self._ratings = ratings
+            self._epoch = loaded_epoch
+
+    def _on_epoch(self, conn, epoch: int) -> None:
+        if self._ratings is not None and epoch != self._epoch: # Not loaded yet: load() reads the new ones
+            self._reload(conn)
+
+    def _load_blocking(self) -> None:
+        with self.leaderboard.store.reader() as conn:
+            self._reload(conn)
+
+    async def load(self) -> None:
+        """Loads the ratings in a worker thread. Await it at startup (e.g. in post_init)."""
+        await asyncio.to_thread(self._load_blocking)
+
+    def _load(self) -> Dict[int, float]:
+        if self._ratings is None: # load() wasn't awaited: read them now
+            print("RatingEngine: ratings used before load(); reading them on the calling thread.")
+            self._load_blocking()
+        return self._ratings
+
+    def rating(self, user_id: int) -> float:
+        return self._load().get(user_id, self.initial)
+
+    def rate_game(self, landlord_id: int, farmer_ids: Tuple[int, int], landlord_won: bool,
+                  multiplier: int) -> Dict[int, float]:
+        """Applies one game to the in-memory ratings and returns each player's delta."""
+        ratings = self._load()
+        with self._lock:
+            delta = landlord_delta(ratings.get(landlord_id, self.initial), ratings.get(farmer_ids[0], self.initial),
+                                   ratings.get(farmer_ids[1], self.initial), 1.0 if landlord_won else 0.0,
+                                   multiplier_weight(multiplier), self.k)
+            deltas = {landlord_id: delta, farmer_ids[0]: -delta / 2.0, farmer_ids[1]: -delta / 2.0}
+            for user_id, change in deltas.items():
+                ratings[user_id] = ratings.get(user_id, self.initial) + change
+        return deltas
+
+    def record_settlement(self, results: Sequence[GameResult], landlord_id: int, multiplier: int) -> None:
+        """
+        Rates a settled game and records it on the leaderboard (stats and rating deltas in
+        one write batch). `results` holds the three players' GameResult, landlord included.
+        """
+        farmer_ids = tuple(r.user_id for r in results if r.user_id != landlord_id)
+        landlord_won = next(r.won for r in results if r.user_id == landlord_id)
+        deltas = self.rate_game(landlord_id, farmer_ids, landlord_won, multiplier)
+        ratings = self._ratings
+        self.leaderboard.record_game_result(
+            [r._replace(rating_delta=deltas[r.user_id], rating=ratings[r.user_id]) for r in results])
+
+    def reset(self) -> None:
+        """Reloads the cache from the database now (after recompute_ratings). Blocks on SQLite."""
+        self._load_blocking()
+
+
+_rating_engine: Optional[RatingEngine] = None
+
+
+def get_rating_engine() -> RatingEngine:
+    """Shared RatingEngine feeding the shared Leaderboard (await its load() at startup)."""
+    global _rating_engine
+    if _rating_engine is None:
+        _rating_engine = RatingEngine(get_leaderboard())
+    return _rating_engine
+
+
+# --- Batch recompute -------------------------------------------------------------------
+
+class SettledGames(NamedTuple):
+    """Column arrays, one entry per settled game, in settlement order."""
+    timestamp: np.ndarray
+    landlord: np.ndarray # User ids
+    farmer_a: np.ndarray
+    farmer_b: np.ndarray
+    landlord_won: np.ndarray # 0.0 / 1.0
+    multiplier: np.ndarray
+
+
+def load_settled_games(directory: str = EVENT_LOG_DIR) -> SettledGames:
+    """
+    Settled games from the event log under `directory`, every shard's included: every
+    game with a LANDLORD event and its three SETTLE events (value = score delta, aux =
+    final multiplier). Games are identified by (chat_id, game_id), as game ids are only
+    unique per log directory. Only those two event types are kept while reading, so
+    memory is proportional to the number of games.
+    """
+    import numpy as np # Local import
+
+    settles, landlords = [], []
+    for log_dir in log_directories(directory):
+        for path in list_segments(log_dir):
+            records = read_segment_records(path)
+            settles.append(records[records["event_type"] == EVENT_SETTLE])
+            landlords.append(records[records["event_type"] == EVENT_LANDLORD])
+    if not settles:
+        empty = np.zeros(0)
+        return SettledGames(empty, empty.astype(np.int64), empty.astype(np.int64), empty.astype(np.int64), empty, empty)
+    settle = np.concatenate(settles)
+    landlord = np.concatenate(landlords)
+
+    # One integer key per (chat_id, game_id), shared by both event types
+    pairs = np.concatenate((np.stack((settle["chat_id"], settle["game_id"]), axis=1),
+                            np.stack((landlord["chat_id"], landlord["game_id"]), axis=1)))
+    keys = np.unique(pairs, axis=0, return_inverse=True)[1].ravel()
+    settle_key, landlord_key = keys[:len(settle)], keys[len(settle):]
+
+    # Three settle rows per game, ordered by game then seat
+    order = np.lexsort((settle["seat"], settle_key))
+    settle, settle_key = settle[order], settle_key[order]
+    game_keys, first, counts = np.unique(settle_key, return_index=True, return_counts=True)
+    complete = counts == 3
+    rows = (first[complete][:, None] + np.arange(3)).ravel()
+    settle = settle[rows].reshape(-1, 3)
+    game_keys = game_keys[complete]
+
+    # Landlord seat of each game (games without a LANDLORD event are dropped)
+    order = np.argsort(landlord_key, kind="stable")
+    landlord, landlord_key = landlord[order], landlord_key[order]
+    at = np.searchsorted(landlord_key, game_keys)
+    found = at < len(landlord)
+    found[found] = landlord_key[at[found]] == game_keys[found]
+    settle, landlord_seat = settle[found], landlord["seat"][at[found]].astype(np.int64)
+
+    farmers = (landlord_seat[:, None] + np.array([1, 2])) % 3
+    user_ids = settle["user_id"]
+    games = np.arange(len(settle))
+    order = np.argsort(settle["timestamp"][:, 0], kind="stable")
+    landlord_row = settle[games, landlord_seat]
+    result = SettledGames(
+        timestamp=settle["timestamp"][games, landlord_seat],
+        landlord=landlord_row["user_id"],
+        farmer_a=user_ids[games, farmers[:, 0]],
+        farmer_b=user_ids[games, farmers[:, 1]],
+        landlord_won=(landlord_row["value"] > 0).astype(np.float64),
+        multiplier=landlord_row["aux"].astype(np.int64),
+    )
+    return SettledGames(*(column[order] for column in result))
+
+
+def batch_ratings(games: SettledGames, period_seconds: float = RATING_PERIOD_SECONDS, k: float = RATING_K_FACTOR,
+                  initial: float = RATING_INITIAL):
+    """
+    Ratings of every player after `games` (in time order). Returns (user_ids, ratings,
+    rated_games) arrays. Each rating period is one vectorized step; np.add.at applies the
+    period's deltas, so a player's several games in a period all count.
+    """
+    import numpy as np # Local import
+
+    user_ids, players = np.unique(np.concatenate((games.landlord, games.farmer_a, games.farmer_b)),
+                                  return_inverse=True)
+    landlord, farmer_a, farmer_b = players.reshape(3, -1)
+    weight = 1.0 + np.log2(np.maximum(games.multiplier, 1))
+    ratings = np.full(len(user_ids), float(initial))
+
+    period = np.floor(games.timestamp / period_seconds) if period_seconds > 0 else np.arange(len(games.timestamp))
+    bounds = np.concatenate(([0], np.flatnonzero(np.diff(period)) + 1, [len(period)]))
+    for start, end in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+        lord, a, b = landlord[start:end], farmer_a[start:end], farmer_b[start:end]
+        delta = landlord_delta(ratings[lord], ratings[a], ratings[b], games.landlord_won[start:end],
+                               weight[start:end], k)
+        np.add.at(ratings, lord, delta)
+        np.add.at(ratings, a, -delta / 2.0)
+        np.add.at(ratings, b, -delta / 2.0)
+    rated_games = np.bincount(players, minlength=len(user_ids))
+    return user_ids, ratings, rated_games
+
+
+def recompute_ratings(directory: str = EVENT_LOG_DIR, leaderboard: Optional[Leaderboard] = None,
+                      engine: Optional[RatingEngine] = None) -> int:
+    """
+    Rebuilds player_ratings from the whole event log (every shard directory under
+    `directory`) and refreshes the leaderboard. Returns the number of players rated.
+    Blocks until the writer has committed. Rating engines in other processes pick the
+    new ratings up through the ratings epoch; pass the local `engine` to reset it now.
+    """
+    leaderboard = leaderboard or get_leaderboard()
+    user_ids, ratings, rated_games = batch_ratings(load_settled_games(directory))
+    rows = list(zip(user_ids.tolist(), ratings.tolist(), rated_games.tolist()))
+    leaderboard.replace_ratings(rows)
+    leaderboard.store.flush()
+    if engine is not None:
+        engine.reset()
+    return len(rows)
+
+
+if __name__ == "__main__":
+    from utils.persistence import get_store # Local import
+    started = time.perf_counter()
+    get_store().start()
+    rated = recompute_ratings(sys.argv[1] if len(sys.argv) > 1 else EVENT_LOG_DIR)
+    get_store().close()
+    print(f"Rated {rated} players in {time.perf_counter() - started:.2f}s")
@@ -0,0 +1,117 @@
+# telegram_doudizhu_bot/utils/request_context.py
+from __future__ import annotations # Annotations below name types that are only imported for type checking
+
+from typing import TYPE_CHECKING, Any, Optional
+
+try:
+    from config import ADMIN_USER_IDS, REQUIRED_GROUP_ID
+except ImportError:
+    print("CRITICAL: config.py not found in utils.request_context.py. Using fallback defaults.")
+    ADMIN_USER_IDS = []
+    REQUIRED_GROUP_ID = 0
+
+from i18n.translator import _
+from utils.helpers import user_lang_from
+from utils.metrics import observe_api_call
+
+if TYPE_CHECKING:
+    from telegram import Update
+    from telegram.ext import ContextTypes
+
+CONTEXT_ATTRIBUTE = "request_context"
+_UNSET = object()
+
+
+class RequestContext:
+    """
+    Everything the decorator stack and a handler need to know about one update, resolved
+    at most once. Fields are computed on first access, so a handler rejected by the
+    rate limiter never looks up the game. Build it with get_request_context().
+
+    It holds bot_data/user_data rather than the CallbackContext it is cached on, so the
+    pair forms no reference cycle and is freed as soon as the update is done.
+    """
+    __slots__ = ("update", "bot_data", "user_data", "user", "user_id", "chat_id",
+                 "_config", "_lang", "_is_admin", "_required_group_id", "_game", "_player")
+
+    def __init__(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        self.update = update
+        self.bot_data = context.bot_data
+        self.user_data = context.user_data
+        self.user = update.effective_user
+        self.user_id: Optional[int] = self.user.id if self.user else None
+        self.chat_id: Optional[int] = update.effective_chat.id if update.effective_chat else None
+        self._config = self._lang = self._is_admin = self._required_group_id = _UNSET
+        self._game = self._player = _UNSET
+
+    @property
+    def config(self) -> dict:
+        """bot_data['config'] as of this update."""
+        if self._config is _UNSET:
+            self._config = self.bot_data.get("config", {})
+        return self._config
+
+    @property
+    def lang(self) -> str:
+        if self._lang is _UNSET:
+            self._lang = user_lang_from(self.bot_data, self.user_data, self.user_id)
+        return self._lang
+
+    @property
+    def is_admin(self) -> bool:
+        if self._is_admin is _UNSET:
+            admins = self.config.get("ADMIN_USER_IDS", ADMIN_USER_IDS)
+            self._is_admin = self.user_id is not None and self.user_id in admins
+        return self._is_admin
+
+    @property
+    def required_group_id(self) -> int:
+        """REQUIRED_GROUP_ID from db_config (set at runtime by admins), else from config. 0 means none."""
+        if self._required_group_id is _UNSET:
+            group_id = self.bot_data.get("db_config", {}).get("REQUIRED_GROUP_ID")
+            if group_id is None:
+                group_id = self.config.get("REQUIRED_GROUP_ID", REQUIRED_GROUP_ID)
+            self._required_group_id = group_id or 0
+        return self._required_group_id
+
+    @property
+    def game_manager(self) -> Any:
+        return self.bot_data.get("game_manager")
+
+    @property
+    def game(self) -> Any:
+        if self._game is _UNSET:
+            game_manager = self.game_manager
+            self._game = game_manager.get_game(self.chat_id) if game_manager is not None and self.chat_id is not None else None
+        return self._game
+
+    @property
+    def player(self) -> Any:
+        if self._player is _UNSET:
+            game = self.game
+            self._player = game.get_player(self.user_id) if game is not None and self.user_id is not None else None
+        return self._player
+
+    def _(self, text: str) -> str:
+        """Translates text into the user's language."""
+        return _(text, self.lang)
+
+    async def reject(self, message: str, alert: Optional[str] = None) -> None:
+        """
+        Tells the user why their update was refused: a reply for commands, an alert for
+        button presses. Both strings are translated; `alert` defaults to `message`.
+        """
+        if self.update.message:
+            await observe_api_call("sendMessage", self.update.message.reply_text(self._(message)))
+        elif self.update.callback_query:
+            await observe_api_call("answerCallbackQuery",
+                                   self.update.callback_query.answer(self._(alert or message), show_alert=True))
+
+
+def get_request_context(update: Update, context: ContextTypes.DEFAULT_TYPE) -> RequestContext:
+    """The RequestContext of this update, created on first use and cached on the CallbackContext."""
+    request = getattr(context, CONTEXT_ATTRIBUTE, None)
+    if request is None or request.update is not update:
+        request = RequestContext(update, context)
+        setattr(context, CONTEXT_ATTRIBUTE, request)
+    return request
@@ -1,10 +1,12 @@
 # telegram_doudizhu_bot/utils/scheduler_utils.py
-from typing import Callable, Any, Optional
+from typing import Awaitable, Callable, Any, Optional
 from datetime import timedelta
 
 from telegram.ext import ContextTypes, JobQueue
 
 from utils.helpers import get_job_name # For consistent job naming
+from utils.timer_wheel import timer_wheel, BatchCallback, Timer
+from game_logic.bid_evaluator import auto_bid
 
 def set_job(
     context: ContextTypes.DEFAULT_TYPE,
@@ -57,6 +59,49 @@ def clear_job(context: ContextTypes.DEFAULT_TYPE, job_name: str) -> None:
         job.schedule_removal()
         # print(f"Job '{job_name}' scheduled for removal.")
 
+def arm_timeout(
+    job_type: str,
+    chat_id: int,
+    user_id: Optional[int],
+    timeout_seconds: float,
+    callback_function: BatchCallback,
+    job_context_data: Optional[Any] = None
+) -> Timer:
+    """
+    Arms (or re-arms) a BID/PLAY/JOIN timeout on the shared timer wheel.
+    O(1) regardless of how many timeouts are live; no JobQueue lookup or new APScheduler job.
+    The callback is awaited once per tick as `callback(context, timers)` with every
+    timer that expired in that tick; each timer's `.data` is job_context_data.
+    """
+    return timer_wheel.arm((job_type, chat_id, user_id), timeout_seconds, callback_function, job_context_data)
+
+
+def cancel_timeout(job_type: str, chat_id: int, user_id: Optional[int] = None) -> bool:
+    """Cancels a timeout armed with arm_timeout. Returns False if it wasn't armed."""
+    return timer_wheel.cancel((job_type, chat_id, user_id))
+
+
+def make_bid_timeouts_callback(
+    apply_bid: Callable[[ContextTypes.DEFAULT_TYPE, int, int, int], Awaitable[Any]]
+) -> BatchCallback:
+    """
+    Batch callback for JOB_TYPE_BID timeouts. Arm them with job_context_data =
+    {"hand_mask": ..., "highest_bid": ...} (the card_codec mask of the player's hand and
+    the high bid when their turn started). Instead of a blind pass, every timed-out player
+    auto-bids from the bid table: `await apply_bid(context, chat_id, user_id, bid)`, bid 0 = pass.
+    """
+    async def bid_timeouts_callback(context: ContextTypes.DEFAULT_TYPE, timers: list) -> None:
+        for timer in timers:
+            _job_type, chat_id, user_id = timer.key
+            data = timer.data or {}
+            bid = auto_bid(data.get("hand_mask", 0), data.get("highest_bid", 0))
+            try:
+                await apply_bid(context, chat_id, user_id, bid)
+            except Exception as e: # One failed chat must not drop the rest of the batch
+                print(f"Error applying the auto-bid for user {user_id} in chat {chat_id}: {e}")
+    return bid_timeouts_callback
+
+
 # Example usage in a handler:
 # from utils.scheduler_utils import set_job, clear_job
 # from jobs.game_jobs import bid_timeout_callback # The actual function for the job
@@ -72,3 +117,12 @@ def clear_job(context: ContextTypes.DEFAULT_TYPE, job_name: str) -> None:
 
 # # To clear it (e.g., when player bids):
 # clear_job(context, job_name)
+
+# # Turn timeouts should use the timer wheel instead (start it once at startup with
+# # timer_wheel.start(application.job_queue)):
+# from utils.scheduler_utils import arm_timeout, cancel_timeout
+#
+# bid_timeouts_callback = make_bid_timeouts_callback(apply_bid) # apply_bid(context, chat_id, user_id, bid) plays the bid
+# job_data = {"hand_mask": player.hand_mask, "highest_bid": game.highest_bid}
+# arm_timeout(JOB_TYPE_BID, chat_id, player_id, BID_TIMEOUT_SECONDS, bid_timeouts_callback, job_data)
+# cancel_timeout(JOB_TYPE_BID, chat_id, player_id) # When the player bids
@@ -0,0 +1,200 @@
+# telegram_doudizhu_bot/utils/sharding.py
+"""
+Sharded multi-process deployment.
+
+    python -m utils.sharding my_bot_module:build_application
+
+The front process is the only one talking to getUpdates. It routes every update to the
+worker that owns the update's chat (chat_id hash partition) through a per-shard queue.
+Each worker builds its own Application with the given factory (which must return a
+configured, not yet started Application) and feeds the routed
+updates into application.update_queue, so its handlers, game_manager and job queue only
+ever see the chats of its partition. State that must be consistent across shards (user
+languages, rate limits, membership results) lives in a SharedStore; each shard writes its
+own event log directory (utils.event_log.shard_log_dir). A worker that dies
+is restarted with the same queue; updates routed meanwhile wait for it and the other
+shards are not touched.
+"""
+import asyncio
+import importlib
+import multiprocessing
+import sys
+from typing import Callable, List, Optional
+
+try:
+    from config import BOT_TOKEN, SHARD_COUNT
+except ImportError:
+    print("CRITICAL: config.py not found in utils.sharding.py. Using fallback defaults.")
+    BOT_TOKEN = ""
+    SHARD_COUNT = 0
+
+from utils.metrics import metrics
+from utils.shared_store import SharedStore
+
+WORKER_HEALTH_CHECK_SECONDS = 5.0
+GET_UPDATES_TIMEOUT = 30
+
+
+def shard_for_chat(chat_id: int, shard_count: int) -> int:
+    """Stable shard index for a chat (the same chat always lands on the same worker)."""
+    return chat_id % shard_count
+
+
+def routing_id(update) -> int:
+    """The id an update is partitioned by: its chat, or its user for chat-less updates."""
+    if update.effective_chat:
+        return update.effective_chat.id
+    if update.effective_user:
+        return update.effective_user.id
+    return 0
+
+
+def _load_factory(path: str) -> Callable:
+    module_name, _sep, attr = path.partition(":")
+    return getattr(importlib.import_module(module_name), attr or "build_application")
+
+
+def configure_shared_state(application, store: SharedStore) -> None:
+    """Points process-local caches and bot_data language maps at the shared store."""
+    from utils.rate_limiter import rate_limiter # Local import
+    from utils.membership_cache import membership_cache # Local import
+
+    rate_limiter.shared_store = store
+    membership_cache.shared_store = store
+    application.bot_data["users_lang"] = store.mapping("users_lang", key_type=int)
+    application.bot_data["chats_lang"] = store.mapping("chats_lang", key_type=int)
+
+
+async def _run_worker(shard_id: int, updates: multiprocessing.Queue, factory_path: str) -> None:
+    from telegram import Update # Local import
+
+    from utils.event_log import use_shard_event_log # Local import
+    use_shard_event_log(shard_id) # Before the factory runs: one event log writer per directory
+    application = _load_factory(factory_path)()
+    configure_shared_state(application, SharedStore())
+    application.bot_data["shard_id"] = shard_id
+    metrics.track_games(application.bot_data)
+    loop = asyncio.get_running_loop()
+    await application.initialize()
+    await application.start()
+    try:
+        while True:
+            data = await loop.run_in_executor(None, updates.get)
+            if data is None: # Shutdown sentinel
+                break
+            await application.update_queue.put(Update.de_json(data, application.bot))
+    finally:
+        await application.stop()
+        await application.shutdown()
+
+
+def worker_main(shard_id: int, updates: multiprocessing.Queue, factory_path: str) -> None:
+    """Entry point of a shard process."""
+    print(f"Shard {shard_id}: starting.")
+    asyncio.run(_run_worker(shard_id, updates, factory_path))
+    print(f"Shard {shard_id}: stopped.")
+
+
+class ShardSupervisor:
+    """Owns the per-shard queues and worker processes; restarts a shard if its process dies."""
+
+    def __init__(self, factory_path: str, shard_count: int):
+        self.factory_path = factory_path
+        self.shard_count = shard_count
+        self._mp = multiprocessing.get_context("spawn")
+        self.queues: List[multiprocessing.Queue] = [self._mp.Queue() for _ in range(shard_count)]
+        self.processes: List[Optional[multiprocessing.Process]] = [None] * shard_count
+        self.restarts = [0] * shard_count
+
+    def start_shard(self, shard_id: int) -> None:
+        process = self._mp.Process(target=worker_main, args=(shard_id, self.queues[shard_id], self.factory_path),
+                                   name=f"doudizhu-shard-{shard_id}", daemon=False)
+        process.start()
+        self.processes[shard_id] = process
+
+    def start(self) -> None:
+        for shard_id in range(self.shard_count):
+            self.start_shard(shard_id)
+
+    def check_workers(self) -> None:
+        """Restarts any shard whose process has exited (its queued updates are kept)."""
+        for shard_id, process in enumerate(self.processes):
+            if process is not None and not process.is_alive():
+                print(f"Shard {shard_id} exited with code {process.exitcode}; restarting.")
+                self.restarts[shard_id] += 1
+                self.start_shard(shard_id)
+
+    def restart_shard(self, shard_id: int) -> None:
+        """Deliberately restarts one shard (e.g. after a deploy); other shards keep running."""
+        process = self.processes[shard_id]
+        if process is not None and process.is_alive():
+            process.terminate()
+            process.join()
+        self.start_shard(shard_id)
+
+    def route(self, update) -> int:
+        shard_id = shard_for_chat(routing_id(update), self.shard_count)
+        self.queues[shard_id].put(update.to_dict())
+        return shard_id
+
+    def stop(self) -> None:
+        for q in self.queues:
+            q.put(None)
+        for process in self.processes:
+            if process is not None:
+                process.join(timeout=30)
+
+    def queue_depths(self) -> List[int]:
+        depths = []
+        for q in self.queues:
+            try:
+                depths.append(q.qsize())
+            except NotImplementedError: # macOS
+                depths.append(-1)
+        return depths
+
+
+async def run_front(supervisor: ShardSupervisor, token: str = BOT_TOKEN) -> None:
+    """Front process loop: long-polls getUpdates and routes each update to its shard."""
+    from telegram import Bot, Update # Local import
+
+    bot = Bot(token)
+    await bot.initialize()
+    supervisor.start()
+    offset: Optional[int] = None
+    loop = asyncio.get_running_loop()
+    next_check = loop.time() + WORKER_HEALTH_CHECK_SECONDS
+    try:
+        while True:
+            try:
+                updates = await bot.get_updates(offset=offset, timeout=GET_UPDATES_TIMEOUT,
+                                                allowed_updates=Update.ALL_TYPES)
+            except Exception as e:
+                print(f"Front: getUpdates failed: {e}")
+                await asyncio.sleep(1)
+                updates = ()
+            for update in updates:
+                supervisor.route(update)
+                offset = update.update_id + 1
+            if loop.time() >= next_check:
+                supervisor.check_workers()
+                next_check = loop.time() + WORKER_HEALTH_CHECK_SECONDS
+    finally:
+        supervisor.stop()
+        await bot.shutdown()
+
+
+def main(argv: List[str]) -> None:
+    if len(argv) < 2:
+        print("Usage: python -m utils.sharding <module:app_factory> [shard_count]")
+        sys.exit(2)
+    shard_count = int(argv[2]) if len(argv) > 2 else SHARD_COUNT or multiprocessing.cpu_count()
+    supervisor = ShardSupervisor(argv[1], shard_count)
+    try:
+        asyncio.run(run_front(supervisor))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,285 @@
+# telegram_doudizhu_bot/utils/shared_store.py
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections.abc import MutableMapping
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    from config import SHARED_STORE_PATH, SHARED_STORE_CACHE_TTL
+except ImportError:
+    print("CRITICAL: config.py not found in utils.shared_store.py. Using fallback defaults.")
+    SHARED_STORE_PATH = "doudizhu_shared.db"
+    SHARED_STORE_CACHE_TTL = 5.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL,
+                               updated_at REAL NOT NULL DEFAULT 0);
+"""
+# After the updated_at migration: databases created before it lack the column
+INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_kv_expires ON kv (expires_at) WHERE expires_at IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_kv_updated ON kv (updated_at);
+"""
+PURGE_EVERY_WRITES = 1000
+FULL_RELOAD_SECONDS = 60.0 # SharedMapping replicas are reloaded whole this often (picks up deletions)
+SYNC_OVERLAP_SECONDS = 1.0 # Re-read rows this much older than the last sync (commit vs clock order)
+
+
+class SharedStore:
+    """
+    Small key/value store shared by every process on the host (SQLite in WAL mode).
+    Used for state that must be consistent across shards: user languages, rate-limit
+    counters and membership results. Values are JSON; keys may carry a TTL.
+    Each thread of each process opens its own connection lazily (connections never
+    cross a fork, and a background thread's transaction never spans another thread's
+    statements). Calls block on SQLite, so none of them run on the event loop:
+    SharedMapping serves it from a replica, the rate limiter and the membership cache
+    call the store from threads.
+    """
+
+    def __init__(self, path: str = SHARED_STORE_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            if "updated_at" not in {row[1] for row in conn.execute("PRAGMA table_info(kv)")}:
+                try:
+                    conn.execute("ALTER TABLE kv ADD COLUMN updated_at REAL NOT NULL DEFAULT 0")
+                except sqlite3.OperationalError as e: # Another process migrated it first
+                    if "duplicate column" not in str(e):
+                        raise
+            conn.executescript(INDEXES)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key: str, default: Any = None) -> Any:
+        row = self._connection().execute(
+            "SELECT value FROM kv WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)", (key, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        now = time.time()
+        self._connection().execute(
+            "INSERT INTO kv (key, value, expires_at, updated_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at, "
+            "updated_at = excluded.updated_at",
+            (key, json.dumps(value), now + ttl if ttl else None, now))
+        self._after_write()
+
+    def write_many(self, values: Dict[str, Any], deleted: Iterable[str] = ()) -> None:
+        """Sets `values` (without TTL) and deletes the `deleted` keys in one transaction."""
+        now = time.time()
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT INTO kv (key, value, expires_at, updated_at) VALUES (?, ?, NULL, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = NULL, "
+                "updated_at = excluded.updated_at",
+                [(key, json.dumps(value), now) for key, value in values.items()])
+            conn.executemany("DELETE FROM kv WHERE key = ?", [(key,) for key in deleted])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._after_write()
+
+    def scan(self, prefix: str, changed_since: Optional[float] = None) -> List[Tuple[str, Any]]:
+        """(key without the prefix, value) of every live key under `prefix`, or only those set after changed_since."""
+        sql = "SELECT key, value FROM kv WHERE key >= ? AND key < ? AND (expires_at IS NULL OR expires_at > ?)"
+        params: tuple = (prefix, prefix + "\uffff", time.time())
+        if changed_since is not None:
+            sql += " AND updated_at > ?"
+            params += (changed_since,)
+        return [(key[len(prefix):], json.loads(value)) for key, value in self._connection().execute(sql, params)]
+
+    def delete(self, key: str) -> None:
+        self._connection().execute("DELETE FROM kv WHERE key = ?", (key,))
+
+    def delete_prefix(self, prefix: str) -> None:
+        self._connection().execute("DELETE FROM kv WHERE key >= ? AND key < ?", (prefix, prefix + "\uffff"))
+
+    def incr(self, key: str) -> int:
+        """
+        Atomically increments an integer key (created at 1) and returns the new value: one
+        statement, and its RETURNING rows are drained so the implicit transaction ends.
+        """
+        row = self._connection().execute(
+            "INSERT INTO kv (key, value, expires_at) VALUES (?, '1', NULL) "
+            "ON CONFLICT(key) DO UPDATE SET value = CAST(kv.value AS INTEGER) + 1 RETURNING value", (key,)).fetchall()[0]
+        return int(row[0])
+
+    def add_window_hits(self, hits: Dict[str, Tuple[int, float]]) -> Dict[str, int]:
+        """
+        Adds {window key: (hits, expires_at)} to fixed-window counters in one transaction
+        and returns each window's new total (utils.rate_limiter pushes its hits in batches).
+        """
+        totals = {}
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for window_key, (count, expires_at) in hits.items():
+                row = conn.execute(
+                    "INSERT INTO kv (key, value, expires_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET value = CAST(kv.value AS INTEGER) + excluded.value "
+                    "RETURNING value", (window_key, str(count), expires_at)).fetchall()[0]
+                totals[window_key] = int(row[0])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._after_write()
+        return totals
+
+    def incr_window(self, key: str, period: float) -> int:
+        """Atomically counts a hit in the current fixed window of `period` seconds and returns the count."""
+        now = time.time()
+        window_key = f"{key}@{int(now // period)}"
+        row = self._connection().execute(
+            "INSERT INTO kv (key, value, expires_at) VALUES (?, '1', ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = CAST(kv.value AS INTEGER) + 1 RETURNING value",
+            (window_key, now + period)).fetchall()[0] # Drained, so the statement ends
+        self._after_write()
+        return int(row[0])
+
+    def _after_write(self) -> None:
+        self._writes += 1
+        if self._writes % PURGE_EVERY_WRITES == 0:
+            self._connection().execute("DELETE FROM kv WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),))
+
+    def mapping(self, namespace: str, sync_seconds: float = SHARED_STORE_CACHE_TTL,
+                key_type: Callable[[str], Any] = str) -> "SharedMapping":
+        return SharedMapping(self, namespace, sync_seconds, key_type)
+
+
+class SharedMapping(MutableMapping):
+    """
+    dict-like view of one namespace of a SharedStore, so existing code that reads
+    context.bot_data['users_lang'] / ['chats_lang'] keeps working unchanged when those
+    entries are replaced by shared mappings in shard mode.
+
+    The event loop never touches SQLite. The namespace is loaded into a process-local
+    replica when the mapping is created (at shard startup); reads are dict reads on it,
+    and writes update it at once and are queued. A daemon thread commits the queued
+    writes and pulls the rows other shards changed every `sync_seconds`, so their
+    changes show up within that time (deletions with the full reload every
+    FULL_RELOAD_SECONDS). Keys are stored as text and read back through `key_type`
+    (int for the user and chat id mappings), so iteration yields the keys that were set.
+    """
+
+    _DELETED = object()
+
+    def __init__(self, store: SharedStore, namespace: str, sync_seconds: float = SHARED_STORE_CACHE_TTL,
+                 key_type: Callable[[str], Any] = str):
+        self.store = store
+        self.namespace = namespace
+        self.prefix = f"{namespace}:"
+        self.sync_seconds = sync_seconds
+        self.key_type = key_type
+        self._lock = threading.Lock()
+        self._pending: Dict[Any, Any] = {} # Written locally, not committed yet (value or _DELETED)
+        self._replica: Dict[Any, Any] = {}
+        self._synced_at = 0.0
+        self._reloaded_at = 0.0
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._reload()
+        self._thread = threading.Thread(target=self._run, name=f"shared-mapping-{namespace}", daemon=True)
+        self._thread.start()
+
+    # --- Sync thread ----------------------------------------------------------------------
+
+    def _run(self) -> None:
+        while not self._stopped:
+            self._wakeup.wait(self.sync_seconds)
+            self._wakeup.clear()
+            try:
+                self.sync()
+            except Exception as e: # Queued writes stay queued; the next round retries
+                print(f"Shared mapping {self.namespace}: sync failed: {e}")
+
+    def _reload(self) -> None:
+        started = time.time()
+        rows = self.store.scan(self.prefix)
+        replica = {self.key_type(key): value for key, value in rows}
+        with self._lock:
+            for key, value in self._pending.items(): # Local writes not committed yet win
+                if value is self._DELETED:
+                    replica.pop(key, None)
+                else:
+                    replica[key] = value
+            self._replica = replica
+        self._synced_at = self._reloaded_at = started
+
+    def sync(self) -> None:
+        """Commits queued writes, then pulls other shards' changes. Blocks on SQLite: the sync thread calls it."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if pending:
+            try:
+                self.store.write_many({self.prefix + str(k): v for k, v in pending.items() if v is not self._DELETED},
+                                      [self.prefix + str(k) for k, v in pending.items() if v is self._DELETED])
+            except Exception:
+                with self._lock:
+                    for key, value in pending.items():
+                        self._pending.setdefault(key, value) # Writes made since are newer
+                raise
+        if time.time() - self._reloaded_at >= FULL_RELOAD_SECONDS:
+            self._reload()
+            return
+        started = time.time()
+        rows = self.store.scan(self.prefix, changed_since=self._synced_at - SYNC_OVERLAP_SECONDS)
+        with self._lock:
+            for key, value in rows:
+                key = self.key_type(key)
+                if key not in self._pending:
+                    self._replica[key] = value
+        self._synced_at = started
+
+    def close(self) -> None:
+        """Stops the sync thread after committing what is queued."""
+        self._stopped = True
+        self._wakeup.set()
+        self._thread.join()
+        self.sync()
+
+    # --- Mapping interface (event loop) ---------------------------------------------------
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        return self._replica.get(key, default)
+
+    def __getitem__(self, key: Any) -> Any:
+        return self._replica[key]
+
+    def __setitem__(self, key: Any, value: Any) -> None:
+        with self._lock:
+            self._replica[key] = value
+            self._pending[key] = value
+        self._wakeup.set()
+
+    def __delitem__(self, key: Any) -> None:
+        with self._lock:
+            del self._replica[key]
+            self._pending[key] = self._DELETED
+        self._wakeup.set()
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._replica
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(list(self._replica))
+
+    def __len__(self) -> int:
+        return len(self._replica)
@@ -0,0 +1,132 @@
+# telegram_doudizhu_bot/utils/timer_wheel.py
+import math
+import time
+from typing import Any, Callable, Coroutine, Dict, Hashable, List, Optional, Tuple
+
+from utils.metrics import metrics
+
+DEFAULT_TICK_SECONDS = 1.0
+DEFAULT_SLOTS = 512 # Covers ~8.5 minutes per revolution at 1s ticks; longer timers wait extra rounds
+
+TimerKey = Tuple[str, int, Optional[int]] # (job type, chat_id, user_id or None)
+BatchCallback = Callable[[Any, List["Timer"]], Coroutine[Any, Any, Any]]
+
+
+class Timer:
+    """One armed timeout. `data` is whatever the caller passed to arm()."""
+    __slots__ = ("key", "callback", "data", "deadline", "slot", "rounds")
+
+    def __init__(self, key: Hashable, callback: BatchCallback, data: Any, deadline: float, slot: int, rounds: int):
+        self.key = key
+        self.callback = callback
+        self.data = data
+        self.deadline = deadline
+        self.slot = slot
+        self.rounds = rounds
+
+
+class TimerWheel:
+    """
+    Hashed timing wheel for BID/PLAY/JOIN timeouts.
+
+    Timers are keyed by (job type, chat, user): arm (which also re-arms), cancel and
+    lookup are dict operations, independent of how many timers are live. A single
+    repeating job advances the wheel; everything that expires in a tick is grouped by
+    callback and each callback is awaited once with the whole batch.
+    """
+
+    def __init__(self, tick_seconds: float = DEFAULT_TICK_SECONDS, slots: int = DEFAULT_SLOTS):
+        self.tick_seconds = tick_seconds
+        self.slots: List[Dict[Hashable, Timer]] = [{} for _ in range(slots)]
+        self.timers: Dict[Hashable, Timer] = {}
+        self.cursor = 0
+        self.next_tick_at = time.monotonic() + tick_seconds
+        self.last_tick_lag = 0.0 # Seconds the latest tick ran behind schedule
+        self._job = None
+
+    def arm(self, key: Hashable, delay_seconds: float, callback: BatchCallback, data: Any = None) -> Timer:
+        """Schedules (or reschedules) the timer for `key` to fire after delay_seconds."""
+        self.cancel(key)
+        now = time.monotonic()
+        # Ticks until expiry, counted from the next tick (which processes slot cursor + 1)
+        ticks = max(1, math.ceil((now + delay_seconds - self.next_tick_at) / self.tick_seconds) + 1)
+        slot = (self.cursor + ticks) % len(self.slots)
+        rounds = (ticks - 1) // len(self.slots)
+        timer = Timer(key, callback, data, now + delay_seconds, slot, rounds)
+        self.slots[slot][key] = timer
+        self.timers[key] = timer
+        return timer
+
+    def cancel(self, key: Hashable) -> bool:
+        """Disarms the timer for `key`. Returns False if none was armed."""
+        timer = self.timers.pop(key, None)
+        if timer is None:
+            return False
+        self.slots[timer.slot].pop(key, None)
+        return True
+
+    def get(self, key: Hashable) -> Optional[Timer]:
+        return self.timers.get(key)
+
+    def remaining(self, key: Hashable) -> Optional[float]:
+        """Seconds until `key` fires, or None if it isn't armed."""
+        timer = self.timers.get(key)
+        return max(0.0, timer.deadline - time.monotonic()) if timer else None
+
+    def advance(self, now: Optional[float] = None) -> List[Timer]:
+        """Moves the wheel up to `now` (catching up on missed ticks) and returns the expired timers."""
+        now = time.monotonic() if now is None else now
+        expired: List[Timer] = []
+        if now >= self.next_tick_at:
+            self.last_tick_lag = now - self.next_tick_at
+        while now >= self.next_tick_at:
+            self.cursor = (self.cursor + 1) % len(self.slots)
+            self.next_tick_at += self.tick_seconds
+            bucket = self.slots[self.cursor]
+            if not bucket:
+                continue
+            for key, timer in list(bucket.items()):
+                if timer.rounds > 0:
+                    timer.rounds -= 1
+                    continue
+                del bucket[key]
+                del self.timers[key]
+                expired.append(timer)
+        return expired
+
+    async def fire(self, context: Any, expired: List[Timer]) -> None:
+        """Awaits each callback once with all of its timers from this tick."""
+        batches: Dict[BatchCallback, List[Timer]] = {}
+        for timer in expired:
+            batches.setdefault(timer.callback, []).append(timer)
+        for callback, timers in batches.items():
+            try:
+                await callback(context, timers)
+            except Exception as e:
+                print(f"Error in timeout callback {getattr(callback, '__name__', callback)} for {len(timers)} timer(s): {e}")
+
+    async def _tick_job(self, context: Any) -> None:
+        expired = self.advance()
+        metrics.job_lag_seconds.observe(self.last_tick_lag)
+        if expired:
+            await self.fire(context, expired)
+
+    def start(self, job_queue) -> None:
+        """Registers the single repeating JobQueue job that drives the wheel."""
+        if self._job is not None:
+            return
+        self.next_tick_at = time.monotonic() + self.tick_seconds
+        self._job = job_queue.run_repeating(self._tick_job, interval=self.tick_seconds, first=self.tick_seconds,
+                                            name="timer_wheel_tick")
+
+    def stop(self) -> None:
+        if self._job is not None:
+            self._job.schedule_removal()
+            self._job = None
+
+    def __len__(self) -> int:
+        return len(self.timers)
+
+
+# Shared wheel for game timeouts; start it once with timer_wheel.start(application.job_queue)
+timer_wheel = TimerWheel()